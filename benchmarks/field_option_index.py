@@ -0,0 +1,114 @@
+"""
+Counts Pipedrive HTTP calls made while building deal bodies.
+
+Runs `Pipedrive.get_deal_body()` for a batch of synthetic policies against an in-process fake of the
+`dealFields` endpoints and reports how many requests each deal costs:
+
+- `per-lookup`: the index is dropped before every option lookup, which reproduces the former behaviour
+  of paging through `dealFields` on each `find_custom_field_option_id()` call.
+- `indexed`: the index is loaded once and reused for the whole run.
+
+Usage:
+    python -m benchmarks.field_option_index [--deals 200] [--fields 120] [--page-size 100]
+"""
+import argparse
+import json
+import time
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+import pipedrive
+from pipedrive import Pipedrive, PRODUCT, INSURER
+
+INSURERS = ['BTA', 'Balta', 'Gjensidige', 'ERGO', 'Compensa', 'If']
+PRODUCTS = ['OCTA', 'KASKO', 'Property', 'Travel', 'Health']
+
+
+def build_fields(field_count):
+    fields = [
+        {'id': 1, 'key': PRODUCT, 'name': 'Product',
+         'options': [{'id': 100 + i, 'label': label} for i, label in enumerate(PRODUCTS)]},
+        {'id': 2, 'key': INSURER, 'name': 'Insurer',
+         'options': [{'id': 200 + i, 'label': label} for i, label in enumerate(INSURERS)]},
+    ]
+    fields += [{'id': 10 + i, 'key': f'filler_{i}', 'name': f'Filler {i}', 'options': None}
+               for i in range(field_count - len(fields))]
+    return fields
+
+
+def fake_transport(fields, page_size, counter):
+    def request(self, method, url, params=None, **kwargs):
+        counter['calls'] += 1
+        query = {**parse_qs(urlparse(url).query), **{k: [v] for k, v in (params or {}).items()}}
+
+        start = int(query.get('start', [0])[0] or 0)
+        limit = min(int(query.get('limit', [page_size])[0]), page_size)
+        page = fields[start:start + limit]
+        more = start + limit < len(fields)
+
+        body = {
+            'success': True,
+            'data': page,
+            'additional_data': {'pagination': {'more_items_in_collection': more,
+                                               'next_start': start + limit if more else None}}
+        }
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode()
+        return response
+
+    return request
+
+
+def policy(i):
+    return (f'Client {i} - P{i} - {PRODUCTS[i % len(PRODUCTS)]}', 'EUR', 100, 'objects', '2025-01-01',
+            f'P{i}', INSURERS[i % len(INSURERS)], None, PRODUCTS[i % len(PRODUCTS)], 'Broker', i, 1,
+            '2024-01-01')
+
+
+def run(mode, deals, counter):
+    Pipedrive.clear_field_option_index()
+    find = Pipedrive.find_custom_field_option_id
+
+    def per_lookup(custom_field_key, option_label):
+        Pipedrive.clear_field_option_index()
+        return find(custom_field_key, option_label)
+
+    if mode == 'per-lookup':
+        Pipedrive.find_custom_field_option_id = staticmethod(per_lookup)
+
+    counter['calls'] = 0
+    started = time.perf_counter()
+    try:
+        for i in range(deals):
+            Pipedrive.get_deal_body(policy(i), 1, 'org', None)
+    finally:
+        Pipedrive.find_custom_field_option_id = staticmethod(find)
+
+    return counter['calls'], time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--deals', type=int, default=200)
+    parser.add_argument('--fields', type=int, default=120)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    counter = {'calls': 0}
+    original = requests.Session.request
+    requests.Session.request = fake_transport(build_fields(args.fields), args.page_size, counter)
+    pipedrive.PIPEDRIVE_TOKEN = 'benchmark'
+
+    try:
+        for mode in ('per-lookup', 'indexed'):
+            calls, elapsed = run(mode, args.deals, counter)
+            print(f"{mode:>10}: {calls:6d} HTTP calls, {calls / args.deals:6.2f} per deal, {elapsed:.3f}s")
+    finally:
+        requests.Session.request = original
+
+
+if __name__ == '__main__':
+    main()
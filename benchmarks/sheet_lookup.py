@@ -0,0 +1,101 @@
+"""
+Compares spreadsheet lookups through `SheetIndex` with the former per-column `get_value_in_same_row()` scans.
+
+Builds a synthetic policy worksheet, checks that both approaches return identical `info` tuples
+for a sample of policies, and reports the time per lookup.
+
+Usage:
+    python -m benchmarks.sheet_lookup [--rows 100000] [--lookups 200]
+"""
+import argparse
+import random
+import time
+
+import pandas
+
+from helper import SheetIndex, get_value_in_same_row, format_date
+
+SELLERS = [f'Seller {i}' for i in range(40)]
+RESPONSIBLE = [f'Responsible {i}' for i in range(20)]
+
+
+def build_sheets(rows, seed=1):
+    rng = random.Random(seed)
+    data = pandas.DataFrame({
+        'Polise': [f'P{i:07d}' for i in range(rows)],
+        'Klients': [f'Client {rng.randrange(rows // 3 or 1)}' for _ in range(rows)],
+        'Atb. par polisi': [rng.choice(RESPONSIBLE + ['']) for _ in range(rows)],
+        'Atjaunotais piedāvājums: numurs': [str(rng.randrange(1000)) for _ in range(rows)],
+        'Atjaunotā polise: numurs': [rng.choice(['', f'R{rng.randrange(10 ** 6)}']) for _ in range(rows)],
+        'Atjaunotā polise: apdrošinātājs': [rng.choice(['', 'BTA', 'Balta', 'ERGO']) for _ in range(rows)],
+        'Apdrošinātājs': [rng.choice(['BTA', 'Balta', 'ERGO', 'If']) for _ in range(rows)],
+        'Statuss': [rng.choice(['spēkā', 'nav spēkā', '']) for _ in range(rows)],
+        'Atjaunojums': [rng.choice(['atjaunots', 'atjaunošana nav sākta', '']) for _ in range(rows)],
+        'Renewal start date': [rng.choice(['', f'{rng.randrange(1, 28):02d}.{rng.randrange(1, 13):02d}.2025'])
+                               for _ in range(rows)],
+        'Reģ. apliecības nr.': [rng.choice(['', f'AF{rng.randrange(10 ** 6)}']) for _ in range(rows)],
+        'Pārdevējs': [rng.choice(SELLERS + ['Unknown seller']) for _ in range(rows)],
+    })
+    seller_data = pandas.DataFrame({'Pārdevējs': SELLERS, 'ID_PipeDrive': [str(100 + i) for i in range(len(SELLERS))]})
+    policy_on_atb_data = pandas.DataFrame({'Atb. par polisi': RESPONSIBLE,
+                                           'ID_PipeDrive': [str(200 + i) for i in range(len(RESPONSIBLE))]})
+    return data, seller_data, policy_on_atb_data
+
+
+def legacy_info(policy_number, data, seller_data, policy_on_atb_data, client_name):
+    """
+    The lookup sequence `fetch_non_api_data()` used before `SheetIndex`: one full scan per column.
+    """
+    def value(column):
+        return get_value_in_same_row(data, policy_number, "Polise", column, client_name) or None
+
+    status = {"nav spēkā": 40, "spēkā": 41}.get(value("Statuss"))
+    renewal = {"atjaunots": 42, "atjaunošana nav sākta": 43}.get(value("Atjaunojums"))
+    renewal_start_date_str = value("Renewal start date")
+    renewal_start_date = format_date(renewal_start_date_str) if renewal_start_date_str is not None else None
+
+    seller_list = value("Pārdevējs")
+    seller = get_value_in_same_row(seller_data, seller_list, "Pārdevējs", "ID_PipeDrive") or None
+    policy_on_atb_list = value("Atb. par polisi")
+    policy_on_atb = get_value_in_same_row(policy_on_atb_data, policy_on_atb_list,
+                                          "Atb. par polisi", "ID_PipeDrive") or None
+
+    return (policy_on_atb, value("Atjaunotais piedāvājums: numurs"), value("Atjaunotā polise: numurs"),
+            value("Atjaunotā polise: apdrošinātājs"), status, renewal, renewal_start_date,
+            value("Reģ. apliecības nr."), seller_list if seller is None else int(seller),
+            policy_on_atb_list if policy_on_atb is None else int(policy_on_atb), value("Apdrošinātājs"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    data, seller_data, policy_on_atb_data = build_sheets(args.rows)
+    rng = random.Random(2)
+    sample = [(data['Polise'][i], data['Klients'][i]) for i in rng.sample(range(args.rows), args.lookups)]
+    sample.append(('missing policy', 'nobody'))
+
+    started = time.perf_counter()
+    legacy = [legacy_info(p, data, seller_data, policy_on_atb_data, c) for p, c in sample]
+    legacy_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = SheetIndex(data, seller_data, policy_on_atb_data)
+    build_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [index.info(p, c) for p, c in sample]
+    lookup_elapsed = time.perf_counter() - started
+
+    assert legacy == indexed, 'SheetIndex results differ from get_value_in_same_row()'
+
+    print(f"rows: {args.rows}, lookups: {len(sample)}")
+    print(f"  legacy scans: {legacy_elapsed / len(sample) * 1000:9.3f} ms per lookup")
+    print(f"  index build:  {build_elapsed:9.3f} s (once per run)")
+    print(f"  index probe:  {lookup_elapsed / len(sample) * 1000:9.3f} ms per lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Local stand-ins for the Insly and Pipedrive endpoints used by `insly.py` and `pipedrive.py`, plus a synthetic data generator.
+
+The servers keep their data in memory, answer with configurable latency and can enforce a rate limit
+or inject `429` responses at random, so the sync can be measured without touching production APIs.
+Point the sync at them with `INSLY_BASE_URL` and `PIPEDRIVE_BASE_URL` (see `benchmarks.sync_throughput`).
+
+Note:
+    - The base URLs are read when the sync modules are imported, so this module imports them only once a request
+      comes in: start the servers, set the environment variables, then import `main`.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+COMPANY, INDIVIDUAL = 11, 12
+PRODUCTS = {'1': 'OCTA', '2': 'KASKO', '3': 'Property', '4': 'Travel'}
+INSURERS = {'10': 'BTA', '11': 'Balta', '12': 'ERGO', '13': 'If'}
+SELLERS = [f'Seller {i}' for i in range(10)]
+RESPONSIBLE = [f'Responsible {i}' for i in range(5)]
+
+
+def generate_dataset(customers, policies, brokers=20, seed=1, today=None):
+    """
+    Builds synthetic Insly data for `customers` customers with `policies` policies each.
+
+    Args:
+        customers (int): The number of customers.
+        policies (int): The number of policies per customer.
+        brokers (int): The number of brokers. Defaults to 20.
+        seed (int): The random seed. Defaults to 1.
+        today (datetime | None): The reference date for policy end dates. Defaults to today.
+
+    Returns:
+        dict: `customers` (`customer/getpolicy` payloads by OID), `policies` (`policy/getpolicy` payloads by OID),
+        `brokers` (the `system/getperson` payload) and `classifier` (the `policy/getclassifier` payload).
+
+    Note:
+        - Policy end dates are spread from 2 years ago to 1 year ahead, so some policies are closed,
+          some end within the sync window and some are out of range.
+    """
+    rng = random.Random(seed)
+    today = (today or datetime.today()).replace(hour=0, minute=0, second=0, microsecond=0)
+    broker_oids = [5000 + i for i in range(brokers)]
+    policy_oids = itertools.count(100000)
+
+    data = {
+        'customers': {},
+        'policies': {},
+        'brokers': {'person': {str(oid): {'broker_person_name': f'Broker {oid}',
+                                          'broker_person_fax': str(900 + i) if i % 4 else 'Pipedrive'}
+                               for i, oid in enumerate(broker_oids)}},
+        'classifier': {'product': PRODUCTS, 'insurer': INSURERS},
+    }
+
+    for oid in range(1, customers + 1):
+        customer = {
+            'customer_oid': oid,
+            'customer_name': f'Customer {oid}',
+            'customer_type': rng.choice((COMPANY, INDIVIDUAL)),
+            'customer_email': f'customer{oid}@example.com',
+            'customer_phone': f'+3712{oid:07d}',
+            'customer_mobile': '',
+            'customer_idcode': f'{oid:06d}-{rng.randrange(10000, 99999)}',
+            'broker_person_oid': rng.choice(broker_oids + [0]),
+            'address': [{'customer_address': f'Street {oid}', 'customer_address_country': 'LV',
+                         'customer_address_zip': f'LV-{1000 + oid % 9000}'}],
+            'policy': [],
+        }
+
+        for _ in range(policies):
+            policy_oid = next(policy_oids)
+            start = today + timedelta(days=rng.randrange(-730, 365))
+            end = start + timedelta(days=365)
+            installments = rng.choice((1, 2, 4))
+            policy = {
+                'policy_oid': str(policy_oid),
+                'policy_no': f'P{policy_oid}',
+                'policy_type': rng.choice(list(PRODUCTS)),
+                'policy_insurer': rng.choice(list(INSURERS)),
+                'policy_date_start': start.strftime('%d.%m.%Y'),
+                'policy_date_end': end.strftime('%d.%m.%Y'),
+                'policy_premium_currency': 'EUR',
+                'policy_payment_sum': rng.randrange(50, 2000),
+                'policy_description': f'Vehicle LV-{policy_oid}',
+                'policy_installments': installments,
+                'payment': [{'policy_installment_num': n,
+                             'policy_installment_date': (start + timedelta(days=90 * (n - 1))).strftime('%d.%m.%Y'),
+                             'policy_installment_sum': 100, 'policy_installment_currency': 'EUR',
+                             'policy_installment_status': rng.choice((12, 12, 12, 11))}
+                            for n in range(1, installments + 1)],
+            }
+            customer['policy'].append(policy)
+            data['policies'][str(policy_oid)] = {
+                **policy,
+                'objects': [{'vehicle_type': 'Car', 'vehicle_licenseplate': f'LV{policy_oid}',
+                             'vehicle_make': 'Make', 'vehicle_model': 'Model', 'vehicle_year': '2020'}],
+            }
+
+        data['customers'][oid] = customer
+
+    return data
+
+
+class StandInServer:
+    """
+    In-memory HTTP server that answers like a remote API.
+
+    Args:
+        latency (float): Seconds added to every response. Defaults to 0.
+        jitter (float): Random extra latency of up to `jitter` seconds. Defaults to 0.
+        rate_limit (float | None): Requests per second accepted before answering `429`. Defaults to `None` (no limit).
+        burst (int): Requests accepted at once under `rate_limit`. Defaults to 10.
+        fail_rate (float): Share of requests answered with a random `429`. Defaults to 0.
+        retry_after (float): Seconds sent in `Retry-After` on `429`. Defaults to 1.
+        seed (int): The random seed for jitter and injected failures. Defaults to 1.
+
+    .. rubric:: Behavior
+    - `start()` listens on a free local port and returns the base URL; `stop()` shuts the server down.
+    - Counts requests per `METHOD path` (IDs replaced by `{id}`) in `stats`, and the `429` answers in `throttled`.
+    - Subclasses implement `route(method, path, query, body)`, returning `(status, payload)`.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=None, burst=10, fail_rate=0.0, retry_after=1.0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.stats = {}
+        self.throttled = 0
+        self.server = None
+
+    @property
+    def requests(self):
+        return sum(self.stats.values())
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_method(self):
+                standin.handle(self)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_method
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def admit(self):
+        """
+        Returns `True` if the request may be served, `False` if it is answered with `429`.
+        """
+        with self.lock:
+            if self.fail_rate and self.rng.random() < self.fail_rate:
+                return False
+
+            if self.rate_limit is None:
+                return True
+
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate_limit)
+            self.updated = now
+
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+            return True
+
+    def handle(self, handler):
+        parsed = urlparse(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length) or b'null') if length else None
+        template = '/'.join('{id}' if part.isdigit() else part for part in parsed.path.split('/'))
+
+        with self.lock:
+            key = f'{handler.command} {template}'
+            self.stats[key] = self.stats.get(key, 0) + 1
+            delay = self.latency + (self.rng.random() * self.jitter if self.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+
+        headers = {}
+        if not self.admit():
+            with self.lock:
+                self.throttled += 1
+            status, payload = 429, {'success': False, 'error': 'Too many requests'}
+            headers['Retry-After'] = str(self.retry_after)
+        else:
+            with self.lock:
+                status, payload = self.route(handler.command, parsed.path, query, body)
+
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def route(self, method, path, query, body):
+        raise NotImplementedError
+
+
+class InslyStandIn(StandInServer):
+    """
+    Serves the Insly endpoints used by `insly.py` from a `generate_dataset()` result. Base URL suffix: `/api`.
+    """
+    def __init__(self, dataset, **kwargs):
+        super().__init__(**kwargs)
+        self.dataset = dataset
+
+    def start(self):
+        return super().start() + '/api'
+
+    def route(self, method, path, query, body):
+        body = body or {}
+
+        if method != 'POST':
+            return 405, {'error': 'Method not allowed'}
+
+        if path == '/api/customer/getcustomerlist':
+            return 200, {'customers': [{'customer_oid': oid} for oid in self.dataset['customers']]}
+
+        if path == '/api/customer/getpolicy':
+            customer = self.dataset['customers'].get(int(body.get('customer_oid', 0)))
+            return (200, customer) if customer else (404, {'error': 'Customer not found'})
+
+        if path == '/api/policy/getpolicy':
+            policy = self.dataset['policies'].get(str(body.get('policy_oid')))
+            return (200, policy) if policy else (404, {'error': 'Policy not found'})
+
+        if path == '/api/policy/getclassifier':
+            return 200, self.dataset['classifier']
+
+        if path == '/api/system/getperson':
+            return 200, self.dataset['brokers']
+
+        return 404, {'error': f'Unknown endpoint {path}'}
+
+
+class PipedriveStandIn(StandInServer):
+    """
+    Serves the Pipedrive `v1`/`v2` endpoints used by `pipedrive.py` from an in-memory store.
+
+    .. rubric:: Behavior
+    - Organizations, persons and deals are searchable by their Insly OID custom field (`term`).
+    - `v2` lists use cursor pagination and honour `custom_fields`; `v1` lists use `start`/`limit`.
+    - Filter `107` lists open deals, filter `74` lists deals without a seller.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ids = itertools.count(1)
+        self.store = {'organizations': {}, 'persons': {}, 'deals': {}, 'notes': {}}
+        self.keys = None
+        self.oid_fields = None
+        self.fields = None
+
+    def load_keys(self):
+        if self.keys is not None:
+            return
+
+        import pipedrive
+
+        self.keys = pipedrive
+        self.oid_fields = {'organizations': pipedrive.INSLY_ORGANIZATION_OID, 'persons': pipedrive.INSLY_PERSON_OID,
+                           'deals': pipedrive.POLICY_OID}
+        self.fields = [
+            {'id': 1, 'key': pipedrive.PRODUCT, 'name': 'Product',
+             'options': [{'id': 100 + i, 'label': label} for i, label in enumerate(PRODUCTS.values())]},
+            {'id': 2, 'key': pipedrive.INSURER, 'name': 'Insurer',
+             'options': [{'id': 200 + i, 'label': label} for i, label in enumerate(INSURERS.values())]},
+            {'id': 3, 'key': pipedrive.SELLER_OPTION, 'name': 'Seller',
+             'options': [{'id': 300 + i, 'label': label} for i, label in enumerate(SELLERS)]},
+            {'id': 4, 'key': pipedrive.POLICY_ON_ATB_OPTION, 'name': 'Responsible',
+             'options': [{'id': 400 + i, 'label': label} for i, label in enumerate(RESPONSIBLE)]},
+        ]
+
+    @staticmethod
+    def page_v1(items, query):
+        start, limit = int(query.get('start', 0)), int(query.get('limit', 100))
+        more = start + limit < len(items)
+        return 200, {'success': True, 'data': items[start:start + limit],
+                     'additional_data': {'pagination': {'start': start, 'limit': limit, 'more_items_in_collection': more,
+                                                        'next_start': start + limit if more else None}}}
+
+    def list_v2(self, kind, query):
+        items = sorted(self.store[kind].values(), key=lambda item: item['id'])
+
+        if kind == 'deals' and query.get('filter_id') == '107':
+            items = [item for item in items if item['status'] == 'open']
+        elif kind == 'deals' and query.get('filter_id') == '74':
+            items = [item for item in items if not item['custom_fields'].get(self.keys.SELLER_OPTION)]
+
+        cursor, limit = int(query.get('cursor') or 0), int(query.get('limit', 100))
+        items = [item for item in items if item['id'] > cursor][:limit + 1]
+        more = len(items) > limit
+        items = items[:limit]
+
+        if 'custom_fields' in query:
+            keys = query['custom_fields'].split(',')
+            items = [{**item, 'custom_fields': {key: item['custom_fields'].get(key) for key in keys}} for item in items]
+
+        return 200, {'success': True, 'data': items,
+                     'additional_data': {'next_cursor': str(items[-1]['id']) if more else None}}
+
+    def route(self, method, path, query, body):
+        self.load_keys()
+        parts = path.strip('/').split('/')
+
+        if parts[:2] == ['api', 'v2']:
+            return self.route_v2(method, parts[2:], query, body or {})
+        if parts[:1] == ['v1']:
+            return self.route_v1(method, parts[1:], query, body or {})
+
+        return 404, {'success': False, 'error': f'Unknown endpoint {path}'}
+
+    def route_v2(self, method, parts, query, body):
+        kind = parts[0] if parts else None
+        if kind not in self.oid_fields:
+            return 404, {'success': False, 'error': 'Unknown entity'}
+
+        if len(parts) == 2 and parts[1] == 'search' and method == 'GET':
+            term = query.get('term')
+            key = self.oid_fields[kind]
+            items = [{'result_score': 1, 'item': {'id': item['id'], 'name': item.get('name'),
+                                                  'title': item.get('title'), 'status': item.get('status')}}
+                     for item in self.store[kind].values() if str(item['custom_fields'].get(key)) == term]
+            return 200, {'success': True, 'data': {'items': items}}
+
+        if len(parts) == 1 and method == 'GET':
+            return self.list_v2(kind, query)
+
+        if len(parts) == 1 and method == 'POST':
+            item = {**body, 'id': next(self.ids), 'custom_fields': dict(body.get('custom_fields') or {})}
+            item.setdefault('status', 'open')
+            self.store[kind][item['id']] = item
+            return 200, {'success': True, 'data': item}
+
+        if len(parts) == 2 and parts[1].isdigit() and method == 'PATCH':
+            item = self.store[kind].get(int(parts[1]))
+            if item is None:
+                return 404, {'success': False, 'error': 'Not found'}
+
+            custom_fields = {**item['custom_fields'], **(body.get('custom_fields') or {})}
+            item.update(body)
+            item['custom_fields'] = custom_fields
+            return 200, {'success': True, 'data': item}
+
+        return 405, {'success': False, 'error': 'Method not allowed'}
+
+    def route_v1(self, method, parts, query, body):
+        if parts == ['notes'] and method == 'GET':
+            notes = sorted(self.store['notes'].values(), key=lambda note: note['id'])
+            if 'deal_id' in query:
+                notes = [note for note in notes if str(note['deal_id']) == query['deal_id']]
+            return self.page_v1(notes, query)
+
+        if parts == ['notes'] and method == 'POST':
+            note = {**body, 'id': next(self.ids)}
+            self.store['notes'][note['id']] = note
+            return 201, {'success': True, 'data': note}
+
+        if len(parts) == 2 and parts[0] == 'notes' and method == 'PUT':
+            note = self.store['notes'].get(int(parts[1]))
+            if note is None:
+                return 404, {'success': False, 'error': 'Not found'}
+            note.update(body)
+            return 200, {'success': True, 'data': note}
+
+        if parts == ['dealFields'] and method == 'GET':
+            return self.page_v1(self.fields, query)
+
+        if len(parts) == 2 and parts[0] == 'dealFields':
+            field = next((field for field in self.fields if str(field['id']) == parts[1]), None)
+            if field is None:
+                return 404, {'success': False, 'error': 'Not found'}
+            if method == 'GET':
+                return 200, {'success': True, 'data': field}
+            field['options'] = [{'id': option.get('id') or next(self.ids), 'label': option['label']}
+                                for option in body.get('options', [])]
+            return 200, {'success': True, 'data': field}
+
+        if len(parts) == 2 and parts[0] == 'deals' and method == 'GET':
+            deal = self.store['deals'].get(int(parts[1]))
+            if deal is None:
+                return 404, {'success': False, 'error': 'Not found'}
+
+            person = self.store['persons'].get(deal.get('person_id'))
+            org = self.store['organizations'].get(deal.get('org_id'))
+            return 200, {'success': True, 'data': {
+                'id': deal['id'], 'title': deal.get('title'), 'status': deal.get('status'),
+                'person_id': {'name': person['name']} if person else None,
+                'org_id': {'name': org['name']} if org else None,
+            }}
+
+        return 404, {'success': False, 'error': 'Unknown endpoint'}
+
+
+def sheet_frames(dataset, seed=1):
+    """
+    Builds the three spreadsheet DataFrames read by `main.main()` for the policies of `dataset`.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame, pandas.DataFrame]: The policy, seller and responsibility sheets.
+    """
+    import pandas
+
+    from helper import SheetIndex
+
+    rng = random.Random(seed)
+    rows = []
+
+    for customer in dataset['customers'].values():
+        for policy in customer['policy']:
+            row = {column: '' for column in SheetIndex.DATA_COLUMNS}
+            row.update({
+                'Polise': policy['policy_no'],
+                'Klients': customer['customer_name'],
+                'Apdrošinātājs': INSURERS[policy['policy_insurer']],
+                'Pārdevējs': rng.choice(SELLERS + ['']),
+                'Atb. par polisi': rng.choice(RESPONSIBLE),
+                'Statuss': rng.choice(['spēkā', 'nav spēkā']),
+            })
+            rows.append(row)
+
+    seller_data = pandas.DataFrame({'Pārdevējs': SELLERS, 'ID_PipeDrive': [str(300 + i) for i in range(len(SELLERS))]})
+    policy_on_atb_data = pandas.DataFrame({'Atb. par polisi': RESPONSIBLE,
+                                           'ID_PipeDrive': [str(400 + i) for i in range(len(RESPONSIBLE))]})
+    return pandas.DataFrame(rows, columns=list(SheetIndex.DATA_COLUMNS)), seller_data, policy_on_atb_data
@@ -0,0 +1,152 @@
+"""
+Measures end-to-end sync throughput against local Insly and Pipedrive stand-in servers.
+
+Generates `--customers` synthetic customers with `--policies` policies each, starts the stand-ins from
+`benchmarks.standin`, points the sync at them with `INSLY_BASE_URL` / `PIPEDRIVE_BASE_URL`, and runs
+`main.main()`, `update_deals_with_no_seller()` and `filtered_auto_close()`. Reports the wall time,
+customers per second and requests per customer of every job, plus the requests and `429`s seen by the servers.
+
+The spreadsheet is replaced by synthetic sheets built from the same data; the sync state lives in a temporary directory.
+
+Usage:
+    python -m benchmarks.sync_throughput [--customers 200] [--policies 3] [--workers 4] [--latency 0.02]
+                                         [--pipedrive-rate 80] [--insly-rate 0] [--fail-rate 0.0] [--runs 2]
+                                         [--client-limits unlimited|production] [--verbose]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.standin import generate_dataset, sheet_frames, InslyStandIn, PipedriveStandIn
+
+UNLIMITED = '1000000'
+
+
+def configure_environment(args, insly_url, pipedrive_url, state_dir):
+    """
+    Sets the environment variables read by the sync modules; must run before they are imported.
+    """
+    os.environ.update({
+        'INSLY_BASE_URL': insly_url,
+        'PIPEDRIVE_BASE_URL': pipedrive_url,
+        'BEARER_TOKEN': 'benchmark',
+        'PIPEDRIVE_TOKEN': 'benchmark',
+        'SYNC_STATE_PATH': os.path.join(state_dir, 'sync_state.sqlite3'),
+        'CLASSIFIER_CACHE_PATH': '',
+        'METRICS_SUMMARY_PATH': '',
+        'METRICS_PORT': '0',
+        'SYNC_WORKERS': str(args.workers),
+        'QUEUE_RETRY_DELAY': '1',
+    })
+
+    if args.client_limits == 'unlimited':
+        for name in ('PIPEDRIVE_RATE_LIMIT', 'PIPEDRIVE_BURST', 'PIPEDRIVE_SEARCH_RATE_LIMIT', 'PIPEDRIVE_SEARCH_BURST',
+                     'INSLY_RATE_LIMIT', 'INSLY_BURST', 'CUSTOMER_RATE_LIMIT'):
+            os.environ[name] = UNLIMITED
+
+
+def run_job(name, func, servers, customers, verbose):
+    """
+    Runs one job and returns its measurements.
+    """
+    import http_client
+
+    requests_before = http_client.connection_stats()['requests']
+    served_before = {server: (server.requests, server.throttled) for server in servers}
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    started = time.perf_counter()
+    with output:
+        func()
+    elapsed = time.perf_counter() - started
+
+    requests = http_client.connection_stats()['requests'] - requests_before
+    served = sum(server.requests - served_before[server][0] for server in servers)
+    throttled = sum(server.throttled - served_before[server][1] for server in servers)
+
+    return {
+        'job': name,
+        'seconds': elapsed,
+        'customers_per_second': customers / elapsed if customers and elapsed else None,
+        'requests': requests,
+        'requests_per_customer': requests / customers if customers else None,
+        'served': served,
+        'throttled': throttled,
+    }
+
+
+def report(results):
+    print(f"\n{'job':<30}{'wall s':>9}{'cust/s':>9}{'requests':>10}{'req/cust':>10}{'served':>9}{'429s':>7}")
+
+    for result in results:
+        per_second = f"{result['customers_per_second']:.1f}" if result['customers_per_second'] else '-'
+        per_customer = f"{result['requests_per_customer']:.2f}" if result['requests_per_customer'] else '-'
+        print(f"{result['job']:<30}{result['seconds']:>9.2f}{per_second:>9}{result['requests']:>10}"
+              f"{per_customer:>10}{result['served']:>9}{result['throttled']:>7}")
+
+    print(f"{'total':<30}{sum(result['seconds'] for result in results):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--policies', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every stand-in response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency, in seconds')
+    parser.add_argument('--pipedrive-rate', type=float, default=0, help='Pipedrive stand-in requests/s (0 = no limit)')
+    parser.add_argument('--insly-rate', type=float, default=0, help='Insly stand-in requests/s (0 = no limit)')
+    parser.add_argument('--burst', type=int, default=20, help='requests accepted at once under a stand-in rate limit')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with a random 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with a 429')
+    parser.add_argument('--runs', type=int, default=2, help='main() runs; later runs measure the incremental sync')
+    parser.add_argument('--client-limits', choices=('unlimited', 'production'), default='unlimited',
+                        help="keep the sync's own rate limits ('production') or lift them ('unlimited')")
+    parser.add_argument('--verbose', action='store_true', help='show the output of the sync')
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.customers, args.policies)
+    options = {'latency': args.latency, 'jitter': args.jitter, 'burst': args.burst,
+               'fail_rate': args.fail_rate, 'retry_after': args.retry_after}
+    insly_server = InslyStandIn(dataset, rate_limit=args.insly_rate or None, **options)
+    pipedrive_server = PipedriveStandIn(rate_limit=args.pipedrive_rate or None, **options)
+    servers = (insly_server, pipedrive_server)
+    state_dir = tempfile.mkdtemp(prefix='sync-benchmark-')
+
+    try:
+        configure_environment(args, insly_server.start(), pipedrive_server.start(), state_dir)
+
+        import main as sync
+        from pipedrive import Pipedrive
+
+        frames = sheet_frames(dataset)
+        sync.read_data_from_worksheets = lambda sheets: frames
+        pd = Pipedrive('benchmark')
+
+        print(f"{args.customers} customers x {args.policies} policies, {args.workers} worker(s), "
+              f"{args.latency * 1000:.0f} ms latency, client limits: {args.client_limits}")
+
+        results = []
+        for run in range(1, args.runs + 1):
+            results.append(run_job(f'main (run {run})', lambda: sync.main(pd, workers=args.workers),
+                                   servers, args.customers, args.verbose))
+
+        results.append(run_job('update_deals_with_no_seller', lambda: sync.update_deals_with_no_seller(pd),
+                               servers, None, args.verbose))
+        results.append(run_job('filtered_auto_close', lambda: sync.filtered_auto_close(pd),
+                               servers, None, args.verbose))
+
+        report(results)
+        print(f"\nServed by endpoint: {dict(sorted({**insly_server.stats, **pipedrive_server.stats}.items()))}")
+    finally:
+        for server in servers:
+            server.stop()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
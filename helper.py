@@ -1,30 +1,5 @@
-def retry_requests(wait_time=40):
-    """
-    Retries failed requests due to rate limits by processing entries in `retry_buffer`.
-
-    Args:
-        wait_time (int): The number of seconds to wait before retrying each request. Defaults to 40.
-
-    .. rubric:: Behavior
-    - Iterates over the `retry_buffer`, which stores tuples of (object ID, retry counter).
-    - Waits for `wait_time` seconds before retrying each request.
-    - Calls `get_customer_policy(oid, counter)` to retry fetching customer policy.
-    - Continues until all retry attempts are exhausted.
-    - Clears `retry_buffer` at the end.
-
-    Note:
-        - Assumes `retry_buffer` is a global list storing failed request details.
-        - The function imports `get_customer_policy` and `retry_buffer` from `insly`.
-    """
-    import time
-    from insly import get_customer_policy, retry_buffer
-
-    while retry_buffer:
-        oid, counter = retry_buffer.pop(0)
-        print(f"#{counter} Rate limit exceeded! Retrying after {wait_time} seconds...\n")
-        time.sleep(wait_time)
-        get_customer_policy(oid, counter)
-    retry_buffer.clear()
+# Heading of every policy objects note; `pipedrive.classify_deal_notes()` recognises the note by it
+OBJECTS_NOTE_HEADING = "<h3>Policy Objects</h3>"
 
 
 def is_email_valid(email):
@@ -97,7 +72,7 @@ def format_objects_to_html(objects):
         - Defaults missing values to `'N/A'` if a key is not found or has a `None` value.
     """
     from html import escape
-    html_content = "<h3>Policy Objects</h3><ul>"
+    html_content = OBJECTS_NOTE_HEADING + "<ul>"
 
     for obj in objects:
         html_content += "<li>"
@@ -166,126 +141,152 @@ def fetch_table(url):
     return pandas.read_csv(url, skiprows=2, header=1)
 
 
-def fetch_non_api_data(policy_number, data, seller_data, policy_on_atb_data, client_name):
+def fetch_non_api_data(policy_number, sheet_index, client_name):
     """
-    Extracts policy-related information from multiple datasets based on a policy number.
+    Extracts policy-related information from the spreadsheet datasets based on a policy number.
 
     Args:
         policy_number (any): The policy number used to locate the relevant row.
+        sheet_index (SheetIndex): The lookup index built from the three worksheets.
+        client_name (any): The client name that has to match the 'Klients' column.
 
     Returns:
-        list: A list containing extracted and transformed values.
+        tuple: A tuple containing extracted and transformed values.
 
     .. rubric:: Behavior
-    - Searches for the given `policy_number` in the "Polise" column of the main dataset.
-    - Retrieves corresponding values from multiple columns related to the policy.
-    - Looks up Pipedrive option IDs from supplementary datasets using seller and responsibility data.
-    - Converts status and renewal labels into numeric codes:
-        - Status: "nav spēkā" → 40, "spēkā" → 41
-        - Renewal: "atjaunots" → 42, "atjaunošana nav sākta" → 43
-    - Formats the renewal start date into 'YYYY-MM-DD'.
-    - Returns `None` if a value is missing, unrecognized, or invalid.
+    - Resolves the whole `info` tuple with a single `SheetIndex.info()` probe.
+    - See `SheetIndex.info()` for the meaning and transformation of every value.
+    """
+    info = sheet_index.info(policy_number, client_name)
 
-    Note:
-        - Uses `get_value_in_same_row()` to extract data from rows.
-        - Uses `format_date()` to standardize date formatting.
+    print(info)
+
+    return info
+
+
+class SheetIndex:
+    """
+    Lookup index over the spreadsheet datasets used by `fetch_non_api_data()`.
+
+    Args:
+        data (pandas.DataFrame): The main policy worksheet.
+        seller_data (pandas.DataFrame): The worksheet mapping sellers to Pipedrive option IDs.
+        policy_on_atb_data (pandas.DataFrame): The worksheet mapping responsible persons to Pipedrive option IDs.
+
+    .. rubric:: Behavior
+    - Built once after the worksheets are read; every lookup afterwards is a dictionary probe.
+    - Rows are keyed by ("Polise", "Klients") and by "Polise" alone; the first matching row wins,
+      exactly like `get_value_in_same_row()`.
+    - Empty cells become `None`, and "Renewal start date" is converted to 'YYYY-MM-DD' for the whole column at once.
+    - Seller and "Atb. par polisi" names are mapped to their "ID_PipeDrive" values.
     """
-        
-    policy_on_atb = get_value_in_same_row(data,
-                                           policy_number,
-                                           "Polise",
-                                           "Atb. par polisi",
-                                           client_name) or None
-    renewed_offer_quantity = get_value_in_same_row(data,
-                                                   policy_number,
-                                                   "Polise",
-                                                   "Atjaunotais piedāvājums: numurs",
-                                                   client_name) or None
-    renewal_policy_quantity = get_value_in_same_row(data,
-                                                    policy_number,
-                                                    "Polise",
-                                                    "Atjaunotā polise: numurs",
-                                                    client_name) or None
-    renewed_policy_insurer = get_value_in_same_row(data,
-                                                   policy_number,
-                                                   "Polise",
-                                                   "Atjaunotā polise: apdrošinātājs",
-                                                   client_name) or None
-    policy_insurer = get_value_in_same_row(data, 
-                                           policy_number,
-                                           "Polise",
-                                           "Apdrošinātājs",
-                                           client_name) or None
-
-    status_label = get_value_in_same_row(data,
-                                         policy_number,
-                                         "Polise",
-                                         "Statuss",
-                                         client_name) or None
-    if status_label == "nav spēkā":
-        status = 40
-    elif status_label == "spēkā":
-        status = 41
-    else:
-        status = None
-
-    renewal_label = get_value_in_same_row(data,
-                                          policy_number,
-                                          "Polise",
-                                          "Atjaunojums",
-                                          client_name) or None
-    if renewal_label == "atjaunots":
-        renewal = 42
-    elif renewal_label == "atjaunošana nav sākta":
-        renewal = 43
-    else:
-        renewal = None
-
-    renewal_start_date_str = get_value_in_same_row(data,
-                                                   policy_number,
-                                                   "Polise",
-                                                   "Renewal start date",
-                                                   client_name) or None
-    if renewal_start_date_str is not None:
-        renewal_start_date = format_date(renewal_start_date_str)
-    else:
-        renewal_start_date = None
-
-    registration_certificate_no = get_value_in_same_row(data,
-                                                        policy_number,
-                                                        "Polise",
-                                                        "Reģ. apliecības nr.",
-                                                        client_name) or None
-    seller_list = get_value_in_same_row(data,
-                                        policy_number,
-                                        "Polise",
-                                        "Pārdevējs",
-                                        client_name) or None
-    seller = get_value_in_same_row(seller_data,
-                                   seller_list,
-                                   "Pārdevējs",
-                                   "ID_PipeDrive") or None
-    pipedrive_seller_option = seller_list if seller is None else int(seller)
-
-    policy_on_atb_list = get_value_in_same_row(data,
-                                                policy_number,
-                                                "Polise",
-                                                "Atb. par polisi",
-                                                client_name) or None
-    policy_on_atb = get_value_in_same_row(policy_on_atb_data,
-                                           policy_on_atb_list,
-                                           "Atb. par polisi",
-                                           "ID_PipeDrive") or None
-    pipedrive_policy_on_atb_option = policy_on_atb_list if policy_on_atb is None else int(policy_on_atb)
-
-    info = (policy_on_atb, renewed_offer_quantity, renewal_policy_quantity, renewed_policy_insurer,
+    COLUMNS = ("Atb. par polisi", "Atjaunotais piedāvājums: numurs", "Atjaunotā polise: numurs",
+               "Atjaunotā polise: apdrošinātājs", "Apdrošinātājs", "Statuss", "Atjaunojums",
+               "Renewal start date", "Reģ. apliecības nr.", "Pārdevējs")
+
+    # Every column `SheetIndex` reads, per worksheet (used to fetch only these columns)
+    DATA_COLUMNS = ("Polise", "Klients") + COLUMNS
+    SELLER_COLUMNS = ("Pārdevējs", "ID_PipeDrive")
+    POLICY_ON_ATB_COLUMNS = ("Atb. par polisi", "ID_PipeDrive")
+
+    STATUSES = {"nav spēkā": 40, "spēkā": 41}
+    RENEWALS = {"atjaunots": 42, "atjaunošana nav sākta": 43}
+
+    def __init__(self, data, seller_data, policy_on_atb_data):
+        import pandas
+
+        data = _blank_to_none(data.loc[:, ~data.columns.duplicated()].reindex(columns=self.DATA_COLUMNS))
+        data["Renewal start date"] = (
+            pandas.to_datetime(data["Renewal start date"], dayfirst=True, errors="coerce", format="mixed")
+            .dt.strftime("%Y-%m-%d")
+        )
+        data = _blank_to_none(data)
+
+        rows = list(zip(*(data[column] for column in self.COLUMNS)))
+        self.rows_by_client = {}
+        self.rows_by_policy = {}
+
+        for key, row in zip(zip(data["Polise"], data["Klients"]), rows):
+            self.rows_by_client.setdefault(key, row)
+            self.rows_by_policy.setdefault(key[0], row)
+
+        self.sellers = _column_map(seller_data, *self.SELLER_COLUMNS)
+        self.policy_on_atb_options = _column_map(policy_on_atb_data, *self.POLICY_ON_ATB_COLUMNS)
+        self.cache = {}
+
+    def info(self, policy_number, client_name=None):
+        """
+        Returns the `info` tuple for a policy.
+
+        Args:
+            policy_number (any): The value of the "Polise" column.
+            client_name (any, optional): The value the "Klients" column has to match. Ignored when `None`.
+
+        Returns:
+            tuple: (policy_on_atb, renewed_offer_quantity, renewal_policy_quantity, renewed_policy_insurer,
             status, renewal, renewal_start_date, registration_certificate_no, pipedrive_seller_option,
             pipedrive_policy_on_atb_option, policy_insurer)
 
-    print(info)
-    
-    return info
+        .. rubric:: Behavior
+        - Converts status and renewal labels into numeric codes:
+            - Status: "nav spēkā" → 40, "spēkā" → 41
+            - Renewal: "atjaunots" → 42, "atjaunošana nav sākta" → 43
+        - Seller and responsibility options fall back to their label if no Pipedrive ID is known.
+        - Returns `None` for every value that is missing, unrecognized, or invalid.
+        """
+        key = (policy_number, client_name)
+
+        if key not in self.cache:
+            if client_name is None:
+                row = self.rows_by_policy.get(policy_number)
+            else:
+                row = self.rows_by_client.get(key)
+
+            self.cache[key] = self._build_info(row or (None,) * len(self.COLUMNS))
+
+        return self.cache[key]
+
+    def contains(self, policy_number, client_name=None):
+        """
+        Returns `True` if the policy has a row in the main worksheet (for `client_name`, unless it is `None`).
+        """
+        if client_name is None:
+            return policy_number in self.rows_by_policy
+
+        return (policy_number, client_name) in self.rows_by_client
 
+    def _build_info(self, row):
+        (policy_on_atb_list, renewed_offer_quantity, renewal_policy_quantity, renewed_policy_insurer,
+         policy_insurer, status_label, renewal_label, renewal_start_date, registration_certificate_no,
+         seller_list) = row
+
+        seller = self.sellers.get(seller_list)
+        pipedrive_seller_option = seller_list if seller is None else int(seller)
+
+        policy_on_atb = self.policy_on_atb_options.get(policy_on_atb_list)
+        pipedrive_policy_on_atb_option = policy_on_atb_list if policy_on_atb is None else int(policy_on_atb)
+
+        return (policy_on_atb, renewed_offer_quantity, renewal_policy_quantity, renewed_policy_insurer,
+                self.STATUSES.get(status_label), self.RENEWALS.get(renewal_label), renewal_start_date,
+                registration_certificate_no, pipedrive_seller_option, pipedrive_policy_on_atb_option,
+                policy_insurer)
+
+
+def _blank_to_none(df):
+    """
+    Replaces NaN and empty strings with `None`, mirroring the `value or None` pattern of the lookups.
+    """
+    df = df.astype(object)
+    return df.where(df.notna() & (df != ""), None)
+
+
+def _column_map(df, search_column, target_column):
+    """
+    Maps the values of `search_column` to the first corresponding non-empty value of `target_column`.
+    """
+    df = _blank_to_none(df.loc[:, ~df.columns.duplicated()].reindex(columns=(search_column, target_column)))
+    df = df.drop_duplicates(subset=search_column, keep="first")
+    return {key: value for key, value in zip(df[search_column], df[target_column]) if key is not None}
 
 
 def get_value_in_same_row(df, search_value, search_column, target_column, client_name=None):
@@ -350,3 +351,75 @@ def format_date(date_str):
         return None
 
     return parsed_date.strftime("%Y-%m-%d")
+
+
+def json_fingerprint(data):
+    """
+    Computes a stable SHA-256 fingerprint of a JSON-serializable value.
+
+    Args:
+        data (any): The value to fingerprint.
+
+    Returns:
+        str: The hexadecimal digest of the canonical JSON representation.
+
+    Note:
+        - Keys are sorted, so dictionaries with the same content always produce the same fingerprint.
+    """
+    import hashlib
+    import json
+
+    encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_json_cache(path, ttl):
+    """
+    Reads a JSON cache file if it exists and is not older than `ttl` seconds.
+
+    Args:
+        path (str): The path of the cache file.
+        ttl (int | float): The maximum age of the file in seconds.
+
+    Returns:
+        any | None: The decoded content, or `None` if the file is missing, expired or unreadable.
+    """
+    import json
+    import os
+    import time
+
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    except (OSError, ValueError):
+        return None
+
+
+def save_json_cache(path, data):
+    """
+    Writes a JSON cache file atomically.
+
+    Args:
+        path (str): The path of the cache file.
+        data (any): The JSON-serializable content to store.
+
+    Note:
+        - The content is written to a temporary file first and then moved into place,
+          so a crash never leaves a half-written cache behind.
+    """
+    import json
+    import os
+
+    tmp_path = f"{path}.tmp"
+
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    except OSError as e:
+        print(f"'save_json_cache': Could not write '{path}': {e}")
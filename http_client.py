@@ -0,0 +1,253 @@
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+import recorder
+from rate_limiter import buckets_for, INSLY_HOST, PIPEDRIVE_HOST
+
+MAX_RETRIES = 10
+RETRY_DELAY = 5
+
+# Connection pool settings, shared by every session
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+CONNECTION_RETRIES = int(os.getenv('HTTP_CONNECTION_RETRIES', 3))
+
+# Methods that are safe to resend after a dropped connection.
+# Insly only uses POST for read-only queries, so it is safe to repeat there.
+IDEMPOTENT_METHODS = {
+    INSLY_HOST: frozenset({'GET', 'POST'}),
+}
+DEFAULT_IDEMPOTENT_METHODS = frozenset({'GET', 'PUT', 'PATCH', 'DELETE'})
+
+# Service label of every host in `metrics`; other hosts are labelled with their host name
+SERVICES = {
+    INSLY_HOST: 'insly',
+    PIPEDRIVE_HOST: 'pipedrive',
+}
+
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
+CONNECTION_STATS = {'requests': 0, 'connections': 0}
+STATS_LOCK = threading.Lock()
+
+
+def _count(key):
+    with STATS_LOCK:
+        CONNECTION_STATS[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    `HTTPAdapter` whose connection pools count every newly opened connection in `CONNECTION_STATS`.
+    Every exchange is written to the `recorder` archive when `HTTP_RECORD_PATH` is set.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        started = time.monotonic()
+        response = super().send(request, **kwargs)
+
+        if recorder.RECORD_PATH:
+            # Reads the body, so the recorded latency covers the whole response
+            response.content
+            recorder.record_exchange(request, response, time.monotonic() - started)
+
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    `HTTPAdapter` that answers every request from the `recorder` archive in `HTTP_REPLAY_PATH`
+    instead of the network.
+    """
+    def send(self, request, **kwargs):
+        return recorder.replay_exchange(request)
+
+
+def session_for(url):
+    """
+    Returns the long-lived `requests.Session` used for the host of `url`.
+
+    Args:
+        url (str): The request URL.
+
+    Returns:
+        requests.Session: A session with a keep-alive connection pool of `POOL_SIZE` connections.
+
+    .. rubric:: Behavior
+    - Creates one session per host (and port) on first use and reuses it for the rest of the process.
+    - Mounts a `PooledHTTPAdapter` that transparently retries dropped connections up to
+      `CONNECTION_RETRIES` times, but only for methods listed as idempotent for that host.
+    - Mounts a `ReplayAdapter` instead when `HTTP_REPLAY_PATH` is set, so no request leaves the process.
+    """
+    host = urlparse(url).netloc
+
+    with SESSIONS_LOCK:
+        if host not in SESSIONS:
+            retries = Retry(
+                total=CONNECTION_RETRIES,
+                connect=CONNECTION_RETRIES,
+                read=CONNECTION_RETRIES,
+                status=0,
+                backoff_factor=0.5,
+                allowed_methods=IDEMPOTENT_METHODS.get(host, DEFAULT_IDEMPOTENT_METHODS),
+                raise_on_status=False
+            )
+            if recorder.REPLAY_PATH:
+                adapter = ReplayAdapter()
+            else:
+                adapter = PooledHTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retries)
+
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            SESSIONS[host] = session
+
+        return SESSIONS[host]
+
+
+def connection_stats():
+    """
+    Summarizes how well keep-alive connections were reused.
+
+    Returns:
+        dict: `requests`, `connections` (newly opened) and `reuse_rate` (share of requests sent on an existing connection).
+    """
+    with STATS_LOCK:
+        stats = dict(CONNECTION_STATS)
+
+    stats['reuse_rate'] = round(1 - stats['connections'] / stats['requests'], 3) if stats['requests'] else 0.0
+    return stats
+
+
+def call_site(url, name=None):
+    """
+    Returns the `(service, call)` labels a request is recorded under in `metrics`.
+
+    Args:
+        url (str): The request URL.
+        name (str | None): The call site name given by the caller. Defaults to the URL path
+            with numeric IDs replaced by `{id}`.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc
+
+    if name is None:
+        name = re.sub(r'/\d+(?=/|$)', '/{id}', parsed.path)
+
+    return SERVICES.get(host, host), name
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+
+    return len(body.encode('utf-8') if isinstance(body, str) else body)
+
+
+def request(method, url, name=None, **kwargs):
+    """
+    Sends an HTTP request through the shared per-host rate limiter.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL.
+        name (str | None): The call site recorded in `metrics`, e.g. `'Search.deal'`. Defaults to the URL path.
+        **kwargs: Passed on to `requests.Session.request()` (`params`, `json`, `headers`, ...).
+
+    Returns:
+        requests.Response: The response of the last attempt.
+
+    .. rubric:: Behavior
+    - Sends the request on the pooled session of the host (see `session_for()`),
+      with a default timeout of (`CONNECT_TIMEOUT`, `READ_TIMEOUT`).
+    - Takes a token from every bucket returned by `buckets_for(url)` before sending.
+    - Lets the buckets adjust to the `Retry-After` / `x-ratelimit-*` headers of the response.
+    - On `429`, retries up to `MAX_RETRIES` times. The wait comes from the server headers when present,
+      otherwise from exponential backoff based on `RETRY_DELAY`.
+    - Any other status code is returned to the caller unchanged.
+    - Records every attempt in `metrics` under `call_site(url, name)`: status, latency, bytes,
+      the time spent waiting for the rate limiter and the `429` retries.
+    """
+    buckets = buckets_for(url)
+    session = session_for(url)
+    service, name = call_site(url, name)
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    response = None
+
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            metrics.record_retry(service, name)
+
+        metrics.record_rate_limit_wait(service, name, sum(bucket.acquire() for bucket in buckets))
+
+        _count('requests')
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            metrics.record_call(service, name, type(e).__name__, time.monotonic() - started)
+            raise
+
+        metrics.record_call(service, name, response.status_code, time.monotonic() - started,
+                            bytes_sent=_body_size(getattr(response.request, 'body', None)),
+                            bytes_received=len(response.content or b''))
+
+        delay = None
+        for bucket in buckets:
+            delay = bucket.observe(response) or delay
+
+        if response.status_code != 429:
+            return response
+
+        if delay is None:
+            delay = RETRY_DELAY * (2 ** attempt)
+            buckets[-1].pause(delay)
+
+        print(f"Rate limit hit for '{url}'. Retrying in {delay} seconds...")
+
+    print(f"Max retries exceeded for '{url}'.")
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request('PATCH', url, **kwargs)
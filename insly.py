@@ -1,20 +1,70 @@
-import requests
+import asyncio
+import http_client
+import threading
 import time
 import os
+import weakref
+import requests
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from helper import format_objects_to_html
+from helper import format_objects_to_html, load_json_cache, save_json_cache, json_fingerprint, OBJECTS_NOTE_HEADING
+from rate_limiter import INSLY_BASE_URL
 
 load_dotenv()
 
 INSLY_TOKEN = os.getenv('BEARER_TOKEN')
-MAX_RETRIES = 10
-RETRY_DELAY = 5
-retry_buffer = []
+
+# Policies that ended after `LATEST_DATE` or end within `WINDOW_DAYS` days are synchronized
+LATEST_DATE = datetime(2024, 1, 1)
+WINDOW_DAYS = 30
 
 # Pipedrive ID of user Darija (default value)
 DEFAULT_OWNER = 22609901
-BROKER_JSON = None
+
+# The broker directory (`system/getperson`) is reloaded after `BROKER_TTL` seconds,
+# or when a broker OID is missing from it, at most once per `BROKER_MISS_INTERVAL` seconds
+BROKER_TTL = int(os.getenv('BROKER_TTL', 6 * 60 * 60))
+BROKER_MISS_INTERVAL = int(os.getenv('BROKER_MISS_INTERVAL', 5 * 60))
+
+# Classifier payload is identical for every lookup, so it is downloaded once per run.
+# Set `CLASSIFIER_CACHE_PATH` to also keep it on disk between runs for `CLASSIFIER_CACHE_TTL` seconds.
+CLASSIFIER_CACHE_PATH = os.getenv('CLASSIFIER_CACHE_PATH')
+CLASSIFIER_CACHE_TTL = int(os.getenv('CLASSIFIER_CACHE_TTL', 24 * 60 * 60))
+CLASSIFIER_JSON = None
+CLASSIFIER_HASH = None
+CLASSIFIER_STATS = {'hits': 0, 'misses': 0, 'downloads': 0, 'disk_loads': 0}
+CLASSIFIER_LOCK = threading.Lock()
+
+# Maximum number of Insly requests in flight per event loop (see `run_async()`)
+INSLY_CONCURRENCY = int(os.getenv('INSLY_CONCURRENCY', 5))
+SEMAPHORES = weakref.WeakKeyDictionary()
+
+# Guards the `getpolicy` caches passed to `get_policy()`
+POLICY_LOCK = threading.Lock()
+
+
+async def run_async(func, *args, **kwargs):
+    """
+    Runs a blocking Insly call in a worker thread, limited to `INSLY_CONCURRENCY` concurrent calls per event loop.
+
+    Args:
+        func (Callable): The blocking function, e.g. `http_client.post` or `get_policy`.
+        *args, **kwargs: Passed on to `func`.
+
+    Returns:
+        Any: The return value of `func`.
+
+    Note:
+        - Requests still go through `http_client`, so they share its pooled sessions, rate limiter and `429` handling.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = SEMAPHORES.get(loop)
+
+    if semaphore is None:
+        semaphore = SEMAPHORES[loop] = asyncio.Semaphore(INSLY_CONCURRENCY)
+
+    async with semaphore:
+        return await asyncio.to_thread(func, *args, **kwargs)
 
 
 def get_customer_list():
@@ -35,13 +85,13 @@ def get_customer_list():
         - Uses the `INSLY_TOKEN` for authentication.
         - Expects the response JSON to contain a list of customers under the `customers` key.
     """
-    url = 'https://vingo-api.insly.com/api/customer/getcustomerlist'
+    url = f'{INSLY_BASE_URL}/customer/getcustomerlist'
     headers = {
         'Authorization': f'Bearer {INSLY_TOKEN}'
     }
 
     print('Fetching OID\'s...')
-    response = requests.post(url=url, json={}, headers=headers)
+    response = http_client.post(url=url, json={}, headers=headers, name='get_customer_list')
 
     if response.status_code == 200:
         data = response.json()
@@ -54,13 +104,22 @@ def get_customer_list():
         return None
 
 
-def get_customer_policy(oid, counter):
+async def get_customer_list_async():
+    """
+    Coroutine version of `get_customer_list()`.
+    """
+    return await run_async(get_customer_list)
+
+
+async def get_customer_policy_async(oid, counter, sync_state=None):
     """
     Retrieves and processes customer policy details.
 
     Args:
         oid (int): The customer ID.
         counter (int): A counter for tracking retries or processing steps.
+        sync_state (SyncState | None): When given, the customer's policy end dates are stored in its index.
+            Defaults to `None`.
 
     Returns:
         tuple[list, list, list, list]:
@@ -69,112 +128,315 @@ def get_customer_policy(oid, counter):
             - List of address-related data tuples.
             - List of formatted HTML representations of policy objects.
 
+    Raises:
+        requests.HTTPError: If Insly answers with an error status (e.g. `5xx`, or `429` once the retries of
+            `http_client` are used up), so the customer is retried instead of being marked done.
+
     .. rubric:: Behavior
     - Sends a request to fetch customer policy data.
-    - If `BROKER_JSON` is not loaded, fetches it using `get_broker_json()`.
+    - If `sync_state` is given, stores the customer's policy end dates and `next_relevant_date()` in its index.
+    - Refreshes the broker directory `BROKERS` first if it is stale or lacks the customer's broker;
+      loads the classifier payload once up front.
     - Iterates through customer policies and evaluates their expiration status.
     - If a policy is expired or ending within 21 days, it processes and formats data.
-    - Calls `fetch_customer_data()` and `fetch_policy_data()` for extraction.
+    - Calls `fetch_customer_data()` and `policy_details()` for extraction, in worker threads like every other blocking
+      call: their `BROKERS` and classifier lookups may reload the directory or wait for another thread's reload.
+    - Fetches the objects of all in-range policies concurrently with `get_policy_object_async()`.
     - Determines policy installment status and assigns an appropriate category.
     - Returns structured lists of customer, policy, address, and policy object details.
     """
-    url = 'https://vingo-api.insly.com/api/customer/getpolicy'
+    url = f'{INSLY_BASE_URL}/customer/getpolicy'
     body = {"customer_oid": oid, "get_inactive": 0}
     headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
 
-    for attempt in range(MAX_RETRIES):
-        response = requests.post(url=url, json=body, headers=headers)
+    response = await run_async(http_client.post, url=url, json=body, headers=headers, name='get_customer_policy')
 
-        if response.status_code == 200:
-            global BROKER_JSON
+    if response.status_code == 200:
+        data = response.json()
+        customer_info = []
+        policy_info = []
+        address_info = []
+        object_info = []
+        object_oids = []
+        payment_table = []
+        customer_info_added = False
+        latest_date = LATEST_DATE
+        current_date = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+        future_date = current_date + timedelta(days=WINDOW_DAYS)
 
-            data = response.json()
-            customer_info = []
-            policy_info = []
-            address_info = []
-            object_info = []
-            payment_table = []
-            customer_info_added = False
-            latest_date = datetime(2024, 1, 1)
-            current_date = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
-            future_date = current_date + timedelta(days=30)
+        if sync_state is not None:
+            end_dates = policy_end_dates(data)
+            sync_state.index_customer(oid, end_dates, next_relevant_date(end_dates, current_date))
 
-            if BROKER_JSON is None:
-                BROKER_JSON = get_broker_json()
+        if BROKERS.needs_refresh(data.get('broker_person_oid')):
+            await run_async(BROKERS.refresh, data.get('broker_person_oid'))
 
-            if 'policy' not in data:
-                print(f"#{counter} Customer {oid}: No policies found.")
-                return [], [], [], [], []
+        await run_async(get_classifier_json)
 
-            for policy in data['policy']:
-                p_date_end_raw = policy.get('policy_date_end', '')
-                try:
-                    exp_date = datetime.strptime(p_date_end_raw, "%d.%m.%Y")
-                except ValueError:
-                    print(f"#{counter} Skipping policy with invalid date '{p_date_end_raw}' for customer {oid}")
-                    continue
+        if 'policy' not in data:
+            print(f"#{counter} Customer {oid}: No policies found.")
+            return [], [], [], [], []
 
-                if latest_date <= exp_date < current_date or current_date <= exp_date < future_date:
-                    if latest_date <= exp_date < current_date:
-                        print(f"#{counter} Customer {oid}:"
-                              f" Policy {policy['policy_no']} closed after {latest_date}.")
+        for policy in data['policy']:
+            p_date_end_raw = policy.get('policy_date_end', '')
+            try:
+                exp_date = datetime.strptime(p_date_end_raw, "%d.%m.%Y")
+            except ValueError:
+                print(f"#{counter} Skipping policy with invalid date '{p_date_end_raw}' for customer {oid}")
+                continue
 
-                    elif current_date <= exp_date < future_date:
-                        print(f"#{counter} Customer {oid}:"
-                              f" Policy {policy['policy_no']} ends within 30 days.")
+            if latest_date <= exp_date < current_date or current_date <= exp_date < future_date:
+                if latest_date <= exp_date < current_date:
+                    print(f"#{counter} Customer {oid}:"
+                          f" Policy {policy['policy_no']} closed after {latest_date}.")
 
-                    if not customer_info_added:
-                        fetched_a_info, fetched_c_info = fetch_customer_data(data)
-                        address_info.append(fetched_a_info)
-                        customer_info.append(fetched_c_info)
-                        customer_info_added = True
+                elif current_date <= exp_date < future_date:
+                    print(f"#{counter} Customer {oid}:"
+                          f" Policy {policy['policy_no']} ends within 30 days.")
 
-                    fetched_p_info, fetched_o_info = fetch_policy_data(data, policy)
+                if not customer_info_added:
+                    fetched_a_info, fetched_c_info = await run_async(fetch_customer_data, data)
+                    address_info.append(fetched_a_info)
+                    customer_info.append(fetched_c_info)
+                    customer_info_added = True
 
-                    fetched_p_info = list(fetched_p_info)
+                fetched_p_info = await run_async(policy_details, data, policy)
 
-                    fetched_p_info[7] = None # Default
+                fetched_p_info = list(fetched_p_info)
 
-                    if latest_date <= exp_date < current_date:
-                        fetched_p_info[7] = 'lost'  # Default if expired
+                fetched_p_info[7] = None # Default
 
-                        if policy.get('payment'):
-                            last_installment = max(policy['payment'], key=lambda x: x['policy_installment_num'])
+                if latest_date <= exp_date < current_date:
+                    fetched_p_info[7] = 'lost'  # Default if expired
 
-                            if last_installment['policy_installment_num'] == policy['policy_installments']:
-                                status = last_installment['policy_installment_status']
+                    if policy.get('payment'):
+                        last_installment = max(policy['payment'], key=lambda x: x['policy_installment_num'])
 
-                                if status == 12:  # Fully paid
-                                    fetched_p_info[7] = 'won'
+                        if last_installment['policy_installment_num'] == policy['policy_installments']:
+                            status = last_installment['policy_installment_status']
 
-                    fetched_p_info = tuple(fetched_p_info)
+                            if status == 12:  # Fully paid
+                                fetched_p_info[7] = 'won'
 
-                    payment_table = fetch_payment_data(policy)
+                fetched_p_info = tuple(fetched_p_info)
 
-                    # if fetched_p_info[7] != 'open':
-                    #     return [], [], [], []
+                payment_table = fetch_payment_data(policy)
 
-                    policy_info.append(fetched_p_info)
-                    object_info.append(fetched_o_info)
-                else:
-                    print(f"#{counter} Customer {oid}: Policy {policy['policy_no']} out of range.")
+                # if fetched_p_info[7] != 'open':
+                #     return [], [], [], []
 
-            return customer_info, policy_info, address_info, object_info, payment_table
+                policy_info.append(fetched_p_info)
+                object_oids.append(fetched_p_info[10])
+            else:
+                print(f"#{counter} Customer {oid}: Policy {policy['policy_no']} out of range.")
+
+        object_info = list(await asyncio.gather(*(get_policy_object_async(p_oid) for p_oid in object_oids)))
+
+        return customer_info, policy_info, address_info, object_info, payment_table
+
+    else:
+        print(f"'get_customer_policy': Request failed with status code {response.status_code}")
+        response.raise_for_status()
+        raise requests.HTTPError(f"Unexpected status code {response.status_code}", response=response)
+
+
+def get_customer_policy(oid, counter, sync_state=None):
+    """
+    Synchronous wrapper around `get_customer_policy_async()` for callers without an event loop.
+    """
+    return asyncio.run(get_customer_policy_async(oid, counter, sync_state))
+
+
+class BrokerDirectory:
+    """
+    Insly brokers indexed by person OID, shared by every worker.
+
+    Args:
+        ttl (float): The number of seconds after which the directory is reloaded. Defaults to `BROKER_TTL`.
+        miss_interval (float): The minimum number of seconds between reloads caused by an unknown broker OID.
+            Defaults to `BROKER_MISS_INTERVAL`.
+
+    .. rubric:: Behavior
+    - Loads the `system/getperson` payload with `get_broker_json()` on first use.
+    - Precomputes one `(owner, name)` entry per broker, keyed by both the `int` and `str` form of its OID:
+      `owner` is the Pipedrive user ID stored in the broker's fax field (`None` if empty, `'Pipedrive'` or not numeric).
+    - Reloads when the directory is older than `ttl`, or when a broker OID is missing from it.
+    - Keeps the previous entries if a reload fails.
+    """
+    def __init__(self, ttl=BROKER_TTL, miss_interval=BROKER_MISS_INTERVAL):
+        self.ttl = ttl
+        self.miss_interval = miss_interval
+        self.entries = {}
+        self.loaded_at = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def index(payload):
+        """
+        Builds the OID → `(owner, name)` entries of a `system/getperson` payload.
+        """
+        entries = {}
+
+        for broker_oid, person in (payload.get('person') or {}).items():
+            fax = person.get('broker_person_fax')
+
+            try:
+                owner = int(fax) if fax not in (None, '', 'Pipedrive') else None
+            except (TypeError, ValueError):
+                print(f"Broker {broker_oid}: Fax field '{fax}' is not a Pipedrive user ID.")
+                owner = None
+
+            entry = (owner, person.get('broker_person_name'))
+            entries[str(broker_oid)] = entry
+
+            if str(broker_oid).isdigit():
+                entries[int(broker_oid)] = entry
+
+        return entries
+
+    def needs_refresh(self, broker_oid=None):
+        """
+        Checks whether the directory was never loaded, is older than `ttl`, or lacks `broker_oid`.
+
+        Note:
+            - A failed load or a missing OID triggers another load only once `miss_interval` seconds have passed.
+        """
+        now = time.monotonic()
+
+        if self.loaded_at is not None and now - self.loaded_at < self.ttl:
+            if broker_oid in (None, 0) or broker_oid in self.entries:
+                return False
+
+        return self.checked_at is None or now - self.checked_at >= min(self.miss_interval, self.ttl)
+
+    def refresh(self, broker_oid=None):
+        """
+        Reloads the directory with `get_broker_json()` unless another thread just did. Safe to call from several threads.
+        """
+        with self.lock:
+            if not self.needs_refresh(broker_oid):
+                return
+
+            self.checked_at = time.monotonic()
+            payload = get_broker_json()
+
+            if payload is None:
+                return
+
+            self.entries = self.index(payload)
+            self.loaded_at = self.checked_at
+            print(f"Broker directory loaded: {len(payload.get('person') or {})} brokers.")
+
+    def get(self, broker_oid):
+        """
+        Returns the `(owner, name)` entry of a broker, reloading the directory first if needed.
+
+        Args:
+            broker_oid (int | str): The broker's person OID.
+
+        Returns:
+            tuple[int | None, str | None] | None: The entry, or `None` if the broker is unknown.
+        """
+        if self.needs_refresh(broker_oid):
+            self.refresh(broker_oid)
+
+        return self.entries.get(broker_oid)
+
+    def owner(self, broker_oid):
+        """
+        Returns the Pipedrive owner ID for a broker, or `DEFAULT_OWNER` if there is none.
+        """
+        if not broker_oid:
+            return DEFAULT_OWNER
+
+        entry = self.get(broker_oid)
+        return DEFAULT_OWNER if entry is None or entry[0] is None else entry[0]
+
+    def name(self, broker_oid):
+        """
+        Returns the display name of a broker, or `None` if it is unknown.
+        """
+        if not broker_oid:
+            return None
+
+        entry = self.get(broker_oid)
+        return None if entry is None else entry[1]
 
-        elif response.status_code == 429:
-            print(f"Rate limit hit for get_customer_policy. Retrying in {RETRY_DELAY * (2 ** attempt)} seconds...")
-            time.sleep(RETRY_DELAY * (2 ** attempt))
-        else:
-            print(f"'get_customer_policy': Request failed with status code {response.status_code}")
-            return [], [], [], [], []
 
-    print("Max retries exceeded for get_customer_policy.")
-    return [], [], [], [], []
+BROKERS = BrokerDirectory()
+
+
+def policy_phase(exp_date, current_date):
+    """
+    Classifies a policy end date relative to the synchronization window.
+
+    Args:
+        exp_date (datetime): The policy end date.
+        current_date (datetime): Today at midnight.
+
+    Returns:
+        str | None: `'closed'` if the policy ended between `LATEST_DATE` and today,
+        `'ending'` if it ends within `WINDOW_DAYS` days, otherwise `None`.
+    """
+    if LATEST_DATE <= exp_date < current_date:
+        return 'closed'
+
+    if current_date <= exp_date < current_date + timedelta(days=WINDOW_DAYS):
+        return 'ending'
+
+    return None
+
+
+def policy_end_dates(data):
+    """
+    Returns the end dates of every policy in a `customer/getpolicy` response, skipping invalid ones.
+    """
+    end_dates = []
+
+    for policy in data.get('policy', []):
+        try:
+            end_dates.append(datetime.strptime(policy.get('policy_date_end', ''), "%d.%m.%Y"))
+        except ValueError:
+            continue
+
+    return end_dates
+
+
+def next_relevant_date(end_dates, current_date):
+    """
+    Computes the first day on which a customer has a policy in the synchronization window.
+
+    Args:
+        end_dates (list[datetime]): The end dates of the customer's policies.
+        current_date (datetime): Today at midnight.
+
+    Returns:
+        date | None: Today if a policy is in the window already, otherwise the day the earliest upcoming policy
+        enters it (`WINDOW_DAYS - 1` days before its end date). `None` if no policy will ever be in the window.
+
+    Note:
+        - Policies that ended before `LATEST_DATE` never enter the window, so customers that only have those
+          are left alone until the next full index refresh.
+    """
+    upcoming = []
+
+    for exp_date in end_dates:
+        if policy_phase(exp_date, current_date) is not None:
+            return current_date.date()
+
+        if exp_date >= current_date:
+            upcoming.append(exp_date)
+
+    if not upcoming:
+        return None
+
+    return (min(upcoming) - timedelta(days=WINDOW_DAYS - 1)).date()
 
 
 def get_classifier_value(value, classifier_field_name: str):
     """
-    Retrieves the classifier value from the Insly API.
+    Retrieves the classifier value from the cached Insly classifier payload.
 
     Args:
         value (str): The key to look up within the classifier field.
@@ -184,146 +446,216 @@ def get_classifier_value(value, classifier_field_name: str):
         str | None: The corresponding classifier value if found, otherwise returns the original `value` or `None` if the request fails.
 
     .. rubric:: Behavior
-    - Sends a POST request to the Insly API to retrieve classifier mappings.
-    - Extracts and returns the corresponding value from the classifier field if found.
-    - If the request fails with a `429` status code, retries with exponential backoff.
-    - If the request fails with another status code, logs an error message and returns `None`.
-    - Stops retrying after exceeding `MAX_RETRIES`.
+    - Loads the classifier payload through `get_classifier_json()` (at most one download per run).
+    - Resolves the value with a dictionary lookup; unknown keys fall back to the original `value`.
+    - If the payload could not be loaded, returns `None`.
+    """
+    classifier = get_classifier_json()
 
-    Note:
-        - Uses `INSLY_TOKEN` for authentication.
-        - Implements exponential backoff with `RETRY_DELAY` to handle rate limits.
+    if classifier is None:
+        return None
+
+    return classifier.get(classifier_field_name, {}).get(value, value)
+
+
+def get_classifier_json(force_refresh=False):
     """
-    url = 'https://vingo-api.insly.com/api/policy/getclassifier'
-    headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
+    Returns the Insly classifier payload, downloading it only when no valid copy is cached.
 
-    for attempt in range(MAX_RETRIES):
-        response = requests.post(url=url, json={}, headers=headers)
+    Args:
+        force_refresh (bool): Ignores the in-memory and on-disk copies when `True`. Defaults to `False`.
 
-        if response.status_code == 200:
-            data = response.json()
-            return data.get(classifier_field_name, {}).get(value, value)
+    Returns:
+        dict | None: The classifier payload, or `None` if it could not be fetched.
 
-        elif response.status_code == 429:
-            print(f"Rate limit hit for get_classifier_value. Retrying in {RETRY_DELAY * (2 ** attempt)} seconds...")
-            time.sleep(RETRY_DELAY * (2 ** attempt))
-        else:
-            print(f"'get_classifier_value': Request failed with status code {response.status_code}")
-            return None
+    .. rubric:: Behavior
+    - Returns the in-memory copy (`CLASSIFIER_JSON`) when it has already been loaded during this run.
+    - Counts in-memory lookups as hits and everything else as misses in `CLASSIFIER_STATS`.
+    - Otherwise tries the on-disk copy at `CLASSIFIER_CACHE_PATH` if it is younger than `CLASSIFIER_CACHE_TTL`;
+      a malformed file is treated as a miss.
+    - Otherwise downloads it with `fetch_classifier_json()` and writes it back to disk.
+    - Keeps the payload hash in `CLASSIFIER_HASH` and reports when a download changed the content.
+    - Serializes loading with `CLASSIFIER_LOCK`, so concurrent workers trigger a single download.
+    """
+    with CLASSIFIER_LOCK:
+        return _load_classifier_json(force_refresh)
 
-    print("Max retries exceeded for get_classifier_value.")
-    return None
 
+def _load_classifier_json(force_refresh):
+    global CLASSIFIER_JSON, CLASSIFIER_HASH
 
-def get_policy_object(policy_oid):
+    if CLASSIFIER_JSON is not None and not force_refresh:
+        CLASSIFIER_STATS['hits'] += 1
+        return CLASSIFIER_JSON
+
+    CLASSIFIER_STATS['misses'] += 1
+
+    if CLASSIFIER_CACHE_PATH and not force_refresh:
+        cached = load_json_cache(CLASSIFIER_CACHE_PATH, CLASSIFIER_CACHE_TTL)
+
+        if (isinstance(cached, dict) and 'data' in cached
+                and cached.get('hash') == json_fingerprint(cached['data'])):
+            CLASSIFIER_JSON, CLASSIFIER_HASH = cached['data'], cached['hash']
+            CLASSIFIER_STATS['disk_loads'] += 1
+            return CLASSIFIER_JSON
+
+    data = fetch_classifier_json()
+
+    if data is None:
+        return CLASSIFIER_JSON
+
+    data_hash = json_fingerprint(data)
+    if CLASSIFIER_HASH is not None and CLASSIFIER_HASH != data_hash:
+        print("Classifier payload has changed since the last download.")
+
+    CLASSIFIER_JSON, CLASSIFIER_HASH = data, data_hash
+    CLASSIFIER_STATS['downloads'] += 1
+
+    if CLASSIFIER_CACHE_PATH:
+        save_json_cache(CLASSIFIER_CACHE_PATH, {'hash': data_hash, 'data': data})
+
+    return CLASSIFIER_JSON
+
+
+def clear_classifier_cache():
     """
-    Retrieves and formats policy objects as HTML.
+    Drops the in-memory classifier payload and resets `CLASSIFIER_STATS`, so the next run reloads it
+    from disk (while younger than `CLASSIFIER_CACHE_TTL`) or from Insly.
 
-    Args:
-        policy_oid (str): The unique identifier of the policy.
+    Note:
+        - `CLASSIFIER_HASH` is kept, so a changed payload is still reported after the next download.
+    """
+    global CLASSIFIER_JSON
+
+    with CLASSIFIER_LOCK:
+        CLASSIFIER_JSON = None
+        CLASSIFIER_STATS.update(dict.fromkeys(CLASSIFIER_STATS, 0))
+
+
+def fetch_classifier_json():
+    """
+    Downloads the classifier payload from the Insly API.
 
     Returns:
-        str: An HTML-formatted string containing policy object details or an error message.
+        dict | None: The classifier payload if the request succeeds, otherwise `None`.
 
     .. rubric:: Behavior
-    - Sends a POST request to the Insly API to fetch policy details, including objects.
-    - If objects are found, formats them into an HTML list using `format_objects_to_html`.
-    - If no objects are found, returns a placeholder HTML message.
-    - If the request fails with a `429` status code, retries with exponential backoff.
-    - If the request fails with another status code, logs an error and returns an error message.
-    - Stops retrying after exceeding `MAX_RETRIES`.
+    - Sends a POST request to the Insly API to retrieve classifier mappings.
+    - If the request fails, logs an error message and returns `None`.
 
     Note:
         - Uses `INSLY_TOKEN` for authentication.
-        - Implements exponential backoff with `RETRY_DELAY` to handle rate limits.
+        - Rate limits (`429`) are handled by `http_client.request()`.
     """
-    url = 'https://vingo-api.insly.com/api/policy/getpolicy'
-    body = {"policy_oid": policy_oid, "return_objects": "1"}
+    url = f'{INSLY_BASE_URL}/policy/getclassifier'
     headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
 
-    for attempt in range(MAX_RETRIES):
-        response = requests.post(url=url, json=body, headers=headers)
+    response = http_client.post(url=url, json={}, headers=headers, name='get_classifier_json')
 
-        if response.status_code == 200:
-            data = response.json()
-            if "objects" in data and data["objects"]:
-                return format_objects_to_html(data["objects"])
-            else:
-                return "<p>No objects found for this policy.</p>"
-
-        elif response.status_code == 429:
-            print(f"Rate limit hit for get_policy_object. Retrying in {RETRY_DELAY * (2 ** attempt)} seconds...")
-            time.sleep(RETRY_DELAY * (2 ** attempt))
-        else:
-            print(f"'get_policy_object': '{policy_oid}' Request failed with status code {response.status_code}")
-            return "<p>Error fetching policy objects.</p>"
+    if response.status_code == 200:
+        return response.json()
 
-    print("Max retries exceeded for get_policy_object.")
-    return "<p>Error fetching policy objects.</p>"
+    print(f"'get_classifier_value': Request failed with status code {response.status_code}")
+    return None
 
 
-def get_broker_person_fax(broker_oid):
+def get_policy(policy_oid, cache=None):
     """
-    Retrieves the fax number of a broker's person entry from `BROKER_JSON`.
+    Fetches the details of a policy, including its objects and payments, from the Insly API.
 
     Args:
-        broker_oid (str or int): The unique identifier of the broker.
+        policy_oid (str): The unique identifier of the policy.
+        cache (dict | None): Payloads already fetched by the calling job, keyed by policy OID.
+            Defaults to `None` (no caching).
 
     Returns:
-        str or None: The broker's fax number if available; otherwise, None.
+        dict | None: The `getpolicy` payload, or `None` if the request failed.
 
     .. rubric:: Behavior
-    - Checks if `broker_oid` exists in `BROKER_JSON['person']`.
-    - If `broker_person_fax` is missing, empty, or set to "Pipedrive", returns None.
-    - Otherwise, returns the stored fax number.
+    - Returns the payload from `cache` if the policy was already fetched by the job.
+    - Otherwise sends a POST request to `/api/policy/getpolicy` (always with `return_objects`,
+      so that every caller can share the same payload) and stores a successful response in `cache`.
+    - Failed requests are not cached, so the next call tries again.
 
     Note:
-        - Assumes `BROKER_JSON` is a global dictionary containing broker data.
+        - The caller owns `cache` and drops it when its job ends, so payment and expiry data are never stale
+          and payloads are not kept longer than needed.
     """
-    if str(broker_oid) not in BROKER_JSON['person']:
-        return
+    if cache is not None:
+        with POLICY_LOCK:
+            if policy_oid in cache:
+                return cache[policy_oid]
 
-    broker_data = BROKER_JSON['person'][str(broker_oid)]
+    url = f'{INSLY_BASE_URL}/policy/getpolicy'
+    body = {"policy_oid": policy_oid, "return_objects": "1"}
+    headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
 
-    if not 'broker_person_fax' in broker_data:
-        return
+    response = http_client.post(url=url, json=body, headers=headers, name='get_policy')
 
-    if broker_data['broker_person_fax'] == '':
-        return
+    if response.status_code != 200:
+        print(f"'get_policy': '{policy_oid}' Request failed with status code {response.status_code}")
+        return None
 
-    if broker_data['broker_person_fax'] == 'Pipedrive':
-        return
+    policy = response.json()
 
-    return broker_data['broker_person_fax']
+    if cache is None:
+        return policy
 
+    with POLICY_LOCK:
+        return cache.setdefault(policy_oid, policy)
 
-def get_broker_person_name(broker_oid):
+
+async def get_policy_async(policy_oid, cache=None):
+    """
+    Coroutine version of `get_policy()`.
+    """
+    return await run_async(get_policy, policy_oid, cache)
+
+
+async def get_policy_object_async(policy_oid):
+    """
+    Coroutine version of `get_policy_object()`.
     """
-    Retrieves the name of a broker's person entry from `BROKER_JSON`.
+    return format_policy_objects(await get_policy_async(policy_oid))
+
+
+def get_policy_object(policy_oid):
+    """
+    Retrieves and formats policy objects as HTML.
 
     Args:
-        broker_oid (str or int): The unique identifier of the broker.
+        policy_oid (str): The unique identifier of the policy.
 
     Returns:
-        str or None: The broker's name if available; otherwise, None.
+        str: An HTML-formatted string containing policy object details or an error message.
 
     .. rubric:: Behavior
-    - Checks if `broker_oid` exists in `BROKER_JSON['person']`.
-    - If `broker_person_name` is missing, returns None.
-    - Otherwise, returns the stored name.
+    - Fetches the policy details, including objects, through `get_policy()`.
+    - If objects are found, formats them into an HTML list using `format_objects_to_html`.
+    - If no objects are found, returns a placeholder HTML message.
+    - If the request fails, returns an error message.
 
     Note:
-        - Assumes `BROKER_JSON` is a global dictionary containing broker data.
+        - Uses `INSLY_TOKEN` for authentication.
+        - Rate limits (`429`) are handled by `http_client.request()`.
     """
-    if str(broker_oid) not in BROKER_JSON['person']:
-        return
+    return format_policy_objects(get_policy(policy_oid))
+
 
-    broker_data = BROKER_JSON['person'][str(broker_oid)]
+def format_policy_objects(data):
+    """
+    Formats the objects of a `getpolicy` payload as HTML, or returns an error message if `data` is `None`.
 
-    if not 'broker_person_name' in broker_data:
-        return
+    Note:
+        - Every variant starts with `OBJECTS_NOTE_HEADING`, so the note is found again on the next sync.
+    """
+    if data is None:
+        return OBJECTS_NOTE_HEADING + "<p>Error fetching policy objects.</p>"
 
-    return broker_data['broker_person_name']
+    if "objects" in data and data["objects"]:
+        return format_objects_to_html(data["objects"])
+    else:
+        return OBJECTS_NOTE_HEADING + "<p>No objects found for this policy.</p>"
 
 
 def get_broker_json():
@@ -344,10 +676,10 @@ def get_broker_json():
         - Assumes `INSLY_TOKEN` is a valid authentication token.
         - The function prints error details in case of failure.
     """
-    url = 'https://vingo-api.insly.com/api/system/getperson'
+    url = f'{INSLY_BASE_URL}/system/getperson'
     headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
 
-    response = requests.post(url=url, json={}, headers=headers)
+    response = http_client.post(url=url, json={}, headers=headers, name='get_broker_json')
 
     if response.status_code == 200:
         return response.json()
@@ -373,10 +705,20 @@ def fetch_policy_data(data, policy):
     - Extracts policy details such as currency, sum, description, end date, number, and OID.
     - Converts the policy end date from "DD.MM.YYYY" format to "YYYY-MM-DD".
     - Retrieves classified values for the insurer and policy type.
-    - Fetches the broker's name using `get_broker_person_name()`.
+    - Looks up the broker's name in `BROKERS`.
     - Constructs a policy title using customer name, policy number, and policy type.
     - Retrieves policy objects in HTML format via `get_policy_object()`.
     """
+    policy_info = policy_details(data, policy)
+    object_info = get_policy_object(policy_info[10])
+
+    return policy_info, object_info
+
+
+def policy_details(data, policy):
+    """
+    Extracts the key details of a policy (the first element returned by `fetch_policy_data()`), without any policy request.
+    """
     p_currency = policy.get('policy_premium_currency') or 'EUR'
     p_summ = policy.get('policy_payment_sum')
     p_description = policy.get('policy_description')
@@ -386,16 +728,13 @@ def fetch_policy_data(data, policy):
     p_installment_status = ''  # It will be determined in the 'get_customer_policy'
     p_insurer = get_classifier_value(value=policy.get('policy_insurer'), classifier_field_name='insurer')
     p_type = get_classifier_value(value=policy.get('policy_type'), classifier_field_name='product')
-    p_broker_name = get_broker_person_name(data.get('broker_person_oid'))
+    p_broker_name = BROKERS.name(data.get('broker_person_oid'))
     p_title = data.get('customer_name') + " - " + p_number + " - " + p_type
     p_oid = policy.get('policy_oid')
     p_installments_number = policy.get('policy_installments')
 
-    policy_info = (p_title, p_currency, p_summ, p_description, p_date_end, p_number, p_insurer,
-                   p_installment_status, p_type, p_broker_name, p_oid, p_installments_number, p_date_start)
-    object_info = get_policy_object(p_oid)
-
-    return policy_info, object_info
+    return (p_title, p_currency, p_summ, p_description, p_date_end, p_number, p_insurer,
+            p_installment_status, p_type, p_broker_name, p_oid, p_installments_number, p_date_start)
 
 
 def fetch_customer_data(data):
@@ -411,7 +750,7 @@ def fetch_customer_data(data):
 
     .. rubric:: Behavior
     - Extracts customer address details if available; otherwise, assigns "N/A".
-    - Retrieves broker owner information using `get_broker_person_fax()`.
+    - Looks up the broker's Pipedrive owner ID in `BROKERS`.
     - If broker information is unavailable, defaults to `DEFAULT_OWNER`.
     - Parses customer-specific fields such as OID, name, email, phone numbers, type, and ID code.
     """
@@ -426,16 +765,7 @@ def fetch_customer_data(data):
         a_postal_code = 'N/A'
     address_info = (a_value, a_country, a_postal_code)
 
-    if data['broker_person_oid'] != 0:
-        c_owner = get_broker_person_fax(data['broker_person_oid'])
-
-        if c_owner is None:
-            c_owner = DEFAULT_OWNER
-        else:
-            c_owner = int(c_owner)
-
-    else:
-        c_owner = DEFAULT_OWNER
+    c_owner = BROKERS.owner(data['broker_person_oid'])
 
     c_oid = int(data.get('customer_oid'))
     c_name = data.get('customer_name')
@@ -450,74 +780,95 @@ def fetch_customer_data(data):
     return address_info, customer_info
 
 
-def is_it_fully_paid(policy_oid):
+def is_it_fully_paid(policy_oid, cache=None):
     """
     Checks if the given policy is fully paid based on its installments.
 
     Args:
         policy_oid (str): The unique identifier of the policy.
+        cache (dict | None): The `getpolicy` cache of the calling job (see `get_policy()`). Defaults to `None`.
 
     Returns:
         bool: `True` if the policy is fully paid, otherwise `False`.
 
     .. rubric:: Behavior
-    - Sends a `POST` request to the Insly API to fetch the policy details using `policy_oid`.
+    - Fetches the policy details through `get_policy()` (shared with `is_it_expired()` through `cache`).
     - Checks the list of payments for the policy, identifying the last installment.
     - Compares the number of the last installment with the total number of installments.
     - If the last installment number matches the total installments and its status is 12 (fully paid), returns `True`.
     - If the policy is not fully paid or no installment matches the criteria, returns `False`.
-    - If the request fails, prints an error message with the status code and returns `False`.
+    - If the request fails, returns `False`.
 
     Note:
-        - Uses the Insly API endpoint `https://vingo-api.insly.com/api/policy/getpolicy`.
-        - The request uses an authorization token (`INSLY_TOKEN`) to authenticate.
         - The installment status `12` represents a fully paid status.
     """
-    url = 'https://vingo-api.insly.com/api/policy/getpolicy'
-    body = {"policy_oid": policy_oid}
-    headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
+    policy = get_policy(policy_oid, cache)
+    return policy is not None and policy_fully_paid(policy)
 
-    response = requests.post(url=url, json=body, headers=headers)
 
-    if response.status_code == 200:
-        policy = response.json()
+def is_it_expired(policy_oid, cache=None):
+    policy = get_policy(policy_oid, cache)
+    return policy is not None and policy_expired(policy)
 
-        if policy.get('payment'):
-            last_installment = max(policy['payment'], key=lambda x: x['policy_installment_num'])
 
-            if last_installment['policy_installment_num'] == policy['policy_installments']:
-                status = last_installment['policy_installment_status']
+def evaluate_policy_status(policy_oid, cache=None):
+    """
+    Checks whether a policy is fully paid and whether it has expired, from a single `getpolicy` payload.
 
-                if status == 12:  # Fully paid
-                    return True
-        return False
+    Args:
+        policy_oid (str): The unique identifier of the policy.
+        cache (dict | None): The `getpolicy` cache of the calling job (see `get_policy()`). Defaults to `None`.
 
-    else:
-        print(f"'is_it_fully_paid': Request failed with status code {response.status_code}")
-        return False
+    Returns:
+        tuple[bool, bool]: `(fully_paid, expired)`, both `False` if the request failed.
+    """
+    policy = get_policy(policy_oid, cache)
 
+    if policy is None:
+        return False, False
 
-def is_it_expired(policy_oid):
-    url = 'https://vingo-api.insly.com/api/policy/getpolicy'
-    body = {"policy_oid": policy_oid}
-    headers = {'Authorization': f'Bearer {INSLY_TOKEN}'}
+    return policy_fully_paid(policy), policy_expired(policy)
 
-    response = requests.post(url=url, json=body, headers=headers)
 
-    if response.status_code == 200:
-        policy = response.json()
+async def evaluate_policy_status_async(policy_oid, cache=None):
+    """
+    Coroutine version of `evaluate_policy_status()`.
+    """
+    policy = await get_policy_async(policy_oid, cache)
 
-        latest_date = datetime(2024, 1, 1)
-        p_date_end_raw = policy.get('policy_date_end', '')
-        exp_date = datetime.strptime(p_date_end_raw, "%d.%m.%Y")
-        current_date = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+    if policy is None:
+        return False, False
+
+    return policy_fully_paid(policy), policy_expired(policy)
+
+
+def policy_fully_paid(policy):
+    """
+    Returns `True` if the last installment of a `getpolicy` payload is the final one and has status 12 (fully paid).
+    """
+    if policy.get('payment'):
+        last_installment = max(policy['payment'], key=lambda x: x['policy_installment_num'])
+
+        if last_installment['policy_installment_num'] == policy['policy_installments']:
+            status = last_installment['policy_installment_status']
+
+            if status == 12:  # Fully paid
+                return True
+    return False
+
+
+def policy_expired(policy):
+    """
+    Returns `True` if a `getpolicy` payload ended between `LATEST_DATE` and today.
+    """
+    latest_date = LATEST_DATE
+    p_date_end_raw = policy.get('policy_date_end', '')
+    exp_date = datetime.strptime(p_date_end_raw, "%d.%m.%Y")
+    current_date = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
 
-        if latest_date <= exp_date < current_date:
-            return True
-        else:
-            return False
+    if latest_date <= exp_date < current_date:
+        return True
     else:
-        print(f"'is_it_expired': Request failed with status code {response.status_code}")
         return False
 
 def fetch_payment_data(policy):
@@ -1,16 +1,71 @@
+import argparse
+import asyncio
 import datetime
+import itertools
 import time
 import os
-import http.client
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
+import requests
 from dotenv import load_dotenv
+import metrics
+import recorder
+from http_client import connection_stats
 from pipedrive import Pipedrive
-from insly import get_customer_policy, get_customer_list, is_it_fully_paid, is_it_expired
-from helper import retry_requests, fetch_non_api_data
-from spreadsheet_communication import read_data_from_worksheet, process_table_policies
+from pipedrive_async import AsyncPipedrive
+from rate_limiter import TokenBucket
+from insly import get_customer_policy_async, get_customer_list, evaluate_policy_status, \
+    clear_classifier_cache, CLASSIFIER_STATS
+from helper import fetch_non_api_data, json_fingerprint, SheetIndex
+from spreadsheet_communication import read_data_from_worksheets, reset_spreadsheet, process_table_policies
+from sync_state import SyncState
+
+load_dotenv()
+
+# Number of customers processed in parallel (1 = sequential)
+SYNC_WORKERS = int(os.getenv('SYNC_WORKERS', 4))
+# Maximum number of customers started per second, shared by all workers
+CUSTOMER_RATE_LIMIT = float(os.getenv('CUSTOMER_RATE_LIMIT', 2))
+# Number of policies checked in parallel by `filtered_auto_close()`, and deals closed per batch
+AUTO_CLOSE_WORKERS = int(os.getenv('AUTO_CLOSE_WORKERS', 8))
+AUTO_CLOSE_BATCH_SIZE = int(os.getenv('AUTO_CLOSE_BATCH_SIZE', 20))
+# Days between runs that fetch every customer from Insly, refreshing the policy end date index
+FULL_REFRESH_DAYS = int(os.getenv('FULL_REFRESH_DAYS', 7))
+# Longest time an idle worker waits before checking the work queue for a due retry again
+QUEUE_POLL_INTERVAL = 1
+
+# Deals whose spreadsheet fields were already written during the current run
+SHEET_SYNCED_DEALS = set()
+SHEET_SYNCED_LOCK = threading.Lock()
+
+
+class PipedriveWriteError(Exception):
+    """
+    Raised by `sync_customer()` when a Pipedrive write failed, so the customer is retried and not committed.
+    """
+
+def run_in_loop(loop, coro):
+    """
+    Runs `coro` to completion on `loop`, which stays open for the next call.
+
+    Tasks it left behind (e.g. the siblings of a failed `asyncio.gather()`) are cancelled,
+    as `asyncio.run()` would do, so they cannot leak into the next customer.
+    """
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        pending = asyncio.all_tasks(loop)
+
+        for task in pending:
+            task.cancel()
+
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
 
-def process_customer(pd, oid, counter):
+def process_customer(pd, oid, counter, sync_state=None, loop=None, apd=None):
     """
     Processes a customer's data by retrieving policies, creating or updating records in Pipedrive,
     and handling associated notes.
@@ -19,11 +74,20 @@ def process_customer(pd, oid, counter):
         pd (Pipedrive): An instance of the Pipedrive API client.
         oid (int): The unique identifier of the customer.
         counter (int): A counter used for tracking the processing sequence.
+        sync_state (SyncState | None): Incremental sync checkpoint store and work queue. Defaults to `None`.
+        loop (asyncio.AbstractEventLoop | None): The worker's event loop, reused across customers.
+            Defaults to `None`, which runs the customer on a new event loop.
+        apd (AsyncPipedrive | None): The worker's asynchronous Pipedrive client. Defaults to a new client for `pd.token`.
+
+    Returns:
+        bool: `True` if the customer was processed, `False` if the attempt failed.
 
     .. rubric:: Behavior
-    - Calls `get_customer_policy(oid, counter)` to retrieve the customer's policies, address,
+    - Runs `sync_customer()`, which pipelines the steps below with an `AsyncPipedrive` client, on `loop`.
+    - Calls `get_customer_policy_async(oid, counter)` to retrieve the customer's policies, address,
       and related objects from the Insly API.
-    - If no customer data is found, the function terminates.
+    - If no customer data is found, or everything that would be pushed is unchanged since the last successful sync
+      (see `customer_fingerprint()`), the function terminates.
     - Determines if the customer is a company or an individual.
         If a company:
             - Searches for an existing organization in Pipedrive.
@@ -34,205 +98,570 @@ def process_customer(pd, oid, counter):
     - Associates the retrieved policies with the identified organization/person:
         Searches for an existing deal in Pipedrive.\n
         If found, updates the deal; otherwise, creates a new deal.
+    - Organization, person and deal IDs come from the local mirror in `sync_state` when available;
+      if a mirrored entity was deleted in Pipedrive (`404` on update), it is created again.
     - Manages policy-related notes:
-        Searches for an existing note linked to the deal.\n
-        If found, updates it; otherwise, creates a new note.
-    - Implements a retry mechanism for handling transient errors:
-        Catches `http.client.RemoteDisconnected` errors and other unexpected exceptions.
-        Uses an exponential backoff strategy, retrying the operation with increasing delays up to 60 seconds.
+        Fetches the deal's notes once and finds the objects note and the payment table note by their content.\n
+        Updates each one that exists; otherwise, creates it.
+    - Makes a single attempt and does not sleep on errors:
+        Catches connection errors that survive the pooled session's own retries, Insly error statuses
+        and other unexpected exceptions.\n
+        Marks the customer `done` in the work queue of `sync_state` on success; on failure schedules the next attempt
+        with `SyncState.reschedule()` (exponential backoff), so the worker can move on to the next customer.
 
     Notes:
         - The function ensures that all customer policies and related objects are properly reflected in Pipedrive.
-        - The retry mechanism prevents failures due to temporary API issues.
+        - Failed customers are retried later in the same run, up to `QUEUE_MAX_ATTEMPTS` attempts.
         - Customers without policies are skipped.
         - Pipedrive records (organizations, persons, deals, and notes) are either updated or created as needed.
+        - The policies of one customer are pushed concurrently; each deal is still written before its notes.
         - Only policies that are already closed or ending within 21 days are processed.
-
-    Returns:
-        None: The function processes and updates records but does not return a value.
+        - The customer's checkpoint is committed to `sync_state` only after it was processed without errors.
     """
-    retry_requests()
-    retry_delay = 5
-    retry_attempts = 0
-    max_retry_attempts = 2
+    try:
+        apd = apd or AsyncPipedrive(pd.token)
 
-    while max_retry_attempts != retry_attempts:
-        try:
-            customer_i, policy_i, address_i, object_i, payment_table = get_customer_policy(oid, counter)
+        if loop is None:
+            asyncio.run(sync_customer(apd, oid, counter, sync_state))
+        else:
+            run_in_loop(loop, sync_customer(apd, oid, counter, sync_state))
 
-            if not customer_i:
-                return
+    except requests.exceptions.ConnectionError as e:
+        print(f"\nConnection error on customer {oid}: {e}")
+        error = f"ConnectionError: {e}"
 
-            if customer_i[0][4] == 11:
-                print(f"\t{customer_i[0][0]}: Company")
-                org_id, org_name = pd.Search.organization(customer_i[0][0]) or (None, None)
+    except PipedriveWriteError as e:
+        print(f"\nPipedrive write failed for customer {oid}: {e}")
+        error = f"PipedriveWriteError: {e}"
 
-                if org_id is None:
-                    org_id = pd.Add.organization(customer_i[0], address_i[0])
-                else:
-                    pd.Update.organization(org_id, customer_i[0], address_i[0])
+    except requests.exceptions.HTTPError as e:
+        print(f"\nInsly request failed for customer {oid}: {e}")
+        error = f"HTTPError: {e}"
 
-                entity_id, entype = org_id, 'org'
+    except Exception as e:
+        print(f"\nUnexpected error processing customer {oid}: {e}")
+        print(traceback.format_exc())
+        error = f"{type(e).__name__}: {e}"
 
-            else:
-                print(f"\t{customer_i[0][0]}: Individual")
-                person_id, person_name = pd.Search.person(customer_i[0][0]) or (None, None)
+    else:
+        if sync_state is not None:
+            sync_state.finish(oid)
+        return True
 
-                if person_id is None:
-                    person_id = pd.Add.person(customer_i[0])
-                else:
-                    pd.Update.person(person_id, customer_i[0])
+    if sync_state is not None:
+        delay = sync_state.reschedule(oid, error)
 
-                entity_id, entype = person_id, 'person'
+        if delay is None:
+            print(f"Giving up on customer {oid} for this run.\n")
+        else:
+            print(f"Retrying customer {oid} in {delay:.0f} seconds.\n")
 
-            for i in range(len(policy_i)):
-                deal_id, deal_title, _ = pd.Search.deal(policy_i[i][10]) or (None, None, None)
+    return False
 
-                if deal_id is None:
-                    deal_id = pd.Add.deal(policy_i[i], entity_id, entype, customer_i[0][5])
-                    print(f"Waiting for deal (id: {deal_id}) to be created...")
-                    time.sleep(5)
-                    process_table_policies(pd, policy_i[i][5], i, DATASET, deal_id)
 
-                else:
-                    pd.Update.deal(deal_id, policy_i[i], entity_id, entype)
+async def sync_customer(apd, oid, counter, sync_state=None):
+    """
+    Pushes one customer and their policies to Pipedrive, overlapping independent requests.
 
-                note_id = pd.Search.note(deal_id)
+    Args:
+        apd (AsyncPipedrive): The asynchronous Pipedrive client.
+        oid (int): The unique identifier of the customer.
+        counter (int): A counter used for tracking the processing sequence.
+        sync_state (SyncState | None): Incremental sync checkpoint store. Defaults to `None`.
 
-                if note_id is None:
-                    pd.Add.note(object_i[i], deal_id, customer_i[0][5])
-                else:
-                    pd.Update.note(note_id, object_i[i], deal_id, customer_i[0][5])
+    .. rubric:: Behavior
+    - Fetches the customer's policies with `get_customer_policy_async()`.
+    - Skips the customer if its `customer_fingerprint()` matches the last successful sync in `sync_state`
+      and its organization/person and deals are all still mirrored, otherwise stages it.
+    - Upserts the organization/person while the deals of all policies are being searched.
+    - Upserts every deal as soon as its search and the organization/person are done, then its two notes concurrently.
+    - Writes the spreadsheet fields of a policy (see `fetch_non_api_data()`) in the same request as the deal itself,
+      and remembers the deal in `SHEET_SYNCED_DEALS`.
+    - Raises `PipedriveWriteError` when a create or update request failed.
+    - Waits for every policy to finish before raising the first error, so no write is left running in the background.
+    - Commits the customer's checkpoint to `sync_state` only once every write succeeded.
+    """
+    customer_i, policy_i, address_i, object_i, payment_table = await get_customer_policy_async(oid, counter, sync_state)
 
-                payment_table_note_id = pd.Search.payment_table_note(deal_id)
+    if not customer_i:
+        return
 
-                if payment_table_note_id is None:
-                    pd.Add.note(payment_table, deal_id, customer_i[0][5])
-                else:
-                    pd.Update.note(payment_table_note_id, payment_table, deal_id, customer_i[0][5])
+    owner = customer_i[0][5]
+    sheet_i = [fetch_non_api_data(policy[5], DATASET, customer_i[0][1])
+               if DATASET is not None and DATASET.contains(policy[5], customer_i[0][1]) else None
+               for policy in policy_i]
+
+    if sync_state is not None:
+        fingerprint = customer_fingerprint(customer_i, policy_i, address_i, object_i, payment_table, sheet_i)
+
+        entities = [('organization' if customer_i[0][4] == 11 else 'person', customer_i[0][0])]
+        entities += [('deal', policy[10]) for policy in policy_i]
+
+        if sync_state.is_unchanged(oid, fingerprint, entities):
+            print(f"#{counter} Customer {oid}: Unchanged since last sync, skipping.")
             return
 
-        except http.client.RemoteDisconnected as e:
-            print(f"\nRemoteDisconnected error on customer {oid}: {e}")
+        sync_state.stage(oid, fingerprint)
+
+    async def upsert_entity():
+        if customer_i[0][4] == 11:
+            print(f"\t{customer_i[0][0]}: Company")
+            org_id, org_name = await apd.Search.organization(customer_i[0][0]) or (None, None)
+
+            if org_id is not None:
+                updated = await apd.Update.organization(org_id, customer_i[0], address_i[0])
+
+                if updated is None:
+                    raise PipedriveWriteError(f"organization {org_id} was not updated")
+                if updated is False:
+                    org_id = None
+
+            if org_id is None:
+                org_id = await apd.Add.organization(customer_i[0], address_i[0])
+
+                if org_id is None:
+                    raise PipedriveWriteError("organization was not created")
+
+            return org_id, 'org'
+
+        print(f"\t{customer_i[0][0]}: Individual")
+        person_id, person_name = await apd.Search.person(customer_i[0][0]) or (None, None)
+
+        if person_id is not None:
+            updated = await apd.Update.person(person_id, customer_i[0])
+
+            if updated is None:
+                raise PipedriveWriteError(f"person {person_id} was not updated")
+            if updated is False:
+                person_id = None
 
-        except ValueError as e:
-            print(f"ValueError no customer {oid}: {e}")
-            retry_attempts += 1
-            print(f"\nAttempts left: {max_retry_attempts - retry_attempts}")
+        if person_id is None:
+            person_id = await apd.Add.person(customer_i[0])
 
-            if max_retry_attempts - retry_attempts == 0:
-                print(f"Returning to #{counter + 1}\n")
+            if person_id is None:
+                raise PipedriveWriteError("person was not created")
+
+        return person_id, 'person'
+
+    async def upsert_note(note_id, content, deal_id):
+        if note_id is not None:
+            updated = await apd.Update.note(note_id, content, deal_id, owner)
+
+            if updated is None:
+                raise PipedriveWriteError(f"note {note_id} of deal {deal_id} was not updated")
+            if updated:
                 return
 
-        except Exception as e:
-            print(f"\nUnexpected error processing customer {oid}: {e}")
-            print(traceback.format_exc())
+        if await apd.Add.note(content, deal_id, owner) is None:
+            raise PipedriveWriteError(f"note of deal {deal_id} was not created")
+
+    entity = asyncio.ensure_future(upsert_entity())
+
+    async def upsert_policy(i):
+        deal_id, deal_title, _ = await apd.Search.deal(policy_i[i][10]) or (None, None, None)
+        entity_id, entype = await entity
+        sheet_info = sheet_i[i]
+
+        if deal_id is not None:
+            updated = await apd.Update.deal(deal_id, policy_i[i], entity_id, entype, sheet_info=sheet_info)
+
+            if updated is None:
+                raise PipedriveWriteError(f"deal {deal_id} was not updated")
+            if updated is False:
+                deal_id = None
+
+        if deal_id is None:
+            deal_id = await apd.Add.deal(policy_i[i], entity_id, entype, owner, sheet_info=sheet_info)
+
+            if deal_id is None:
+                raise PipedriveWriteError(f"deal of policy {policy_i[i][10]} was not created")
+
+            note_id, payment_table_note_id = None, None
+        else:
+            note_id, payment_table_note_id = await apd.Search.deal_notes(deal_id)
+
+        if sheet_info is not None:
+            with SHEET_SYNCED_LOCK:
+                SHEET_SYNCED_DEALS.add(deal_id)
+
+        await asyncio.gather(upsert_note(note_id, object_i[i], deal_id),
+                             upsert_note(payment_table_note_id, payment_table, deal_id))
+
+    results = await asyncio.gather(entity, *(upsert_policy(i) for i in range(len(policy_i))),
+                                   return_exceptions=True)
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
 
-        print(f"\nRetrying customer {oid} in {retry_delay} seconds...")
-        time.sleep(retry_delay)
-        retry_delay = min(retry_delay * 2, 60)
+    if sync_state is not None:
+        sync_state.commit(oid)
 
 
-def main(pd):
+def customer_fingerprint(customer_i, policy_i, address_i, object_i, payment_table, sheet_i):
+    """
+    Fingerprints everything `sync_customer()` would push to Pipedrive for one customer.
+
+    Returns:
+        str: A hash of the customer, address, policy, objects, payment table and spreadsheet data.
+
+    Note:
+        - The fingerprint covers the resolved values rather than the raw `customer/getpolicy` payload, so changes
+          to policy objects, the classifier, the broker directory, the spreadsheet or the window phase of a policy
+          all trigger a resync.
+    """
+    return json_fingerprint({
+        'customer': customer_i,
+        'address': address_i,
+        'policies': policy_i,
+        'objects': object_i,
+        'payment_table': payment_table,
+        'sheet': sheet_i,
+    })
+
+
+def main(pd, workers=SYNC_WORKERS, full=False):
     """
     Main function to retrieve customer data from Insly and process it in Pipedrive.
 
+    Args:
+        pd (Pipedrive): An instance of the Pipedrive API client.
+        workers (int): The number of customers processed in parallel. Defaults to `SYNC_WORKERS`.
+        full (bool): Processes every customer, even those unchanged since their last sync. Defaults to `False`.
+
     .. rubric:: Behavior
-    - Initializes a `Pipedrive` instance with the retrieved token from environment variables.
+    - Loads the spreadsheet datasets and indexes them into `DATASET` (a `SheetIndex`).
+    - If a previous run did not finish, first drains the rest of its work queue in `SyncState`
+      (see `SyncState.resume_queue()`), without fetching the customer list.
     - Calls `get_customer_list()` to fetch a list of customer OIDs from Insly.
     - If no customer OIDs are found, prints a message and exits.
-    - Defines `start_from` to specify where to begin processing customers.
-    - Extracts the remaining OIDs from `customer_oids` based on `start_from`.
-    - Iterates through each remaining customer OID:
-        Calls `process_customer(pd, oid, i)` to process the customer and their policies.\n
-        Introduces a 1-second delay between processing each customer to avoid rate limits.
+    - Leaves out customers whose indexed policies are all outside the sync window until their next relevant date
+      (see `next_relevant_date()`), unless this is a full index refresh: every `FULL_REFRESH_DAYS` days,
+      on `full` runs, and whenever the index was never refreshed. Customers the resumed queue just finished
+      are left out as well.
+    - Queues the remaining customer OIDs (duplicates dropped) as a new pass in the work queue of `SyncState`.
+    - Drains the queue with a pool of `workers` threads:
+        Every worker claims the next due customer and calls `process_customer(pd, oid, i, sync_state)`.\n
+        Every worker takes a token from a shared `TokenBucket` (`CUSTOMER_RATE_LIMIT` per second)
+        before starting a customer.\n
+        Failed customers come back once their retry is due; a worker only waits when nothing else is due.
+    - Skips the Pipedrive writes of customers whose data is unchanged since their last successful sync,
+      using the checkpoints stored in `SyncState` (unless `full` is set).
+    - Lets the Pipedrive client skip writes whose body is identical to the last one it pushed.
+    - Seeds the local Insly OID → Pipedrive ID mirror from Pipedrive's list endpoints when it is empty
+      and on every full index refresh, so known entities need no search request. Entities deleted in Pipedrive
+      are forgotten on those seeding runs; a customer with a forgotten entity is pushed again even if its data
+      is unchanged, so the entity is created again once its policy is in the sync window.
+    - On `full` runs, loads the notes of every deal up front with a few list requests instead of one per deal;
+      other runs only load the notes updated since the previous run started.
+    - Writes the request metrics of the run to `METRICS_SUMMARY_PATH`, if set (see `metrics.write_summary()`).
 
     Notes:
-        - The script processes customers sequentially, starting from `start_from`.
-        - If interrupted or restarted, `start_from` can be adjusted to resume from a specific OID.
-        - The function ensures that all customers in the retrieved list are processed.
-        - A delay is added to prevent excessive API requests that might trigger rate limiting.
+        - Each OID is handled by exactly one worker, and all Pipedrive writes for that customer
+          (organization/person, deals, notes) stay in order within it.
+        - If interrupted or restarted, the next run first continues with the customers that were not done yet,
+          then runs its own pass over the customer list, so no customer waits an extra day.
+        - Customers that still fail after `QUEUE_MAX_ATTEMPTS` attempts are left `failed` until the next run.
+        - With `workers=1` customers are processed sequentially in list order.
 
     Returns:
         None: The function executes the pipeline but does not return a value.
     """
     print('Initializing environment...')
     global DATASET
+    run_metrics = metrics.snapshot()
+    clear_classifier_cache()
+    Pipedrive.clear_field_option_index()
+    reset_spreadsheet()
+    SHEET_SYNCED_DEALS.clear()
 
     print('Fetching data from table...')
-    data = read_data_from_worksheet(start_row=5, custom_column=4, sheet_number=1)
-    seller_data = read_data_from_worksheet(start_row=2, sheet_number=2)
-    policy_on_attb_data = read_data_from_worksheet(start_row=2, sheet_number=3)
+    data, seller_data, policy_on_attb_data = read_data_from_worksheets([
+        {'start_row': 5, 'custom_column': 4, 'sheet_number': 1, 'columns': SheetIndex.DATA_COLUMNS},
+        {'start_row': 2, 'sheet_number': 2, 'columns': SheetIndex.SELLER_COLUMNS},
+        {'start_row': 2, 'sheet_number': 3, 'columns': SheetIndex.POLICY_ON_ATB_COLUMNS}
+    ])
 
-    DATASET = (data, seller_data, policy_on_attb_data)
+    DATASET = SheetIndex(data, seller_data, policy_on_attb_data)
 
     print('Starting program...')
-    customer_oids = get_customer_list()
-    if not customer_oids:
-        print("No customer OIDs found. Exiting.")
-        return
+    limiter = TokenBucket(rate=CUSTOMER_RATE_LIMIT, capacity=workers)
+    sync_state = SyncState(full=full)
+    pd.use_sync_state(sync_state)
+
+    today = datetime.date.today()
+    refreshed_at = sync_state.get_meta('index_refreshed_at')
+    refresh_index = full or refreshed_at is None or \
+        (today - datetime.date.fromisoformat(refreshed_at)).days >= FULL_REFRESH_DAYS
 
-    start_from = 1
+    def drain_queue():
+        # One event loop and client per worker thread, reused for every customer it claims
+        loop = asyncio.new_event_loop()
+        apd = AsyncPipedrive(pd.token)
 
-    remaining_oids = customer_oids[start_from - 1:]
+        try:
+            while True:
+                item = sync_state.claim()
+
+                if item is None:
+                    wait_time = sync_state.seconds_until_due()
 
-    print(f"\n{len(remaining_oids)} OIDs ready!\n")
+                    if wait_time is None:
+                        return
 
-    for i, oid in enumerate(remaining_oids, start=start_from):
-        process_customer(pd, oid, i)
-        time.sleep(1)
+                    metrics.sleep('queue_retry_wait', min(wait_time, QUEUE_POLL_INTERVAL))
+                    continue
 
+                i, oid = item
+                metrics.record_sleep('customer_rate_limit', limiter.acquire())
+                process_customer(pd, oid, i, sync_state, loop=loop, apd=apd)
+        finally:
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
 
-def filtered_auto_close(pd):
-    print('Fetching filtered deals...')
-    filtered_deals = pd.Search.all_deals(filter_id=107)
-    print(f"{len(filtered_deals)} deals found!\n")
+    try:
+        if refresh_index or sync_state.entity_count() == 0:
+            pd.seed_entity_map()
 
-    for i in range(len(filtered_deals)):
-        policy_oid = filtered_deals[i].get('policy')
-        deal_id = filtered_deals[i].get('id')
+        notes_checkpoint = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        notes_since = sync_state.get_meta('notes_prefetched_at')
 
-        print(f"#{i + 1} P_OID: {policy_oid}")
+        if full or notes_since is None:
+            pd.prefetch_deal_notes()
+        else:
+            pd.prefetch_deal_notes(updated_since=datetime.datetime.fromisoformat(notes_since))
 
-        if is_it_fully_paid(policy_oid):
-            if is_it_expired(policy_oid):
-                pd.Update.deal_status(deal_id, 'won')
+        sync_state.set_meta('notes_prefetched_at', notes_checkpoint.isoformat(timespec='seconds'))
+
+        def drain():
+            if workers <= 1:
+                drain_queue()
             else:
-                print(f"\tNot expired")
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for future in as_completed([executor.submit(drain_queue) for _ in range(workers)]):
+                        future.result()
+
+            print(f"\nWork queue: {sync_state.queue_summary()}")
+
+        resumed_oids = sync_state.resume_queue()
+
+        if resumed_oids:
+            print(f"\nResuming unfinished run: {sync_state.queue_summary()}. Processing with {workers} worker(s).\n")
+            drain()
+
+        customer_oids = get_customer_list()
+        if not customer_oids:
+            print("No customer OIDs found. Exiting.")
+            return
+
+        queued_oids = customer_oids if refresh_index else sync_state.due_customers(customer_oids, today)
+
+        if refresh_index:
+            sync_state.set_meta('index_refreshed_at', today.isoformat())
+            print("\nRefreshing the policy end date index of every customer.")
         else:
-            print(f"\tNot fully paid")
-        time.sleep(1)
+            print(f"\n{len(set(customer_oids)) - len(set(queued_oids))} customers have no policy "
+                  f"in the sync window until later, skipping them.")
+
+        finished_oids = set(resumed_oids) & sync_state.done_customers()
+        if finished_oids:
+            queued_oids = [oid for oid in queued_oids if oid not in finished_oids]
+            print(f"{len(finished_oids)} customers were just processed by the resumed run, skipping them.")
+
+        sync_state.start_queue(queued_oids)
+
+        print(f"\n{sync_state.queue_summary().get('pending', 0)} OIDs ready! Processing with {workers} worker(s).\n")
+        drain()
+    finally:
+        pd.use_sync_state(None)
+        pd.clear_deal_notes()
+        sync_state.close()
+
+    print(f"\nClassifier cache: {CLASSIFIER_STATS}")
+    print(f"HTTP connections: {connection_stats()}")
+    if recorder.REPLAY_PATH:
+        print(f"Replayed requests: {recorder.REPLAY_STATS}")
+    metrics.write_summary('main', run_metrics)
+
+
+def imap_unordered(executor, fn, items, window):
+    """
+    Submits `fn(item)` for every item of a (possibly lazy) iterable, keeping at most `window` calls in flight.
+
+    Yields:
+        tuple: `(item, future)` pairs in completion order.
+    """
+    items = iter(items)
+    pending = {}
+
+    for item in itertools.islice(items, window):
+        pending[executor.submit(fn, item)] = item
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            item = pending.pop(future)
+
+            for next_item in itertools.islice(items, 1):
+                pending[executor.submit(fn, next_item)] = next_item
+
+            yield item, future
+
+
+def filtered_auto_close(pd, workers=AUTO_CLOSE_WORKERS, batch_size=AUTO_CLOSE_BATCH_SIZE):
+    """
+    Marks the deals of Pipedrive filter 107 as won once their policy is fully paid and has expired.
+
+    Args:
+        pd (Pipedrive): An instance of the Pipedrive API client.
+        workers (int): The number of policies checked (and deals updated) in parallel. Defaults to `AUTO_CLOSE_WORKERS`.
+        batch_size (int): The number of deals closed per batch. Defaults to `AUTO_CLOSE_BATCH_SIZE`.
+
+    Returns:
+        dict: The summary counts (`deals`, `won`, `not_paid`, `not_expired`, `errors`, `failed`).
+
+    .. rubric:: Behavior
+    - Streams the deals of filter 107 page by page.
+    - Evaluates the policies concurrently with `evaluate_policy_status()`, keeping at most `2 * workers` deals
+      in flight. The `getpolicy` payloads are cached for this job only, so a policy shared by several deals
+      costs one request, and the cache is dropped when the job returns.
+    - Collects the deals to close and sets their status to `won` in batches of `batch_size` concurrent requests,
+      paced by the Pipedrive rate limiter in `http_client`.
+    - Prints a summary report at the end and writes the request metrics of the run with `metrics.write_summary()`.
+
+    Note:
+        - Pipedrive has no bulk deal update endpoint, so every batch is a set of concurrent single-deal `PATCH` requests.
+    """
+    clear_classifier_cache()
+    policy_cache = {}
+    started = time.monotonic()
+    run_metrics = metrics.snapshot()
+
+    print('Streaming filtered deals...')
+    summary = {'deals': 0, 'won': 0, 'not_paid': 0, 'not_expired': 0, 'errors': 0, 'failed': 0}
+    to_close = []
+
+    def evaluate(deal):
+        return evaluate_policy_status(deal.get('policy'), policy_cache)
+
+    def close(deal_id):
+        try:
+            return pd.Update.deal_status(deal_id, 'won')
+        except requests.exceptions.RequestException as e:
+            print(f"\t{deal_id}: Deal status update failed: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        completed = imap_unordered(executor, evaluate, pd.Search.iter_deals(filter_id=107), window=max(workers, 1) * 2)
+
+        for i, (deal, future) in enumerate(completed, start=1):
+            policy_oid, deal_id = deal.get('policy'), deal.get('id')
+            summary['deals'] += 1
+
+            try:
+                fully_paid, expired = future.result()
+            except Exception as e:
+                print(f"#{i} P_OID: {policy_oid}\n\tError: {e}")
+                summary['errors'] += 1
+                continue
+
+            if not fully_paid:
+                print(f"#{i} P_OID: {policy_oid}\n\tNot fully paid")
+                summary['not_paid'] += 1
+            elif not expired:
+                print(f"#{i} P_OID: {policy_oid}\n\tNot expired")
+                summary['not_expired'] += 1
+            else:
+                print(f"#{i} P_OID: {policy_oid}\n\tReady to close")
+                to_close.append(deal_id)
+
+        print(f"\nClosing {len(to_close)} deals...")
+        for start in range(0, len(to_close), max(batch_size, 1)):
+            batch = to_close[start:start + max(batch_size, 1)]
+
+            for updated in executor.map(close, batch):
+                summary['won' if updated else 'failed'] += 1
+
+    print(f"\nAuto-close summary ({time.monotonic() - started:.1f}s): {summary}")
+    metrics.write_summary('filtered_auto_close', run_metrics)
+    return summary
 
 
 def update_deals_with_no_seller(pd):
-    cache = []
-    print('Fetching filtered deals...')
-    filtered_deals = pd.Search.all_deals(filter_id=74)
-    print(f"{len(filtered_deals)} deals found!\n")
+    cache = set()
+    run_metrics = metrics.snapshot()
+    print('Streaming filtered deals...')
 
-    for i in range(len(filtered_deals)):
-        policy_oid = filtered_deals[i].get('policy')
-        deal_id = filtered_deals[i].get('id')
-        policy_number = filtered_deals[i].get('policy_number')
+    for i, deal in enumerate(pd.Search.iter_deals(filter_id=74)):
+        deal_id = deal.get('id')
+        policy_number = deal.get('policy_number')
 
         if policy_number == 'Policy number is missing.':
             continue
+
+        if deal_id in SHEET_SYNCED_DEALS:
+            print(f"Skipping deal {deal_id}. Its spreadsheet fields were written during this run.")
+            continue
             
         if policy_number in cache:
             print(f"Skipping {policy_number}. Have already been processed.")
             continue
         else:
-            cache.append(policy_number)
+            cache.add(policy_number)
 
         process_table_policies(pd, policy_number, i, DATASET, deal_id)
 
-        time.sleep(1)
-        
-def run_daily():
+    metrics.write_summary('update_deals_with_no_seller', run_metrics)
+
+
+def run_jobs(pd, full=False):
+    """
+    Runs the jobs of one night: `filtered_auto_close()` on Saturdays, otherwise `main()` followed by
+    `update_deals_with_no_seller()`.
+    """
+    now = datetime.datetime.now()
+    if now.weekday() == 5:
+        print("It's Saturday!")
+        filtered_auto_close(pd)
+    else:
+        print("It's not Saturday.")
+        main(pd, full=full)
+        update_deals_with_no_seller(pd)
+
+
+def run_once(full=False):
+    """
+    Runs the jobs of one night with `run_jobs()` and returns, e.g. to record or replay them.
+
+    Args:
+        full (bool): Processes every customer instead of only the changed ones. Defaults to `False`.
+
+    .. rubric:: Behavior
+    - Closes the `recorder` archive when the jobs end, fail or the process receives `SIGTERM`,
+      so a recorded archive is always complete.
+    """
+    load_dotenv()
+    pd = Pipedrive(os.getenv('PIPEDRIVE_TOKEN'))
+
+    if recorder.RECORD_PATH:
+        recorder.close_on_signal()
+
+    try:
+        run_jobs(pd, full=full)
+    finally:
+        recorder.close()
+
+
+def run_daily(full=False):
     """
     Runs the `main()` function once a day, at midnight UTC, in an infinite loop.
 
+    Args:
+        full (bool): Makes the first run process every customer instead of only the changed ones. Defaults to `False`.
+
     .. rubric:: Behavior
+    - Starts the Prometheus metrics endpoint on `METRICS_PORT` (see `metrics.start_server()`).
     - Continuously runs the `main()` function in a loop.
     - After each execution of `main()`, calculates the time until the next midnight UTC.
     - Pauses the execution using `time.sleep()` for the calculated duration, ensuring that the next `main()` run happens at midnight UTC.
@@ -242,23 +671,24 @@ def run_daily():
         - The function uses `datetime` to calculate the exact number of seconds until midnight UTC.
         - The loop ensures that `main()` is executed once per day, and any errors or exceptions in `main()` will not stop the loop.
 
+    Raises:
+        ValueError: If `HTTP_RECORD_PATH` or `HTTP_REPLAY_PATH` is set; use `run_once()` to record or replay a night.
+
     Returns:
         None: The function does not return any value, it repeatedly calls `main()` at scheduled intervals.
     """
+    if recorder.RECORD_PATH or recorder.REPLAY_PATH:
+        raise ValueError('Recording and replaying cover a single night, run them with --once.')
+
     load_dotenv()
     pd_token = os.getenv('PIPEDRIVE_TOKEN')
     pd = Pipedrive(pd_token)
+    metrics.start_server()
 
     while True:
         try:
-            now = datetime.datetime.now()
-            if now.weekday() == 5:
-                print("It's Saturday!")
-                filtered_auto_close(pd)
-            else:
-                print("It's not Saturday.")
-                main(pd)
-                update_deals_with_no_seller(pd)
+            run_jobs(pd, full=full)
+            full = False
 
         except Exception as e:
             print(f"An error occurred during main(): {e}")
@@ -273,4 +703,15 @@ def run_daily():
 
 
 if __name__ == '__main__':
-    run_daily()
+    parser = argparse.ArgumentParser(description='Synchronizes Insly customers and policies to Pipedrive.')
+    parser.add_argument('--full', action='store_true',
+                        help='process every customer on the first run, ignoring incremental sync checkpoints')
+    parser.add_argument('--once', action='store_true',
+                        help="run tonight's jobs once and exit instead of scheduling them daily "
+                             "(required to record or replay)")
+    args = parser.parse_args()
+
+    if args.once:
+        run_once(full=args.full)
+    else:
+        run_daily(full=args.full)
@@ -0,0 +1,349 @@
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Port of the Prometheus text endpoint started by `start_server()` (disabled if `0`)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+# Address the Prometheus text endpoint listens on; only reachable from the same machine by default
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# File the JSON summary of every run is written to, `{run}` is replaced by the run name (disabled if empty)
+METRICS_SUMMARY_PATH = os.getenv('METRICS_SUMMARY_PATH', '')
+
+PREFIX = 'insly_pipedrive'
+# Upper bounds (in seconds) of the latency histogram buckets; a final `+Inf` bucket is implied
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Per call site, keyed by (service, call)
+CALLS = {}
+# Time spent in deliberate sleeps outside of HTTP requests, keyed by reason
+SLEEPS = {}
+METRICS_LOCK = threading.Lock()
+SERVER = None
+
+
+def _entry(service, call):
+    key = (service, call)
+
+    if key not in CALLS:
+        CALLS[key] = {
+            'requests': 0,
+            'statuses': {},
+            'latency_sum': 0.0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'bytes_sent': 0,
+            'bytes_received': 0,
+            'retries': 0,
+            'rate_limit_wait': 0.0,
+        }
+
+    return CALLS[key]
+
+
+def record_call(service, call, status, elapsed, bytes_sent=0, bytes_received=0):
+    """
+    Records one request (or one attempt of a retried request) made by a call site.
+
+    Args:
+        service (str): `'insly'`, `'pipedrive'`, `'sheets'` or the host name.
+        call (str): The call site, e.g. `'get_customer_policy'` or `'Search.deal'`.
+        status (int | str): The HTTP status code, `'ok'`, or the name of the exception that was raised.
+        elapsed (float): The latency in seconds.
+        bytes_sent (int): The size of the request body. Defaults to 0.
+        bytes_received (int): The size of the response body. Defaults to 0.
+    """
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+
+    with METRICS_LOCK:
+        entry = _entry(service, call)
+        entry['requests'] += 1
+        entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+        entry['latency_sum'] += elapsed
+        entry['latency_buckets'][bucket] += 1
+        entry['bytes_sent'] += bytes_sent
+        entry['bytes_received'] += bytes_received
+
+
+def record_retry(service, call):
+    """
+    Records that a call site is resending a request (e.g. after `429`).
+    """
+    with METRICS_LOCK:
+        _entry(service, call)['retries'] += 1
+
+
+def record_rate_limit_wait(service, call, seconds):
+    """
+    Records the time a call site waited for the rate limiter, including `429` backoff.
+    """
+    if seconds <= 0:
+        return
+
+    with METRICS_LOCK:
+        _entry(service, call)['rate_limit_wait'] += seconds
+
+
+def record_sleep(reason, seconds):
+    """
+    Records a deliberate sleep outside of the HTTP layer (polling, queue retries, ...).
+    """
+    with METRICS_LOCK:
+        count, total = SLEEPS.get(reason, (0, 0.0))
+        SLEEPS[reason] = (count + 1, total + seconds)
+
+
+def sleep(reason, seconds):
+    """
+    `time.sleep()` that records the time slept under `reason`.
+    """
+    record_sleep(reason, seconds)
+    time.sleep(seconds)
+
+
+@contextmanager
+def timed(service, call):
+    """
+    Records a call that does not go through `http_client` (e.g. a `gspread` request) as one request.
+
+    .. rubric:: Behavior
+    - Records the status `'ok'`, or the name of the exception raised inside the block (which is re-raised).
+    """
+    started = time.monotonic()
+
+    try:
+        yield
+    except Exception as e:
+        record_call(service, call, type(e).__name__, time.monotonic() - started)
+        raise
+
+    record_call(service, call, 'ok', time.monotonic() - started)
+
+
+def snapshot():
+    """
+    Returns a copy of every metric recorded so far, to compute the metrics of a single run with `summary()`.
+    """
+    with METRICS_LOCK:
+        return {'calls': copy.deepcopy(CALLS), 'sleeps': dict(SLEEPS), 'taken_at': time.monotonic()}
+
+
+def summary(since=None):
+    """
+    Summarizes the recorded metrics, optionally only those recorded after a `snapshot()`.
+
+    Args:
+        since (dict | None): A `snapshot()` taken at the start of the run. Defaults to `None` (everything).
+
+    Returns:
+        dict: `calls` (one entry per `service/call` with counts, statuses, latency histogram and percentiles,
+        bytes, retries and rate limit wait), `sleeps` (`count` and `seconds` per reason), the `http_seconds`,
+        `rate_limit_wait_seconds` and `sleep_seconds` totals, and `wall_seconds` since `since`.
+    """
+    current = snapshot()
+    before = since or {'calls': {}, 'sleeps': {}, 'taken_at': None}
+    calls = {}
+
+    for key, entry in current['calls'].items():
+        old = before['calls'].get(key)
+
+        if old is not None:
+            entry = {
+                'requests': entry['requests'] - old['requests'],
+                'statuses': {status: count - old['statuses'].get(status, 0)
+                             for status, count in entry['statuses'].items()
+                             if count - old['statuses'].get(status, 0)},
+                'latency_sum': entry['latency_sum'] - old['latency_sum'],
+                'latency_buckets': [new - prev for new, prev in zip(entry['latency_buckets'], old['latency_buckets'])],
+                'bytes_sent': entry['bytes_sent'] - old['bytes_sent'],
+                'bytes_received': entry['bytes_received'] - old['bytes_received'],
+                'retries': entry['retries'] - old['retries'],
+                'rate_limit_wait': entry['rate_limit_wait'] - old['rate_limit_wait'],
+            }
+
+        if not entry['requests'] and not entry['retries']:
+            continue
+
+        calls['/'.join(key)] = {
+            'requests': entry['requests'],
+            'statuses': entry['statuses'],
+            'latency_seconds': {
+                'sum': round(entry['latency_sum'], 3),
+                'avg': round(entry['latency_sum'] / entry['requests'], 4) if entry['requests'] else 0.0,
+                'p50': percentile(entry['latency_buckets'], 0.5),
+                'p95': percentile(entry['latency_buckets'], 0.95),
+                'buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], entry['latency_buckets'])),
+            },
+            'bytes_sent': entry['bytes_sent'],
+            'bytes_received': entry['bytes_received'],
+            'retries': entry['retries'],
+            'rate_limit_wait_seconds': round(entry['rate_limit_wait'], 3),
+        }
+
+    sleeps = {}
+    for reason, (count, seconds) in current['sleeps'].items():
+        old_count, old_seconds = before['sleeps'].get(reason, (0, 0.0))
+
+        if count - old_count:
+            sleeps[reason] = {'count': count - old_count, 'seconds': round(seconds - old_seconds, 3)}
+
+    return {
+        'calls': calls,
+        'sleeps': sleeps,
+        'http_seconds': round(sum(call['latency_seconds']['sum'] for call in calls.values()), 3),
+        'rate_limit_wait_seconds': round(sum(call['rate_limit_wait_seconds'] for call in calls.values()), 3),
+        'sleep_seconds': round(sum(sleep['seconds'] for sleep in sleeps.values()), 3),
+        'wall_seconds': round(current['taken_at'] - before['taken_at'], 3) if before['taken_at'] else None,
+    }
+
+
+def percentile(buckets, quantile):
+    """
+    Estimates a latency percentile from histogram bucket counts (the upper bound of the matching bucket).
+
+    Returns:
+        float | None: The bucket bound in seconds, `None` if the bucket is `+Inf` or there are no requests.
+    """
+    total = sum(buckets)
+    if not total:
+        return None
+
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS + (None,), buckets):
+        seen += count
+        if seen >= quantile * total:
+            return bound
+
+    return None
+
+
+def write_summary(run, since=None, path=METRICS_SUMMARY_PATH):
+    """
+    Writes the `summary()` of a run as JSON.
+
+    Args:
+        run (str): The name of the run, e.g. `'main'` or `'filtered_auto_close'`.
+        since (dict | None): The `snapshot()` taken at the start of the run. Defaults to `None`.
+        path (str): The output file, with `{run}` replaced by `run`. Defaults to `METRICS_SUMMARY_PATH`;
+            nothing is written if empty.
+
+    Returns:
+        dict: The summary of the run.
+
+    Note:
+        - A file that cannot be written is reported and skipped, so metrics never fail the job they describe.
+    """
+    data = {'run': run, 'finished_at': datetime.now().isoformat(timespec='seconds'), **summary(since)}
+
+    if path:
+        try:
+            with open(path.replace('{run}', run), 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"'write_summary': Could not write the metrics of {run}: {e}")
+
+    print(f"\nMetrics ({run}): {data['http_seconds']}s in HTTP, {data['rate_limit_wait_seconds']}s waiting "
+          f"for rate limits, {data['sleep_seconds']}s sleeping, {data['wall_seconds']}s wall time.")
+    return data
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """
+    Renders every metric recorded since the process started in the Prometheus text exposition format.
+    """
+    current = snapshot()
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+
+    def labels(service, call, **extra):
+        pairs = {'service': service, 'call': call, **extra}
+        return '{' + ','.join(f'{key}="{_label(value)}"' for key, value in pairs.items()) + '}'
+
+    calls = sorted(current['calls'].items())
+
+    family('requests_total', 'counter', 'HTTP requests (and Sheets calls) per call site and status.')
+    for (service, call), entry in calls:
+        for status, count in sorted(entry['statuses'].items()):
+            lines.append(f'{PREFIX}_requests_total{labels(service, call, status=status)} {count}')
+
+    family('request_duration_seconds', 'histogram', 'Latency of a single request per call site.')
+    for (service, call), entry in calls:
+        cumulative = 0
+        for bound, count in zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], entry['latency_buckets']):
+            cumulative += count
+            lines.append(f'{PREFIX}_request_duration_seconds_bucket{labels(service, call, le=bound)} {cumulative}')
+        lines.append(f'{PREFIX}_request_duration_seconds_sum{labels(service, call)} {entry["latency_sum"]:.6f}')
+        lines.append(f'{PREFIX}_request_duration_seconds_count{labels(service, call)} {entry["requests"]}')
+
+    for name, key, help_text in (
+            ('request_bytes_total', 'bytes_sent', 'Request body bytes sent per call site.'),
+            ('response_bytes_total', 'bytes_received', 'Response body bytes received per call site.'),
+            ('retries_total', 'retries', 'Requests resent after a 429 per call site.'),
+            ('rate_limit_wait_seconds_total', 'rate_limit_wait', 'Time spent waiting for the rate limiter per call site.')):
+        family(name, 'counter', help_text)
+        for (service, call), entry in calls:
+            lines.append(f'{PREFIX}_{name}{labels(service, call)} {entry[key]}')
+
+    family('sleep_seconds_total', 'counter', 'Time spent in deliberate sleeps outside of HTTP requests.')
+    for reason, (count, seconds) in sorted(current['sleeps'].items()):
+        lines.append(f'{PREFIX}_sleep_seconds_total{{reason="{_label(reason)}"}} {seconds:.6f}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves `prometheus_text()` on `/metrics`.
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Starts the Prometheus text endpoint in a daemon thread, once per process.
+
+    Args:
+        port (int): The port to listen on. Defaults to `METRICS_PORT`; nothing is started if `0`.
+        host (str): The address to listen on. Defaults to `METRICS_HOST`.
+
+    Returns:
+        ThreadingHTTPServer | None: The running server, or `None` if it is disabled.
+    """
+    global SERVER
+
+    if not port:
+        return None
+
+    with METRICS_LOCK:
+        if SERVER is None:
+            SERVER = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=SERVER.serve_forever, name='metrics-server', daemon=True).start()
+            print(f"Serving metrics on {host}:{port}.")
+
+    return SERVER
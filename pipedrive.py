@@ -1,14 +1,25 @@
+import contextvars
 import json
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+import http_client
 from datetime import datetime
-from helper import is_email_valid, truncate_utf8, extract_valid_phone
+from rate_limiter import PIPEDRIVE_BASE_URL
+from helper import is_email_valid, truncate_utf8, extract_valid_phone, json_fingerprint, OBJECTS_NOTE_HEADING
 
-BASE_URL_V2 = 'https://api.pipedrive.com/api/v2'
-BASE_URL_V1 = 'https://api.pipedrive.com/v1'
+BASE_URL_V2 = f'{PIPEDRIVE_BASE_URL}/api/v2'
+BASE_URL_V1 = f'{PIPEDRIVE_BASE_URL}/v1'
 PIPEDRIVE_TOKEN = None
 
+# Token of the client making the current call; overrides `PIPEDRIVE_TOKEN` (see `pipedrive_async.AsyncPipedrive`)
+API_TOKEN = contextvars.ContextVar('pipedrive_api_token', default=None)
+
+# Largest page size accepted by Pipedrive list endpoints, and most custom fields a `v2` list request can project
+MAX_PAGE_SIZE = 500
+MAX_CUSTOM_FIELDS = 15
+
 # Custom fields keys
 INSLY_PERSON_OID = '86cae975675fb340afc1574e4743ae2f91604c62'
 INSLY_ORGANIZATION_OID = '56fb82b7bf51f92fa7bb075d6225b240aca335c4'
@@ -36,6 +47,25 @@ POLICY_ON_ATB_OPTION = 'bf0217a840456447e891aebbf04ad4e433440a8e'
 PAYMENT_AMMOUNT = 'ac342bbd15a8163f75adf6fab3851b720ff716b5'
 POLICY_START_DATE = '535dfbaa8ee8143dfd74ada7df72c4df1a2c14db'
 
+# Deal field options, loaded once per run by `Pipedrive.load_field_option_index()`:
+# {field_key: {'field_id', 'field_name', 'options': [{'id', 'label'}], 'labels': {normalized label: option id}}}
+FIELD_OPTION_INDEX = None
+FIELD_OPTION_LOCK = threading.RLock()
+
+# `SyncState` used to skip unchanged writes and to mirror entity and note IDs (see `Pipedrive.use_sync_state()`)
+SYNC_STATE = None
+
+# Markers that identify the notes written by this script (see `note_kind()`)
+OBJECTS_NOTE_MARKER = OBJECTS_NOTE_HEADING
+PAYMENT_NOTE_MARKER = '<table'
+# Bodies of objects notes written before every variant carried `OBJECTS_NOTE_MARKER`
+LEGACY_OBJECTS_NOTES = ('<p>No objects found for this policy.</p>', '<p>Error fetching policy objects.</p>')
+
+# Deal ID -> (objects note ID, payment table note ID), filled by `Pipedrive.prefetch_deal_notes()`
+DEAL_NOTES = {}
+DEAL_NOTES_COMPLETE = False
+DEAL_NOTES_LOCK = threading.Lock()
+
 
 class Pipedrive:
     def __init__(self, token: str):
@@ -43,33 +73,373 @@ class Pipedrive:
             raise ValueError('API token is required!')
         global PIPEDRIVE_TOKEN
         PIPEDRIVE_TOKEN = token
+        self.token = token
+
+    @staticmethod
+    def use_sync_state(sync_state):
+        """
+        Enables (or, with `None`, disables) skipping of unchanged writes and the entity and note ID mirrors.
+
+        Args:
+            sync_state (SyncState | None): The store that remembers the last body written to every entity,
+                the Pipedrive ID of every Insly object and the note IDs of every deal.
+        """
+        global SYNC_STATE
+        SYNC_STATE = sync_state
+
+    @staticmethod
+    def changed_body_fingerprint(entity_type, entity_id, body):
+        """
+        Fingerprints a request body and compares it with the last body written to the same entity.
+
+        Args:
+            entity_type (str): The kind of write, e.g. `'organization'`, `'deal'` or `'note'`.
+            entity_id (int): The Pipedrive ID of the entity.
+            body (dict): The request body about to be sent.
+
+        Returns:
+            str | None: The fingerprint of `body`, or `None` if it is identical to the last pushed one.
+        """
+        fingerprint = json_fingerprint(body)
+
+        if SYNC_STATE is not None and SYNC_STATE.is_written(entity_type, entity_id, fingerprint):
+            return None
+
+        return fingerprint
+
+    @staticmethod
+    def remember_write(entity_type, entity_id, body_or_fingerprint):
+        """
+        Records a body (or its fingerprint) that Pipedrive accepted, if write skipping is enabled.
+        """
+        if SYNC_STATE is None or entity_id is None:
+            return
+
+        fingerprint = body_or_fingerprint
+        if not isinstance(fingerprint, str):
+            fingerprint = json_fingerprint(body_or_fingerprint)
+
+        SYNC_STATE.record_write(entity_type, entity_id, fingerprint)
+
+    @staticmethod
+    def mirrored_id(kind, insly_oid):
+        """
+        Returns the Pipedrive ID mirrored for an Insly OID, or `None` if there is no mirror or no mapping.
+        """
+        if SYNC_STATE is None:
+            return None
+
+        return SYNC_STATE.entity_id(kind, insly_oid)
+
+    @staticmethod
+    def remember_entity(kind, insly_oid, pipedrive_id):
+        """
+        Mirrors an Insly OID → Pipedrive ID mapping, if a mirror is enabled.
+        """
+        if SYNC_STATE is None or insly_oid is None or pipedrive_id is None:
+            return
+
+        SYNC_STATE.remember_entities(kind, [(insly_oid, pipedrive_id)])
+
+    @staticmethod
+    def forget_entity(kind, pipedrive_id):
+        """
+        Drops the mirrored mappings of a Pipedrive entity that was not found (`404`).
+        """
+        if SYNC_STATE is None:
+            return
+
+        print(f"\t{pipedrive_id}: {kind.capitalize()} no longer exists in Pipedrive.")
+        SYNC_STATE.forget_entity(kind, pipedrive_id)
+
+    @staticmethod
+    def seed_entity_map():
+        """
+        Fills the entity mirror from Pipedrive's paginated list endpoints.
+
+        .. rubric:: Behavior
+        - Lists every organization, person and deal through the `v2` list endpoints, projected to the OID field only.
+        - Stores the Insly OID custom field (`INSLY_ORGANIZATION_OID`, `INSLY_PERSON_OID`, `POLICY_OID`)
+          of each of them against its Pipedrive ID.
+        - When a listing is complete, replaces the mirror of that kind with it (`SyncState.replace_entities()`):
+          entities deleted in Pipedrive lose their mapping and their recorded writes, so they are created again
+          instead of having their unchanged writes skipped.
+        - If a listing fails part-way, only adds the mappings it got and keeps the rest of the mirror.
+        - Does nothing if no mirror is enabled.
+
+        Note:
+            - Uses a few large list requests instead of one search request per customer and policy.
+        """
+        if SYNC_STATE is None:
+            return
+
+        for kind, path, field_key in (('organization', 'organizations', INSLY_ORGANIZATION_OID),
+                                      ('person', 'persons', INSLY_PERSON_OID),
+                                      ('deal', 'deals', POLICY_OID)):
+            print(f"Seeding {kind} IDs...")
+            mappings = []
+
+            try:
+                for item in list_v2(path, custom_fields=(field_key,), name='seed_entity_map', strict=True):
+                    if (item.get('custom_fields') or {}).get(field_key) not in (None, ''):
+                        mappings.append((item['custom_fields'][field_key], item['id']))
+            except requests.HTTPError as e:
+                print(f"\tListing incomplete ({e}), keeping the mirrored {kind} IDs.")
+                SYNC_STATE.remember_entities(kind, mappings)
+                continue
+
+            stale = SYNC_STATE.replace_entities(kind, mappings)
+            print(f"\t{len(mappings)} {kind} IDs mirrored, {stale} deleted in Pipedrive.")
+
+    @staticmethod
+    def prefetch_deal_notes(updated_since=None):
+        """
+        Loads the notes of many deals at once from the notes list endpoint.
+
+        Args:
+            updated_since (datetime | None): Only loads notes updated after this time (UTC), e.g. the start of the
+                previous run. Defaults to `None` (every note).
+
+        Returns:
+            int: The number of deals whose notes were loaded.
+
+        .. rubric:: Behavior
+        - Pages through `/v1/notes` (500 notes per request, oldest first) and tells every note apart with
+          `note_kind()` as it streams in, like `classify_deal_notes()` does: the oldest note of each kind wins.
+          Only the two note IDs of every deal are kept, never the note bodies.
+        - Caches the note IDs in `DEAL_NOTES`, where `Search.deal_notes()` finds them without a request,
+          and in the note mirror of the sync state.
+        - Without `updated_since`, a deal that is missing from the cache is known to have no notes.
+        - With `updated_since`, only some notes of a deal may be listed, so the result is merged into the note IDs
+          already known for the deal (the known ones win). A deal with no known note IDs is only cached when both
+          of its notes were found; the others are still looked up by `Search.deal_notes()`.
+        """
+        global DEAL_NOTES_COMPLETE
+
+        params = {'sort': 'id ASC'}
+        if updated_since is not None:
+            params['updated_since'] = updated_since.strftime('%Y-%m-%d %H:%M:%S')
+
+        # Deal ID -> [objects note ID, payment table note ID]
+        notes_by_deal = {}
+        for note in paginate(f'{BASE_URL_V1}/notes', params=params, name='prefetch_deal_notes'):
+            if note.get('deal_id') is None:
+                continue
+
+            kind = note_kind(note.get('content'))
+
+            # A full listing also proves that a deal with only other notes has neither of ours
+            if kind is None and updated_since is not None:
+                continue
+
+            note_ids = notes_by_deal.setdefault(note['deal_id'], [None, None])
+
+            if kind == 'objects':
+                note_ids[0] = note_ids[0] or note['id']
+            elif kind == 'payment':
+                note_ids[1] = note_ids[1] or note['id']
+
+        loaded = {}
+        with DEAL_NOTES_LOCK:
+            if updated_since is None:
+                DEAL_NOTES.clear()
+
+            for deal_id, note_ids in notes_by_deal.items():
+                note_ids = tuple(note_ids)
+
+                if updated_since is not None:
+                    known = DEAL_NOTES.get(deal_id) or (SYNC_STATE.deal_notes(deal_id) if SYNC_STATE else None)
+
+                    if known is None and None in note_ids:
+                        continue
+                    if known is not None:
+                        note_ids = tuple(old or new for old, new in zip(known, note_ids))
+
+                DEAL_NOTES[deal_id] = loaded[deal_id] = note_ids
+            DEAL_NOTES_COMPLETE = DEAL_NOTES_COMPLETE or updated_since is None
+
+        if SYNC_STATE is not None:
+            SYNC_STATE.remember_deal_notes((deal_id, *note_ids) for deal_id, note_ids in loaded.items())
+
+        print(f"Notes of {len(loaded)} deals loaded.")
+        return len(loaded)
+
+    @staticmethod
+    def clear_deal_notes():
+        """
+        Drops the note IDs cached by `prefetch_deal_notes()`, so later lookups ask Pipedrive again.
+        """
+        global DEAL_NOTES_COMPLETE
+
+        with DEAL_NOTES_LOCK:
+            DEAL_NOTES.clear()
+            DEAL_NOTES_COMPLETE = False
+
+    @staticmethod
+    def remember_deal_note(deal_id, content, note_id):
+        """
+        Updates the cached and mirrored note IDs of a deal after a note was added to it.
+        """
+        with DEAL_NOTES_LOCK:
+            cached = deal_id in DEAL_NOTES or DEAL_NOTES_COMPLETE
+            mirrored = SYNC_STATE.deal_notes(deal_id) if SYNC_STATE is not None else None
+            objects_note_id, payment_note_id = DEAL_NOTES.get(deal_id) or mirrored or (None, None)
+
+            kind = note_kind(content)
+            if kind == 'payment':
+                payment_note_id = payment_note_id or note_id
+            elif kind == 'objects':
+                objects_note_id = objects_note_id or note_id
+
+            if cached:
+                DEAL_NOTES[deal_id] = (objects_note_id, payment_note_id)
+
+        if SYNC_STATE is not None:
+            SYNC_STATE.remember_deal_notes([(deal_id, objects_note_id, payment_note_id)])
+
+    @staticmethod
+    def forget_deal_note(deal_id, note_id):
+        """
+        Drops a note that no longer exists in Pipedrive from the cached and mirrored note IDs of its deal.
+        """
+        with DEAL_NOTES_LOCK:
+            if deal_id in DEAL_NOTES:
+                DEAL_NOTES[deal_id] = tuple(None if known == note_id else known for known in DEAL_NOTES[deal_id])
+
+        if SYNC_STATE is not None:
+            SYNC_STATE.forget_deal_note(deal_id, note_id)
 
     @staticmethod
     def find_custom_field_option_id(custom_field_key, option_label):
+        """
+        Resolves the option ID of a deal custom field by its label, creating the option if it does not exist.
+
+        Args:
+            custom_field_key (str): The key of the deal custom field.
+            option_label (str): The label of the option to look up.
+
+        Returns:
+            int | None: The option ID, or `None` if no label was given or the option could not be created.
+
+        .. rubric:: Behavior
+        - Looks the normalized label up in `FIELD_OPTION_INDEX` (loaded once per run, see `clear_field_option_index()`).
+        - Falls back to a case-insensitive substring match and remembers the result for the next lookup.
+        - If no option matches, re-reads the field from Pipedrive, since options may have been added since the index
+          was loaded. If the label is still missing, creates it via `Pipedrive.Update.field_data()` from the fresh
+          option list and adds it to the index in place.
+
+        Note:
+            - Only the initial index load and option creation send requests to Pipedrive.
+            - Pipedrive replaces the whole option list on update, so it is never built from the cached options.
+            - Runs under `FIELD_OPTION_LOCK`, so concurrent workers never create the same option twice.
+        """
         if not option_label:
             print("No 'option_label' provided!")
             return
 
-        field_data = Pipedrive.Get.deal_field_data(custom_field_key)
+        with FIELD_OPTION_LOCK:
+            return Pipedrive._find_custom_field_option_id(custom_field_key, option_label)
+
+    @staticmethod
+    def _find_custom_field_option_id(custom_field_key, option_label):
+        field = Pipedrive.load_field_option_index().get(custom_field_key)
+
+        if field is None:
+            print(f"Deal field '{custom_field_key}' has no options!")
+            return
 
-        field_id = field_data[0]['field_id']
-        field_name = field_data[0]['field_name']
-        options = field_data[0]['options']
-        
-        for option in options:
-            if option_label.lower() in option['label'].lower():
+        label = normalize_option_label(option_label)
+
+        if label in field['labels']:
+            return field['labels'][label]
+
+        for option in field['options']:
+            if label in option['label'].lower():
+                field['labels'][label] = option['id']
                 return option['id']
-        
+
+        current_field = Pipedrive.Get.deal_field(field['field_id'])
+
+        if current_field is None:
+            return
+
+        Pipedrive.index_field_options(current_field)
+        field = FIELD_OPTION_INDEX[custom_field_key]
+
+        if label in field['labels']:
+            return field['labels'][label]
+
         print(f"No option found by label '{option_label}', creating new option...")
-        options.append({'label': option_label})
-        
-        time.sleep(1)
-        Pipedrive.Update.field_data(field_id, field_name, options)
-        time.sleep(1)
-        return Pipedrive.find_custom_field_option_id(custom_field_key, option_label)
+        options = field['options'] + [{'label': option_label}]
+
+        updated_field = Pipedrive.Update.field_data(field['field_id'], field['field_name'], options)
+
+        if updated_field is None:
+            return
+
+        Pipedrive.index_field_options(updated_field)
+        return FIELD_OPTION_INDEX[custom_field_key]['labels'].get(label)
+
+    @staticmethod
+    def load_field_option_index(force_refresh=False):
+        """
+        Returns the deal field option index, fetching all deal fields from Pipedrive on first use.
+
+        Args:
+            force_refresh (bool): Rebuilds the index even if it is already loaded. Defaults to `False`.
+
+        Returns:
+            dict: The `FIELD_OPTION_INDEX` mapping of field key to field ID, name, options and label lookup.
+        """
+        global FIELD_OPTION_INDEX
+
+        with FIELD_OPTION_LOCK:
+            if FIELD_OPTION_INDEX is not None and not force_refresh:
+                return FIELD_OPTION_INDEX
+
+            fields = Pipedrive.Get.deal_fields()
+
+            if not fields:
+                return FIELD_OPTION_INDEX or {}
+
+            FIELD_OPTION_INDEX = {}
+            for item in fields:
+                Pipedrive.index_field_options(item)
+
+            return FIELD_OPTION_INDEX
+
+    @staticmethod
+    def clear_field_option_index():
+        """
+        Drops `FIELD_OPTION_INDEX`, so the next lookup reloads the deal fields. Called at the start of every run.
+        """
+        global FIELD_OPTION_INDEX
+
+        with FIELD_OPTION_LOCK:
+            FIELD_OPTION_INDEX = None
 
     @staticmethod
-    def get_deal_body(policy_info_arr, entity_id, entype, deal_owner):
+    def index_field_options(item):
+        """
+        Adds (or replaces) a single deal field in `FIELD_OPTION_INDEX`.
+
+        Args:
+            item (dict): A deal field as returned by the `dealFields` endpoints.
+        """
+        if not item.get('options'):
+            return
+
+        options = [{'id': option['id'], 'label': option['label']} for option in item['options']]
+
+        FIELD_OPTION_INDEX[item['key']] = {
+            'field_id': item.get('id'),
+            'field_name': item.get('name'),
+            'options': options,
+            'labels': {normalize_option_label(option['label']): option['id'] for option in options}
+        }
+
+    @staticmethod
+    def get_deal_body(policy_info_arr, entity_id, entype, deal_owner, sheet_info=None):
         """
         Constructs the request body for creating or updating a deal in Pipedrive.
 
@@ -81,6 +451,8 @@ class Pipedrive:
             entity_id (int): The ID of the associated entity (e.g., company or person).
             entype (str): The type of entity associated with the deal.
             deal_owner (int | None): The Pipedrive user ID of the deal owner.
+            sheet_info (tuple | None): The spreadsheet `info` tuple of the policy (see `SheetIndex.info()`),
+                merged into `custom_fields` with `get_sheet_custom_fields()`. Defaults to `None`.
 
         Returns:
             dict: A dictionary representing the deal's request body, ready for use in API calls to Pipedrive.
@@ -94,6 +466,8 @@ class Pipedrive:
           the insurer and product fields based on their names.
         - Truncates object details using `truncate_utf8()` to ensure compliance
           with character limits.
+        - If `sheet_info` is given, adds the spreadsheet fields, so the deal is written with a single request;
+          the spreadsheet insurer takes precedence over the Insly one.
 
         Note:
             - The method assumes `PRODUCT` and `INSURER` are predefined constants representing
@@ -121,6 +495,9 @@ class Pipedrive:
             }
         }
 
+        if sheet_info is not None:
+            body["custom_fields"].update(Pipedrive.get_sheet_custom_fields(sheet_info))
+
         if policy_info_arr[7] is not None:
             body["status"] = policy_info_arr[7]
 
@@ -138,6 +515,45 @@ class Pipedrive:
             body["person_id"] = entity_id
         return body
 
+    @staticmethod
+    def get_sheet_custom_fields(info):
+        """
+        Maps the spreadsheet `info` tuple of a policy (see `SheetIndex.info()`) to deal custom fields.
+
+        Args:
+            info (tuple): The values returned by `fetch_non_api_data()`.
+
+        Returns:
+            dict: The custom field values, keyed by custom field key. Fields without a value are left out.
+
+        Note:
+            - Seller and responsibility labels without a known Pipedrive ID are resolved
+              (or created) with `find_custom_field_option_id()`.
+            - Blank cells do not clear a field, so a blank insurer cell keeps the insurer taken from Insly
+              in `get_deal_body()`.
+        """
+        fields = {
+            # POLICY_ON_ATTB: info[0],
+            RENEWED_OFFER_QUANTITY: info[1],
+            RENEWAL_POLICY_QUANTITY: info[2],
+            RENEWED_POLICY_INSURER: info[3],
+            # STATUS: info[4],
+            # RENEWAL: info[5],
+            RENEWAL_START_DATE: info[6],
+            REGISTRATION_CERTIFICATE_NO: info[7],
+            INSURER: Pipedrive.find_custom_field_option_id(INSURER, info[10]),
+            SELLER_OPTION: (
+                Pipedrive.find_custom_field_option_id(SELLER_OPTION, info[8])
+                if not isinstance(info[8], int) else info[8]
+            ),
+            POLICY_ON_ATB_OPTION: (
+                Pipedrive.find_custom_field_option_id(POLICY_ON_ATB_OPTION, info[9])
+                if not isinstance(info[9], int) else info[9]
+            )
+        }
+
+        return {key: value for key, value in fields.items() if value is not None}
+
     @staticmethod
     def get_organization_body(org_info, address_info):
         """
@@ -298,9 +714,10 @@ class Pipedrive:
                     - `(None, None)`: If no matching organization is found.
 
             .. rubric:: Behavior
+            - Returns `(org_id, None)` without a request if the ID is mirrored locally.
             - Sends a request to the Pipedrive API to search for an organization by `insly_customer_oid`.
             - Uses an exact match to ensure precise results.
-            - If the organization exists, returns its ID and name.
+            - If the organization exists, mirrors and returns its ID and name.
             - If no organization is found, returns `(None, None)`.
             - If the request fails, logs an error message.
 
@@ -309,10 +726,14 @@ class Pipedrive:
                 - The API request uses an exact match to prevent partial matches.
                 - The returned `org_id` can be used for further operations in Pipedrive.
             """
+            org_id = Pipedrive.mirrored_id('organization', insly_customer_oid)
+            if org_id is not None:
+                return org_id, None
+
             url = f'{BASE_URL_V2}/organizations/search?term={insly_customer_oid}'
-            params = {'api_token': PIPEDRIVE_TOKEN, 'exact_match': 1}
+            params = {'api_token': api_token(), 'exact_match': 1}
 
-            response = requests.get(url=url, params=params)
+            response = http_client.get(url=url, params=params, name='Search.organization')
 
             if response.status_code == 200:
                 data = response.json()
@@ -323,6 +744,7 @@ class Pipedrive:
                     for item in items:
                         org_id = item['item']['id']
                         org_name = item['item']['name']
+                        Pipedrive.remember_entity('organization', insly_customer_oid, org_id)
                         return org_id, org_name
 
                 else:
@@ -345,9 +767,10 @@ class Pipedrive:
                 otherwise `(None, None)`.
 
             .. rubric:: Behavior
+            - Returns `(person_id, None)` without a request if the ID is mirrored locally.
             - Sends a request to the Pipedrive API to search for a person by `insly_customer_oid`.
             - Uses an exact match to ensure precise results.
-            - If the person exists, returns their ID and name.
+            - If the person exists, mirrors and returns their ID and name.
             - If no person is found, returns `(None, None)`.
             - If the request fails, logs an error message.
 
@@ -356,10 +779,14 @@ class Pipedrive:
                 - The API request uses an exact match to prevent partial matches.
                 - The returned `org_id` can be used for further operations in Pipedrive.
             """
+            person_id = Pipedrive.mirrored_id('person', insly_customer_oid)
+            if person_id is not None:
+                return person_id, None
+
             url = f'{BASE_URL_V2}/persons/search?term={insly_customer_oid}'
-            params = {'api_token': PIPEDRIVE_TOKEN, 'exact_match': 1}
+            params = {'api_token': api_token(), 'exact_match': 1}
 
-            response = requests.get(url=url, params=params)
+            response = http_client.get(url=url, params=params, name='Search.person')
 
             if response.status_code == 200:
                 data = response.json()
@@ -369,6 +796,7 @@ class Pipedrive:
                     for item in items:
                         person_id = item['item']['id']
                         person_name = item['item']['name']
+                        Pipedrive.remember_entity('person', insly_customer_oid, person_id)
                         return person_id, person_name
 
                 else:
@@ -391,9 +819,10 @@ class Pipedrive:
                 otherwise `(None, None)`.
 
             .. rubric:: Behavior
+            - Unless `return_status` is set, returns `(deal_id, None, None)` without a request if the ID is mirrored locally.
             - Sends a request to the Pipedrive API to search for a deal by `insly_policy_oid`.
             - Uses an exact match to ensure precise results.
-            - If the deal exists, returns its ID and title.
+            - If the deal exists, mirrors and returns its ID and title.
             - If no deal is found, returns `(None, None)`.
             - If the request fails, logs an error message.
 
@@ -402,16 +831,23 @@ class Pipedrive:
                 - The API request uses an exact match to prevent partial matches.
                 - The returned `deal_id` can be used for further operations in Pipedrive.
             """
+            if not return_status:
+                deal_id = Pipedrive.mirrored_id('deal', insly_policy_oid)
+                if deal_id is not None:
+                    return deal_id, None, None
+
             url = f'{BASE_URL_V2}/deals/search?term={insly_policy_oid}'
-            params = {'api_token': PIPEDRIVE_TOKEN, 'exact_match': 1}
+            params = {'api_token': api_token(), 'exact_match': 1}
 
-            response = requests.get(url=url, params=params)
+            response = http_client.get(url=url, params=params, name='Search.deal')
 
             if response.status_code == 200:
                 data = response.json()
                 if data['data']['items']:
                     items = data['data']['items']
 
+                    Pipedrive.remember_entity('deal', insly_policy_oid, items[0]['item']['id'])
+
                     if return_status:
                         for item in items:
                             deal_id = item['item']['id']
@@ -432,148 +868,145 @@ class Pipedrive:
                 print(response.json())
 
         @staticmethod
-        def all_deals(start_pos=1, limit=50, results=None, filter_id=None):
+        def list_deals(filter_id=None, custom_fields=(), **params):
             """
-            Retrieves all deals from Pipedrive, collecting `id` and values associated with `POLICY_OID`.
+            Streams deals from the `v2` deals endpoint, with only the requested custom fields.
 
             Args:
-                start_pos (int): The starting position for pagination. Defaults to 0.
-                limit (int): The number of deals to fetch per request. Defaults to 50.
-                results (list): A list to accumulate extracted dictionaries. Defaults to None.
+                filter_id (int | None): The ID of a Pipedrive filter to apply. Defaults to `None` (every deal).
+                custom_fields (Iterable[str]): The custom field keys to include in `custom_fields`. Defaults to none.
+                **params: Further `v2` query parameters (`status`, `owner_id`, `updated_since`, `sort_by`, ...).
 
-            Returns:
-                list[dict]: A list of dictionaries containing `id` and `POLICY_OID` values.
-
-            .. rubric:: Behavior
-            - Sends a request to the Pipedrive API to retrieve deals with pagination.
-            - Extracts and stores the `id` and the corresponding `POLICY_OID` value from each deal.
-            - If there are more items available, recursively calls itself with `next_start`.
-            - Accumulates all extracted data across multiple paginated requests.
-            - Returns the full list of dictionaries.
+            Yields:
+                dict: The deals as returned by Pipedrive.
 
             Note:
-                - Uses `BASE_URL_V1` for the API endpoint.
-                - The function is recursive and continues fetching until all deals are retrieved.
-                - Includes a small delay (`time.sleep(0.5)`) between requests to avoid hitting rate limits.
-                - Ensures that both `id` and `POLICY_OID` values are captured for each deal.
+                - Reusable by every filter-driven job; see `list_v2()`.
             """
-            if results is None:
-                results = []
+            if filter_id is not None:
+                params['filter_id'] = filter_id
 
-            url = f'{BASE_URL_V1}/deals'
-            params = {
-                'api_token': PIPEDRIVE_TOKEN,
-                'filter_id': filter_id,
-                'start': start_pos,
-                'limit': limit
-            }
+            yield from list_v2('deals', custom_fields=custom_fields, params=params, name='Search.list_deals')
 
-            response = requests.get(url=url, params=params)
+        @staticmethod
+        def iter_deals(filter_id=None):
+            """
+            Streams deals from Pipedrive, yielding `id` and the values associated with `POLICY_OID` and `POLICY_NO`.
 
-            if response.status_code == 200:
-                data = response.json()
+            Args:
+                filter_id (int | None): The ID of a Pipedrive filter to apply. Defaults to `None` (every deal).
 
-                if 'data' in data and isinstance(data['data'], list):
-                    for item in data['data']:
-                        policy_value = item.get(POLICY_OID)
-                        policy_number = item.get(POLICY_NO)
-                        deal_id = item.get("id")
-                        if policy_value is not None and deal_id is not None:
-                            results.append({"id": deal_id, 
-                                            "policy": policy_value, 
-                                            "policy_number": policy_number
-                                            })
-
-                pagination = data.get('additional_data', {}).get('pagination', {})
-                if pagination.get('more_items_in_collection'):
-                    next_start = pagination.get('next_start')
-                    time.sleep(0.5)
-                    return Pipedrive.Search.all_deals(
-                        start_pos=next_start, 
-                        limit=limit, 
-                        results=results, 
-                        filter_id=filter_id
-                    )
+            Yields:
+                dict: `{"id": ..., "policy": ..., "policy_number": ...}` for every deal with a policy OID.
 
-            else:
-                print(f"Request failed with status code {response.status_code}")
-                print(response.json())
+            .. rubric:: Behavior
+            - Pages through the deals with `list_deals()`, fetching the next page while the current one is consumed.
+            - Requests only the `POLICY_OID` and `POLICY_NO` custom fields.
+            - Skips deals without an `id` or a `POLICY_OID` value.
 
-            return results
+            Note:
+                - Uses `BASE_URL_V2` for the API endpoint. Its cursor pagination stays correct when the caller
+                  updates deals so that they drop out of the filter while iterating, unlike `v1` offsets.
+                - Requests are paced by the shared rate limiter in `http_client`.
+            """
+            for item in Pipedrive.Search.list_deals(filter_id=filter_id, custom_fields=(POLICY_OID, POLICY_NO)):
+                custom_fields = item.get('custom_fields') or {}
+                policy_value = custom_fields.get(POLICY_OID)
+                policy_number = custom_fields.get(POLICY_NO)
+                deal_id = item.get("id")
+                if policy_value is not None and deal_id is not None:
+                    yield {"id": deal_id,
+                           "policy": policy_value,
+                           "policy_number": policy_number
+                           }
 
         @staticmethod
-        def note(deal_id):
+        def all_deals(filter_id=None):
+            """
+            Retrieves all deals from Pipedrive, collecting `id` and values associated with `POLICY_OID`.
+
+            Returns:
+                list[dict]: A list of dictionaries containing `id`, `policy` and `policy_number` values.
+
+            Note:
+                - Loads every deal into memory; prefer `iter_deals()` for large filters.
             """
-            Searches for a note associated with a given deal in Pipedrive.
+            return list(Pipedrive.Search.iter_deals(filter_id=filter_id))
+
+        @staticmethod
+        def deal_notes(deal_id):
+            """
+            Finds the policy objects note and the payment table note of a deal.
 
             Args:
                 deal_id (int): The unique identifier of the deal in Pipedrive.
 
             Returns:
-                int | None: The ID of the first found note if available, otherwise `None`.
+                tuple[int | None, int | None]: The IDs of the objects note and of the payment table note,
+                `None` for each one that does not exist.
 
             .. rubric:: Behavior
-            - Sends a request to the Pipedrive API to search for notes associated with `deal_id`.
-            - If notes exist, returns the ID of the first note found.
-            - If no notes are found, returns `None`.
-            - If the request fails, logs an error message.
+            - Returns the IDs cached by `Pipedrive.prefetch_deal_notes()` without a request when available,
+              then those mirrored in the sync state (see `Pipedrive.use_sync_state()`).
+            - Otherwise fetches all notes of `deal_id` with a single request and mirrors the result.
+            - Tells the two notes apart by their content (see `classify_deal_notes()`), not by their position.
+            - If the request fails, logs an error message and returns `(None, None)`.
 
             Note:
                 - Uses `BASE_URL_V1` for the API endpoint.
-                - The returned `deal_id` can be used for further operations in Pipedrive.
             """
-            url = f'{BASE_URL_V1}/notes?deal_id={deal_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            with DEAL_NOTES_LOCK:
+                if deal_id in DEAL_NOTES:
+                    return DEAL_NOTES[deal_id]
+                if DEAL_NOTES_COMPLETE:
+                    return None, None
+
+            mirrored = SYNC_STATE.deal_notes(deal_id) if SYNC_STATE is not None else None
+            if mirrored is not None:
+                return mirrored
+
+            url = f'{BASE_URL_V1}/notes'
+            params = {'api_token': api_token(), 'deal_id': deal_id, 'sort': 'id ASC', 'limit': 500}
 
-            response = requests.get(url=url, params=params)
+            response = http_client.get(url=url, params=params, name='Search.deal_notes')
 
             if response.status_code == 200:
-                data = response.json()
-                if data['data'] is not None:
-                    return data["data"][0]["id"]
+                note_ids = classify_deal_notes(response.json()['data'] or [])
+
+                if SYNC_STATE is not None:
+                    SYNC_STATE.remember_deal_notes([(deal_id, *note_ids)])
 
-                return None
+                return note_ids
             else:
-                print(f"'search_note': Request failed with status code {response.status_code}")
+                print(f"'search_deal_notes': Request failed with status code {response.status_code}")
                 print(response.json())
-                return None
+                return None, None
 
         @staticmethod
-        def payment_table_note(deal_id):
+        def note(deal_id):
             """
-            Searches for a note associated with a given deal in Pipedrive.
-
-            Args:
-                deal_id (int): The unique identifier of the deal in Pipedrive.
+            Searches for the policy objects note of a deal in Pipedrive.
 
             Returns:
-                int | None: The ID of the first found note if available, otherwise `None`.
-
-            .. rubric:: Behavior
-            - Sends a request to the Pipedrive API to search for notes associated with `deal_id`.
-            - If notes exist, returns the ID of the first note found.
-            - If no notes are found, returns `None`.
-            - If the request fails, logs an error message.
+                int | None: The ID of the note if available, otherwise `None`.
 
             Note:
-                - Uses `BASE_URL_V1` for the API endpoint.
-                - The returned `deal_id` can be used for further operations in Pipedrive.
+                - Prefer `deal_notes()`, which returns both note IDs with one request.
             """
-            url = f'{BASE_URL_V1}/notes?deal_id={deal_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            return Pipedrive.Search.deal_notes(deal_id)[0]
 
-            response = requests.get(url=url, params=params)
+        @staticmethod
+        def payment_table_note(deal_id):
+            """
+            Searches for the payment table note of a deal in Pipedrive.
 
-            if response.status_code == 200:
-                data = response.json()
-                if data['data'] is not None:
-                    second_id = data["data"][1]["id"] if len(data["data"]) > 1 else None
-                    return second_id
-                return None
-            else:
-                print(f"'search_payment_table_note': Request failed with status code {response.status_code}")
-                print(response.json())
-                return None
+            Returns:
+                int | None: The ID of the note if available, otherwise `None`.
+
+            Note:
+                - Prefer `deal_notes()`, which returns both note IDs with one request.
+            """
+            return Pipedrive.Search.deal_notes(deal_id)[1]
 
     class Add:
         """
@@ -602,13 +1035,15 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/organizations'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_organization_body(org_info, address_info)
 
-            response = requests.post(url=url, params=params, json=body)
+            response = http_client.post(url=url, params=params, json=body, name='Add.organization')
 
             if response.status_code == 200:
                 print(f'\t{response.json()['data']['id']}: Organization Added!')
+                Pipedrive.remember_write('organization', response.json()['data']['id'], body)
+                Pipedrive.remember_entity('organization', org_info[0], response.json()['data']['id'])
                 return response.json()['data']['id']
             else:
                 print(f"'add_organization': '{org_info[0]}' Request failed with status code {response.status_code}")
@@ -635,13 +1070,15 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/persons'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_person_body(info)
 
-            response = requests.post(url=url, params=params, json=body)
+            response = http_client.post(url=url, params=params, json=body, name='Add.person')
 
             if response.status_code == 200:
                 print(f'\t{response.json()['data']['id']}: Person added!')
+                Pipedrive.remember_write('person', response.json()['data']['id'], body)
+                Pipedrive.remember_entity('person', info[0], response.json()['data']['id'])
                 return response.json()['data']['id']
 
             else:
@@ -649,7 +1086,7 @@ class Pipedrive:
                 print(response.json())
 
         @staticmethod
-        def deal(policy_info_arr, entity_id, entype, deal_owner=None):
+        def deal(policy_info_arr, entity_id, entype, deal_owner=None, sheet_info=None):
             """
             Adds a new deal to Pipedrive.
 
@@ -658,6 +1095,7 @@ class Pipedrive:
                 entity_id (int): The ID of the associated entity (e.g., organization or person).
                 entype (str): The type of entity associated with the deal.
                 deal_owner (int): The ID of the deal owner.
+                sheet_info (tuple | None): Spreadsheet fields to write along with the deal. Defaults to `None`.
 
             Returns:
                 int | None: The ID of the newly created deal if successful, otherwise `None`.
@@ -672,13 +1110,17 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/deals'
-            params = {'api_token': PIPEDRIVE_TOKEN}
-            body = Pipedrive.get_deal_body(policy_info_arr, entity_id, entype, deal_owner)
+            params = {'api_token': api_token()}
+            body = Pipedrive.get_deal_body(policy_info_arr, entity_id, entype, deal_owner, sheet_info)
 
-            response = requests.post(url=url, params=params, json=body)
+            response = http_client.post(url=url, params=params, json=body, name='Add.deal')
 
             if response.status_code == 200:
                 print(f'\t{response.json()['data']['id']}: Deal added!')
+                # Updates never send the owner, so remember the body the way `Update.deal` builds it
+                update_body = {key: value for key, value in body.items() if key != 'owner_id'}
+                Pipedrive.remember_write('deal', response.json()['data']['id'], update_body)
+                Pipedrive.remember_entity('deal', policy_info_arr[10], response.json()['data']['id'])
                 return response.json()['data']['id']
             else:
                 print(f"'add_deal': Request failed with status code {response.status_code}")
@@ -695,12 +1137,12 @@ class Pipedrive:
                 note_owner (int): The ID of the user creating the note.
 
             Returns:
-                None
+                int | None: The ID of the newly created note if successful, otherwise `None`.
 
             .. rubric:: Behavior
             - Constructs a note body using `Pipedrive.get_note_body()`.
             - Sends a POST request to the Pipedrive API to create the note.
-            - If the request succeeds (status code 200 or 201), prints a success message.
+            - If the request succeeds (status code 200 or 201), prints a success message and returns the note ID.
             - If the request fails, logs an error message.
 
             Note:
@@ -709,13 +1151,16 @@ class Pipedrive:
             """
 
             url = f'{BASE_URL_V1}/notes'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_note_body(content, deal_id, note_owner)
 
-            response = requests.post(url=url, params=params, json=body)
+            response = http_client.post(url=url, params=params, json=body, name='Add.note')
 
             if response.status_code == 200 or response.status_code == 201:
                 print(f'\t{response.json()['data']['id']}: Note added!')
+                Pipedrive.remember_write('note', response.json()['data']['id'], body)
+                Pipedrive.remember_deal_note(deal_id, content, response.json()['data']['id'])
+                return response.json()['data']['id']
             else:
                 print(f"'add_note': Request failed with status code {response.status_code}")
                 print(response.json())
@@ -736,10 +1181,13 @@ class Pipedrive:
                 address_info (list | None): A list containing updated address details (street, country, postal code) or `None` if no changes.
 
             Returns:
-                None
+                bool | None: `True` if the organization is up to date (updated or unchanged), `False` if it no longer
+                exists in Pipedrive, `None` if the request failed.
 
             .. rubric:: Behavior
             - Constructs an updated organization body using `Pipedrive.get_organization_body()`.
+            - Skips the request if the body is identical to the last one pushed to this organization.
+            - If Pipedrive answers `404`, drops the mirrored ID and returns `False`.
             - Sends a PATCH request to the Pipedrive API to update the organization.
             - If the request succeeds, logs a success message.
             - If the request fails, logs an error message.
@@ -748,14 +1196,23 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/organizations/{org_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_organization_body(org_info, address_info)
 
-            response = requests.patch(url=url, params=params, json=body)
+            fingerprint = Pipedrive.changed_body_fingerprint('organization', org_id, body)
+            if fingerprint is None:
+                print(f'\t{org_id}: Organization unchanged, skipped.')
+                return True
+
+            response = http_client.patch(url=url, params=params, json=body, name='Update.organization')
 
             if response.status_code == 200:
                 print(f'\t{response.json()['data']['id']}: Organization Updated!')
-                pass
+                Pipedrive.remember_write('organization', org_id, fingerprint)
+                return True
+            elif response.status_code == 404:
+                Pipedrive.forget_entity('organization', org_id)
+                return False
             else:
                 print(f"'update_organization': '{org_info[0]}' Request failed with status code {response.status_code}")
                 print(response.json())
@@ -770,10 +1227,13 @@ class Pipedrive:
                 info (list): A list containing updated person details such as name, email, phone, and owner ID.
 
             Returns:
-                None
+                bool | None: `True` if the person is up to date (updated or unchanged), `False` if it no longer
+                exists in Pipedrive, `None` if the request failed.
 
             .. rubric:: Behavior
             - Constructs an updated person body using `Pipedrive.get_person_body()`.
+            - Skips the request if the body is identical to the last one pushed to this person.
+            - If Pipedrive answers `404`, drops the mirrored ID and returns `False`.
             - Sends a PATCH request to the Pipedrive API to update the person.
             - If the request succeeds, logs a success message.
             - If the request fails, logs an error message.
@@ -782,13 +1242,23 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/persons/{person_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_person_body(info)
 
-            response = requests.patch(url=url, params=params, json=body)
+            fingerprint = Pipedrive.changed_body_fingerprint('person', person_id, body)
+            if fingerprint is None:
+                print(f'\t{person_id}: Person unchanged, skipped.')
+                return True
+
+            response = http_client.patch(url=url, params=params, json=body, name='Update.person')
 
             if response.status_code == 200:
                 print(f'\t{person_id}: Person updated!')
+                Pipedrive.remember_write('person', person_id, fingerprint)
+                return True
+            elif response.status_code == 404:
+                Pipedrive.forget_entity('person', person_id)
+                return False
             else:
                 print(f"'update_person': '{person_id}' Request failed with status code {response.status_code}")
                 print(response.json())
@@ -804,10 +1274,11 @@ class Pipedrive:
                 status (str): Optional variable to set a status value
 
             Returns:
-                None
+                bool | None: `True` if the custom fields are up to date (updated or unchanged), `None` if the request failed.
 
             .. rubric:: Behavior
             - Constructs an updated deal body with custom fields.
+            - Skips the request if the body is identical to the last one pushed to this deal's custom fields.
             - Sends a PATCH request to the Pipedrive API to update the deal.
             - If the request succeeds, logs a success message.
             - If the request fails, logs an error message.
@@ -816,42 +1287,29 @@ class Pipedrive:
                 - Uses `BASE_URL_V2` for the API endpoint.
             """
             url = f'{BASE_URL_V2}/deals/{deal_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
-            body = {
-                "custom_fields": {
-                    # POLICY_ON_ATTB: info[0],
-                    RENEWED_OFFER_QUANTITY: info[1],
-                    RENEWAL_POLICY_QUANTITY: info[2],
-                    RENEWED_POLICY_INSURER: info[3],
-                    # STATUS: info[4],
-                    # RENEWAL: info[5],
-                    RENEWAL_START_DATE: info[6],
-                    REGISTRATION_CERTIFICATE_NO: info[7],
-                    INSURER: Pipedrive.find_custom_field_option_id(INSURER, info[10]),
-                    SELLER_OPTION: (
-                        Pipedrive.find_custom_field_option_id(SELLER_OPTION, info[8])
-                        if not isinstance(info[8], int) else info[8]
-                    ),
-                    POLICY_ON_ATB_OPTION: (
-                        Pipedrive.find_custom_field_option_id(POLICY_ON_ATB_OPTION, info[9])
-                        if not isinstance(info[9], int) else info[9]
-                    )
-                }
-            }
+            params = {'api_token': api_token()}
+            body = {"custom_fields": Pipedrive.get_sheet_custom_fields(info)}
 
             if status:
                 body["status"] = status
 
-            response = requests.patch(url=url, params=params, json=body)
+            fingerprint = Pipedrive.changed_body_fingerprint('deal_custom_fields', deal_id, body)
+            if fingerprint is None:
+                print(f'\t{deal_id}: Deal custom fields unchanged, skipped.')
+                return True
+
+            response = http_client.patch(url=url, params=params, json=body, name='Update.deal_custom_fields')
 
             if response.status_code == 200:
                 print(f'\t{deal_id}: Deal updated!')
+                Pipedrive.remember_write('deal_custom_fields', deal_id, fingerprint)
+                return True
             else:
                 print(f"'update_deal_custom_fields': '{deal_id}' Request failed with status code {response.status_code}")
                 print(response.json())
 
         @staticmethod
-        def deal(deal_id, policy_info_arr, entity_id, entype):
+        def deal(deal_id, policy_info_arr, entity_id, entype, sheet_info=None):
             """
             Updates an existing deal in Pipedrive.
 
@@ -860,13 +1318,16 @@ class Pipedrive:
                 policy_info_arr (list): A list containing updated policy details such as title, currency, value, and status.
                 entity_id (int): The ID of the associated entity (e.g., organization or person).
                 entype (str): The type of entity associated with the deal.
-                deal_owner (int): The ID of the deal owner.
+                sheet_info (tuple | None): Spreadsheet fields to write along with the deal. Defaults to `None`.
 
             Returns:
-                None
+                bool | None: `True` if the deal is up to date (updated or unchanged), `False` if it no longer
+                exists in Pipedrive, `None` if the request failed.
 
             .. rubric:: Behavior
             - Constructs an updated deal body using `Pipedrive.get_deal_body()`.
+            - Skips the request if the body is identical to the last one pushed to this deal.
+            - If Pipedrive answers `404`, drops the mirrored ID and returns `False`.
             - Sends a PATCH request to the Pipedrive API to update the deal.
             - If the request succeeds, logs a success message.
             - If the request fails, logs an error message.
@@ -876,13 +1337,23 @@ class Pipedrive:
                 - `deal_owner` is hardcoded None, in order to assign owner only when deal is being created.
             """
             url = f'{BASE_URL_V2}/deals/{deal_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
-            body = Pipedrive.get_deal_body(policy_info_arr, entity_id, entype, None)
+            params = {'api_token': api_token()}
+            body = Pipedrive.get_deal_body(policy_info_arr, entity_id, entype, None, sheet_info)
+
+            fingerprint = Pipedrive.changed_body_fingerprint('deal', deal_id, body)
+            if fingerprint is None:
+                print(f'\t{deal_id}: Deal unchanged, skipped.')
+                return True
 
-            response = requests.patch(url=url, params=params, json=body)
+            response = http_client.patch(url=url, params=params, json=body, name='Update.deal')
 
             if response.status_code == 200:
                 print(f'\t{deal_id}: Deal updated!')
+                Pipedrive.remember_write('deal', deal_id, fingerprint)
+                return True
+            elif response.status_code == 404:
+                Pipedrive.forget_entity('deal', deal_id)
+                return False
             else:
                 print(f"'update_deal': '{deal_id}' Request failed with status code {response.status_code}")
                 print(response.json())
@@ -897,7 +1368,7 @@ class Pipedrive:
                 status (str): The new status to set for the deal.
 
             Returns:
-                None: The function updates the deal status and prints a success message or an error message.
+                bool: `True` if the status was updated, otherwise `False`.
 
             .. rubric:: Behavior
             - Sends a `PATCH` request to the Pipedrive API to update the status of a deal.
@@ -910,17 +1381,19 @@ class Pipedrive:
                 - The body of the request contains the new `status` to be updated.
             """
             url = f'{BASE_URL_V2}/deals/{deal_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = {
                 "status": status
             }
-            response = requests.patch(url=url, params=params, json=body)
+            response = http_client.patch(url=url, params=params, json=body, name='Update.deal_status')
 
             if response.status_code == 200:
                 print(f'\t{deal_id}: Deal status updated!')
+                return True
             else:
                 print(f"'update_deal_status': '{deal_id}' Request failed with status code {response.status_code}")
                 print(response.json())
+                return False
 
         @staticmethod
         def note(note_id, content, deal_id, note_owner):
@@ -934,10 +1407,13 @@ class Pipedrive:
                 note_owner (int): The ID of the user updating the note.
 
             Returns:
-                None
+                bool | None: `True` if the note is up to date (updated or unchanged), `False` if it no longer
+                exists in Pipedrive, `None` if the request failed.
 
             .. rubric:: Behavior
             - Constructs an updated note body using `Pipedrive.get_note_body()`.
+            - Skips the request if the body is identical to the last one pushed to this note.
+            - If Pipedrive answers `404`, drops the note from the note IDs of the deal and returns `False`.
             - Sends a PUT request to the Pipedrive API to update the note.
             - If the request succeeds, logs a success message.
             - If the request fails, logs an error message.
@@ -946,13 +1422,23 @@ class Pipedrive:
                 - Uses `BASE_URL_V1` for the API endpoint.
             """
             url = f'{BASE_URL_V1}/notes/{note_id}'
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             body = Pipedrive.get_note_body(content, deal_id, note_owner)
 
-            response = requests.put(url=url, params=params, json=body)
+            fingerprint = Pipedrive.changed_body_fingerprint('note', note_id, body)
+            if fingerprint is None:
+                print(f'\t{note_id}: Note unchanged, skipped.')
+                return True
+
+            response = http_client.put(url=url, params=params, json=body, name='Update.note')
 
             if response.status_code == 200:
                 print(f'\t{response.json()['data']['id']}: Note updated!')
+                Pipedrive.remember_write('note', note_id, fingerprint)
+                return True
+            elif response.status_code == 404:
+                Pipedrive.forget_deal_note(deal_id, note_id)
+                return False
             else:
                 print(f"'update_note': Request failed with status code {response.status_code}")
                 print(response.json())
@@ -960,7 +1446,7 @@ class Pipedrive:
         @staticmethod
         def field_data(field_id, field_name, options):
             url = f"{BASE_URL_V1}/dealFields/{field_id}"
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
             
             processed_options = []
             
@@ -981,25 +1467,58 @@ class Pipedrive:
                 "add_visible_flag": True
             }
             
-            response = requests.put(url=url, params=params, json=body)
+            response = http_client.put(url=url, params=params, json=body, name='Update.field_data')
             
             if response.status_code == 200:
                 print(f"New option created for '{field_name}'!")
+                return response.json()['data']
             else:
                 print(f"'update_field_data': Request failed with status code {response.status_code}")
                 print(response.json())
-            
-            pass
 
     class Get:
 
+        @staticmethod
+        def deal_fields(limit=MAX_PAGE_SIZE):
+            """
+            Retrieves every deal field definition from Pipedrive.
+
+            Args:
+                limit (int): The number of fields to fetch per request. Defaults to `MAX_PAGE_SIZE`.
+
+            Returns:
+                list[dict]: The raw deal field objects, including their options.
+            """
+            return list(paginate(f'{BASE_URL_V1}/dealFields', limit=limit, name='Get.deal_fields'))
+
+        @staticmethod
+        def deal_field(field_id):
+            """
+            Retrieves the current definition of a single deal field.
+
+            Args:
+                field_id (int): The ID of the deal field.
+
+            Returns:
+                dict | None: The raw deal field object, including its options, or `None` if the request fails.
+            """
+            url = f'{BASE_URL_V1}/dealFields/{field_id}'
+            params = {'api_token': api_token()}
+
+            response = http_client.get(url=url, params=params, name='Get.deal_field')
+
+            if response.status_code == 200:
+                return response.json()['data']
+
+            print(f"'get_deal_field': Request failed with status code {response.status_code}")
+
         @staticmethod
         def details_of_deal(deal_id):
             url = f"{BASE_URL_V1}/deals/{deal_id}"
-            params = {'api_token': PIPEDRIVE_TOKEN}
+            params = {'api_token': api_token()}
 
             try:
-                response = requests.get(url=url, params=params)
+                response = http_client.get(url=url, params=params, name='Get.details_of_deal')
                 response.raise_for_status()
                 data = response.json()
 
@@ -1023,53 +1542,205 @@ class Pipedrive:
             except requests.RequestException as e:
                 print(f"'get_details_of_deal': Request failed with error: {e}")
                 return []
-        
+
         @staticmethod
-        def deal_field_data(field_key, start_pos=1, limit=100, results=None):
-            if results is None:
-                results = []
+        def deal_field_data(field_key):
+            """
+            Collects the ID, name and options of the deal fields whose key is in `field_key`.
 
-            url = f'{BASE_URL_V1}/dealFields'
-            params = {
-                'api_token': PIPEDRIVE_TOKEN,
-                'start': start_pos,
-                'limit': limit
-            }
+            Args:
+                field_key (str | Iterable[str]): The custom field key(s) to look for.
 
-            response = requests.get(url=url, params=params)
+            Returns:
+                list[dict]: `{"field_id": ..., "field_name": ..., "options": [{"id": ..., "label": ...}]}` per matching field.
+            """
+            results = []
+
+            for item in paginate(f'{BASE_URL_V1}/dealFields', name='Get.deal_field_data'):
+                if item["key"] in field_key:
+                    results.append({
+                        "field_id": item.get("id"),
+                        "field_name": item.get("name"),
+                        "options": [{"id": option["id"], "label": option["label"]}
+                                    for option in item.get("options") or []]
+                    })
 
-            if response.status_code == 200:
-                data = response.json()
+            return results
 
-                for item in data["data"]:
-                    if item["key"] in field_key:
-                        field_id = item.get("id")
-                        field_name = item.get("name")
-                        options = []
-                        for option in item.get("options", []):
-                            options.append({
-                                "id": option["id"],
-                                "label": option["label"]
-                            })
-                        results.append({
-                            "field_id": field_id,
-                            "field_name": field_name,
-                            "options": options
-                        })
-
-                pagination = data.get('additional_data', {}).get('pagination', {})
-                if pagination.get('more_items_in_collection'):
-                    next_start = pagination.get('next_start')
-                    time.sleep(0.5)
-                    return Pipedrive.Search.all_deals(
-                        field_key,
-                        start_pos=next_start, 
-                        limit=limit, 
-                        results=results
-                    )
 
-            else:
-                print(f"Request failed with status code {response.status_code}")
+def api_token():
+    """
+    Returns the Pipedrive API token of the current call: the one set in `API_TOKEN`, otherwise `PIPEDRIVE_TOKEN`.
+    """
+    return API_TOKEN.get() or PIPEDRIVE_TOKEN
+
+
+def normalize_option_label(label):
+    """
+    Normalizes a custom field option label for case-insensitive lookups.
+
+    Args:
+        label (any): The option label.
+
+    Returns:
+        str: The label stripped of surrounding whitespace and lower-cased.
+    """
+    return str(label).strip().lower()
+
+
+def classify_deal_notes(notes):
+    """
+    Picks the policy objects note and the payment table note out of a deal's notes.
+
+    Args:
+        notes (list[dict]): The deal's notes, oldest first.
+
+    Returns:
+        tuple[int | None, int | None]: The IDs of the objects note and of the payment table note.
+
+    .. rubric:: Behavior
+    - Tells the notes apart with `note_kind()`.
+    - The oldest match wins if there are several; notes of neither kind (e.g. written by hand) are never picked.
+    """
+    objects_note_id = payment_note_id = None
+
+    for note in notes:
+        kind = note_kind(note.get('content'))
+
+        if kind == 'payment':
+            payment_note_id = payment_note_id or note['id']
+        elif kind == 'objects':
+            objects_note_id = objects_note_id or note['id']
+
+    return objects_note_id, payment_note_id
+
+
+def note_kind(content):
+    """
+    Tells which note written by this script a note body is.
+
+    Args:
+        content (str | None): The HTML content of the note.
+
+    Returns:
+        str | None: `'payment'` for the payment table note (contains `PAYMENT_NOTE_MARKER`), `'objects'` for the
+        policy objects note (contains `OBJECTS_NOTE_MARKER`, or is one of `LEGACY_OBJECTS_NOTES`), otherwise `None`.
+
+    Note:
+        - Matching ignores case, since Pipedrive may normalize the HTML of stored notes.
+    """
+    content = (content or '').lower()
+
+    if PAYMENT_NOTE_MARKER in content:
+        return 'payment'
+
+    if OBJECTS_NOTE_MARKER.lower() in content or any(body.lower() in content for body in LEGACY_OBJECTS_NOTES):
+        return 'objects'
+
+    return None
+
+
+def list_v2(path, custom_fields=(), params=None, name=None, strict=False):
+    """
+    Streams the items of a `v2` list endpoint (`deals`, `persons`, `organizations`, ...) with projected custom fields.
+
+    Args:
+        path (str): The endpoint path relative to `BASE_URL_V2`.
+        custom_fields (Iterable[str]): The custom field keys to return. Defaults to none.
+        params (dict | None): Further query parameters. Defaults to `None`.
+        name (str | None): The call site recorded in `metrics`. Defaults to the URL path.
+        strict (bool): Raises instead of stopping quietly when a page cannot be fetched (see `paginate()`).
+            Defaults to `False`.
+
+    Yields:
+        dict: The items as returned by Pipedrive, with only the requested keys in `custom_fields`.
+
+    Raises:
+        ValueError: If more than `MAX_CUSTOM_FIELDS` custom fields are requested.
+        requests.HTTPError: If `strict` is set and a page request failed.
+
+    Note:
+        - Without `custom_fields`, Pipedrive returns every custom field of every item,
+          which makes the payload many times larger than needed.
+    """
+    custom_fields = tuple(custom_fields)
+    if len(custom_fields) > MAX_CUSTOM_FIELDS:
+        raise ValueError(f'At most {MAX_CUSTOM_FIELDS} custom fields can be requested at once!')
+
+    params = dict(params or {})
+    if custom_fields:
+        params['custom_fields'] = ','.join(custom_fields)
+
+    yield from paginate(f'{BASE_URL_V2}/{path}', params=params, name=name, strict=strict)
+
+
+def paginate(url, params=None, limit=MAX_PAGE_SIZE, prefetch=True, name=None, strict=False):
+    """
+    Streams every item of a paginated Pipedrive list endpoint.
+
+    Args:
+        url (str): The list endpoint URL (`BASE_URL_V1` or `BASE_URL_V2`).
+        params (dict | None): Extra query parameters. Defaults to `None`.
+        limit (int): The page size. Defaults to `MAX_PAGE_SIZE` (the maximum allowed by Pipedrive).
+        prefetch (bool): Fetches the next page in a background thread while the current one is consumed. Defaults to `True`.
+        name (str | None): The call site recorded in `metrics`. Defaults to the URL path.
+        strict (bool): Raises `requests.HTTPError` when a page request fails, so callers can tell a partial
+            listing from a complete one. Defaults to `False`.
+
+    Yields:
+        dict: The items of every page, in order.
+
+    .. rubric:: Behavior
+    - Follows `start`/`limit` pagination (`additional_data.pagination.next_start`) on `v1` endpoints
+      and `cursor` pagination (`additional_data.next_cursor`) on `v2` endpoints.
+    - Keeps at most the current and the next page in memory, so large filters are streamed in constant memory.
+    - If a request fails, logs an error message and stops (or raises, with `strict`).
+    """
+    cursor_based = url.startswith(BASE_URL_V2)
+    page_params = {**(params or {}), 'api_token': api_token(), 'limit': limit}
+    if not cursor_based:
+        page_params['start'] = 0
+
+    def fetch(page_params):
+        return http_client.get(url=url, params=page_params, name=name)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        pending = executor.submit(fetch, page_params) if executor else None
+        response = None if executor else fetch(page_params)
+
+        while True:
+            if pending is not None:
+                response = pending.result()
+
+            if response.status_code != 200:
+                print(f"'paginate': '{url}' Request failed with status code {response.status_code}")
                 print(response.json())
 
-            return results
\ No newline at end of file
+                if strict:
+                    raise requests.HTTPError(f"'{url}' returned status code {response.status_code}", response=response)
+                return
+
+            data = response.json()
+            additional_data = data.get('additional_data') or {}
+
+            if cursor_based:
+                next_cursor = additional_data.get('next_cursor')
+                page_params = {**page_params, 'cursor': next_cursor} if next_cursor else None
+            else:
+                pagination = additional_data.get('pagination') or {}
+                next_start = pagination.get('next_start') if pagination.get('more_items_in_collection') else None
+                page_params = {**page_params, 'start': next_start} if next_start is not None else None
+
+            if page_params is not None and executor:
+                pending = executor.submit(fetch, page_params)
+
+            yield from data.get('data') or []
+
+            if page_params is None:
+                return
+            if not executor:
+                response = fetch(page_params)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import inspect
+import os
+import threading
+import weakref
+from dotenv import load_dotenv
+
+import pipedrive
+from pipedrive import Pipedrive, API_TOKEN
+
+load_dotenv()
+
+# Maximum number of Pipedrive calls in flight per client and event loop
+PIPEDRIVE_CONCURRENCY = int(os.getenv('PIPEDRIVE_CONCURRENCY', 4))
+
+# Token of the first client; the module-level state of `pipedrive` belongs to its account (see `AsyncPipedrive`)
+ACCOUNT_TOKEN = None
+ACCOUNT_LOCK = threading.Lock()
+
+_DONE = object()
+
+
+class AsyncPipedrive:
+    """
+    Asynchronous Pipedrive client with the same `Search`, `Add`, `Update` and `Get` methods as `Pipedrive`.
+
+    Args:
+        token (str): The Pipedrive API token used by this client.
+        concurrency (int): The maximum number of calls in flight per event loop. Defaults to `PIPEDRIVE_CONCURRENCY`.
+
+    Raises:
+        ValueError: If `token` is empty, or differs from the token of the blocking `Pipedrive` client
+            or of an earlier `AsyncPipedrive`.
+
+    .. rubric:: Behavior
+    - Every method is a coroutine function taking the same arguments as its `Pipedrive` counterpart,
+      e.g. `await client.Search.deal(policy_oid)`; generator methods (`Search.iter_deals()`, ...) become async generators.
+    - Runs the blocking implementation in a worker thread with `API_TOKEN` set to `token`.
+    - Shares the pooled sessions, rate limiter and `429` handling of `http_client` with the blocking client.
+
+    Note:
+        - Other `Pipedrive` attributes (`seed_entity_map()`, `prefetch_deal_notes()`, ...) are available as coroutines too.
+        - Supports a single Pipedrive account per process: the field option index (`FIELD_OPTION_INDEX`),
+          the sync state (`SYNC_STATE`) and the note cache (`DEAL_NOTES`) are module-level state of `pipedrive`,
+          shared by every client. Any number of clients can be created, but they must all use the same token.
+    """
+    def __init__(self, token, concurrency=PIPEDRIVE_CONCURRENCY):
+        global ACCOUNT_TOKEN
+
+        if not token:
+            raise ValueError('API token is required!')
+
+        with ACCOUNT_LOCK:
+            account_token = pipedrive.PIPEDRIVE_TOKEN or ACCOUNT_TOKEN
+
+            if account_token is not None and token != account_token:
+                raise ValueError('All Pipedrive clients of a process must use the same API token, '
+                                 'they share the field option index, sync state and note cache.')
+
+            ACCOUNT_TOKEN = token
+
+        self.token = token
+        self.concurrency = max(concurrency, 1)
+        self.semaphores = weakref.WeakKeyDictionary()
+
+        self.Search = AsyncNamespace(self, Pipedrive.Search)
+        self.Add = AsyncNamespace(self, Pipedrive.Add)
+        self.Update = AsyncNamespace(self, Pipedrive.Update)
+        self.Get = AsyncNamespace(self, Pipedrive.Get)
+        self._root = AsyncNamespace(self, Pipedrive)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return getattr(self._root, name)
+
+    def context(self):
+        """
+        Returns a copy of the current context with `API_TOKEN` set to this client's token.
+        """
+        context = contextvars.copy_context()
+        context.run(API_TOKEN.set, self.token)
+        return context
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        return self.semaphores[loop]
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Runs a blocking function with this client's token in a worker thread, within the concurrency limit.
+
+        Args:
+            func (Callable): Any function that calls Pipedrive through `pipedrive` (e.g. `process_table_policies`).
+            *args, **kwargs: Passed on to `func`.
+
+        Returns:
+            Any: The return value of `func`.
+        """
+        async with self.semaphore():
+            return await asyncio.to_thread(self.context().run, func, *args, **kwargs)
+
+    async def stream(self, func, *args, **kwargs):
+        """
+        Iterates over a blocking generator function with this client's token, one item per worker thread call.
+        """
+        context = self.context()
+        generator = context.run(func, *args, **kwargs)
+
+        try:
+            while True:
+                async with self.semaphore():
+                    item = await asyncio.to_thread(context.run, next, generator, _DONE)
+
+                if item is _DONE:
+                    return
+
+                yield item
+        finally:
+            await asyncio.to_thread(context.run, generator.close)
+
+
+class AsyncNamespace:
+    """
+    Exposes the static methods of a `Pipedrive` class (or nested class) as coroutine functions of an `AsyncPipedrive`.
+    """
+    def __init__(self, client, namespace):
+        self.client = client
+        self.namespace = namespace
+
+    def __getattr__(self, name):
+        func = getattr(self.namespace, name)
+
+        if not callable(func) or inspect.isclass(func):
+            raise AttributeError(f"'{self.namespace.__name__}.{name}' is not a method")
+
+        if inspect.isgeneratorfunction(func):
+            def method(*args, **kwargs):
+                return self.client.stream(func, *args, **kwargs)
+        else:
+            async def method(*args, **kwargs):
+                return await self.client.call(func, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = func.__doc__
+        return method
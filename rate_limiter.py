@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker that needs to respect the same limit.
+
+    Args:
+        rate (float): The number of tokens added per second.
+        capacity (float): The maximum number of tokens the bucket can hold (burst size). Defaults to 1.
+
+    .. rubric:: Behavior
+    - Starts full, so the first `capacity` acquisitions pass without waiting.
+    - Refills continuously at `rate` tokens per second up to `capacity`.
+    - `acquire()` blocks the calling thread only for as long as it takes to refill the missing tokens.
+    """
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError('Rate must be positive!')
+
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Takes `tokens` from the bucket, waiting until enough of them are available.
+
+        Args:
+            tokens (float): The number of tokens to take. Defaults to 1.
+
+        Returns:
+            float: The number of seconds the caller spent waiting.
+        """
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """
+        Empties the bucket so that no token is handed out for the next `seconds` seconds.
+
+        Args:
+            seconds (float): How long every caller of this bucket has to wait.
+
+        Note:
+            - Used when the server asks to back off (`429` with `Retry-After`, or an exhausted quota).
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def observe(self, response):
+        """
+        Adjusts the bucket to the rate limit headers returned by the server.
+
+        Args:
+            response (requests.Response): The response of a request made with a token from this bucket.
+
+        Returns:
+            float | None: The number of seconds the server asked to wait, or `None` if it did not.
+
+        .. rubric:: Behavior
+        - On `429`, pauses for `Retry-After` seconds (or `x-ratelimit-reset` if that is missing).
+        - If Pipedrive reports `x-ratelimit-remaining: 0`, pauses until `x-ratelimit-reset`.
+        """
+        headers = response.headers
+        delay = None
+
+        if response.status_code == 429:
+            delay = header_seconds(headers, 'Retry-After') or header_seconds(headers, 'x-ratelimit-reset')
+
+        elif header_seconds(headers, 'x-ratelimit-remaining') == 0:
+            delay = header_seconds(headers, 'x-ratelimit-reset')
+
+        if delay:
+            self.pause(delay)
+
+        return delay
+
+
+def header_seconds(headers, name):
+    """
+    Reads a numeric rate limit header.
+
+    Args:
+        headers (Mapping): The response headers.
+        name (str): The header name.
+
+    Returns:
+        float | None: The header value as a number, or `None` if it is missing or not numeric.
+    """
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# Base URLs of the APIs we talk to. Override them to run the sync against stand-in servers (see `benchmarks/`).
+INSLY_BASE_URL = os.getenv('INSLY_BASE_URL', 'https://vingo-api.insly.com/api').rstrip('/')
+PIPEDRIVE_BASE_URL = os.getenv('PIPEDRIVE_BASE_URL', 'https://api.pipedrive.com').rstrip('/')
+INSLY_HOST = urlparse(INSLY_BASE_URL).netloc
+PIPEDRIVE_HOST = urlparse(PIPEDRIVE_BASE_URL).netloc
+
+# Requests per second and burst size for every host (or host + path prefix) we talk to.
+# Pipedrive allows a burst budget per 2-second window depending on the plan (20 on the lowest one);
+# search endpoints have a lower limit of their own. Insly does not publish its limits.
+RATE_LIMITS = {
+    PIPEDRIVE_HOST: (float(os.getenv('PIPEDRIVE_RATE_LIMIT', 10)), int(os.getenv('PIPEDRIVE_BURST', 20))),
+    f'{PIPEDRIVE_HOST}/search': (float(os.getenv('PIPEDRIVE_SEARCH_RATE_LIMIT', 5)),
+                                 int(os.getenv('PIPEDRIVE_SEARCH_BURST', 10))),
+    INSLY_HOST: (float(os.getenv('INSLY_RATE_LIMIT', 5)), int(os.getenv('INSLY_BURST', 5))),
+}
+DEFAULT_RATE_LIMIT = (5, 5)
+
+BUCKETS = {}
+BUCKETS_LOCK = threading.Lock()
+
+
+def buckets_for(url):
+    """
+    Returns the shared `TokenBucket` objects that limit requests to `url`.
+
+    Args:
+        url (str): The request URL.
+
+    Returns:
+        tuple[TokenBucket, ...]: The bucket of the host (and port), preceded by the search bucket for Pipedrive
+        search endpoints.
+    """
+    parsed = urlparse(url)
+    keys = [parsed.netloc]
+
+    if keys[0] == PIPEDRIVE_HOST and parsed.path.endswith('/search'):
+        keys.insert(0, f'{keys[0]}/search')
+
+    with BUCKETS_LOCK:
+        for key in keys:
+            if key not in BUCKETS:
+                rate, burst = RATE_LIMITS.get(key, DEFAULT_RATE_LIMIT)
+                BUCKETS[key] = TokenBucket(rate=rate, capacity=burst)
+        return tuple(BUCKETS[key] for key in keys)
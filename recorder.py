@@ -0,0 +1,278 @@
+import atexit
+import gzip
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+from requests.structures import CaseInsensitiveDict
+
+load_dotenv()
+
+# Archive every HTTP exchange and spreadsheet read of the process is written to (disabled if empty)
+RECORD_PATH = os.getenv('HTTP_RECORD_PATH')
+# Archive the HTTP exchanges and spreadsheet reads are served from instead of the network (disabled if empty)
+REPLAY_PATH = os.getenv('HTTP_REPLAY_PATH')
+# `original` replays every response after its recorded latency, `zero` returns it immediately
+REPLAY_LATENCY = os.getenv('HTTP_REPLAY_LATENCY', 'original')
+
+if RECORD_PATH and REPLAY_PATH:
+    raise ValueError('HTTP_RECORD_PATH and HTTP_REPLAY_PATH cannot be set at the same time.')
+
+# Query parameters whose values are replaced by `REDACTED` in the archive
+SECRET_PARAMS = frozenset({'api_token', 'access_token', 'token'})
+REDACTED = 'REDACTED'
+# Response headers kept in the archive; `rate_limiter` reads the rate limit ones
+RESPONSE_HEADERS = ('Content-Type', 'Retry-After', 'x-ratelimit-limit', 'x-ratelimit-remaining', 'x-ratelimit-reset')
+
+ARCHIVE = None
+ARCHIVE_LOCK = threading.Lock()
+# Set by `close()`; later exchanges are not recorded, so a closed archive is never reopened and truncated
+CLOSED = False
+# Recorded HTTP responses, keyed by (method, url, body) and by (method, url)
+EXCHANGES = None
+EXCHANGES_BY_URL = None
+# Recorded spreadsheet reads, keyed by `sheets_key()`
+FRAMES = None
+REPLAY_STATS = {'served': 0, 'fallbacks': 0, 'misses': 0}
+
+
+def redact_url(url):
+    """
+    Returns `url` with the values of `SECRET_PARAMS` replaced by `REDACTED` and its query parameters sorted,
+    so the same request always maps to the same archive key.
+    """
+    parts = urlsplit(url)
+    query = sorted((key, REDACTED if key in SECRET_PARAMS else value)
+                   for key, value in parse_qsl(parts.query, keep_blank_values=True))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _text(body):
+    if body is None:
+        return None
+
+    return body.decode('utf-8', errors='replace') if isinstance(body, bytes) else body
+
+
+def _write(entry):
+    global ARCHIVE
+
+    line = json.dumps(entry, ensure_ascii=False)
+
+    with ARCHIVE_LOCK:
+        if CLOSED:
+            return
+
+        if ARCHIVE is None:
+            ARCHIVE = gzip.open(RECORD_PATH, 'wt', encoding='utf-8')
+            atexit.register(close)
+
+        ARCHIVE.write(line + '\n')
+
+
+def close():
+    """
+    Flushes and closes the archive being recorded, if any. Called at the end of a recorded run
+    and automatically when the process exits.
+
+    Note:
+        - Exchanges made after this call (e.g. by workers still finishing) are not recorded.
+    """
+    global ARCHIVE, CLOSED
+
+    with ARCHIVE_LOCK:
+        CLOSED = True
+
+        if ARCHIVE is not None:
+            ARCHIVE.close()
+            ARCHIVE = None
+
+
+def close_on_signal(signals=(signal.SIGTERM,)):
+    """
+    Makes `signals` close the archive before they terminate the process, which `atexit` does not cover.
+    Must be called from the main thread.
+
+    .. rubric:: Behavior
+    - The handler restores the default action and closes the archive in a separate thread, once the record
+      being written (possibly by the interrupted main thread) is complete, then sends the signal again.
+    """
+    def terminate(signum, frame):
+        signal.signal(signum, signal.SIG_DFL)
+
+        def close_and_terminate():
+            close()
+            os.kill(os.getpid(), signum)
+
+        try:
+            threading.Thread(target=close_and_terminate, name='recorder-close').start()
+        except RuntimeError:
+            # No new threads at interpreter shutdown, when no other thread is left to write
+            close_and_terminate()
+
+    for signum in signals:
+        signal.signal(signum, terminate)
+
+
+def record_exchange(request, response, elapsed):
+    """
+    Appends one HTTP exchange to the archive in `RECORD_PATH`.
+
+    Args:
+        request (requests.PreparedRequest): The request that was sent.
+        response (requests.Response): Its response; the body is read here.
+        elapsed (float): Seconds between sending the request and reading the whole response.
+
+    .. rubric:: Behavior
+    - Stores the method, the redacted URL (see `redact_url()`) and the body of the request. Request headers,
+      which carry the Insly bearer token, are not stored.
+    - Stores the status, reason, the `RESPONSE_HEADERS` and the body of the response, and `elapsed`.
+    """
+    _write({
+        'type': 'http',
+        'method': request.method,
+        'url': redact_url(request.url),
+        'body': _text(request.body),
+        'status': response.status_code,
+        'reason': response.reason,
+        'headers': {name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers},
+        'content': _text(response.content),
+        'elapsed': round(elapsed, 4),
+    })
+
+
+def sheets_key(sheets):
+    return json.dumps(sheets, sort_keys=True, default=list)
+
+
+def record_frames(sheets, frames):
+    """
+    Appends the result of one `read_data_from_worksheets()` call to the archive in `RECORD_PATH`.
+
+    Args:
+        sheets (list[dict]): The argument of the call.
+        frames (list[pandas.DataFrame]): The DataFrames it returned.
+    """
+    _write({
+        'type': 'sheets',
+        'key': sheets_key(sheets),
+        'frames': [{'columns': list(frame.columns), 'data': frame.values.tolist()} for frame in frames],
+    })
+
+
+def load(path=None):
+    """
+    Reads the archive in `path` (defaults to `REPLAY_PATH`) into memory. Called on the first replayed request.
+
+    .. rubric:: Behavior
+    - Queues the HTTP responses in recording order, both per (method, url, body) and per (method, url).
+    - Keeps the spreadsheet reads per `sheets_key()`.
+    """
+    global EXCHANGES, EXCHANGES_BY_URL, FRAMES
+
+    exchanges, exchanges_by_url, frames = {}, {}, {}
+
+    with gzip.open(path or REPLAY_PATH, 'rt', encoding='utf-8') as file:
+        for line in file:
+            entry = json.loads(line)
+
+            if entry['type'] == 'http':
+                exchanges.setdefault((entry['method'], entry['url'], entry['body']), deque()).append(entry)
+                exchanges_by_url.setdefault((entry['method'], entry['url']), deque()).append(entry)
+            elif entry['type'] == 'sheets':
+                frames[entry['key']] = entry['frames']
+
+    EXCHANGES, EXCHANGES_BY_URL, FRAMES = exchanges, exchanges_by_url, frames
+
+
+def _next(queue):
+    # Both indexes hold the same entries, so skip those already served through the other one
+    while queue:
+        entry = queue.popleft()
+
+        if not entry.get('served'):
+            entry['served'] = True
+            return entry
+
+    return None
+
+
+def replay_exchange(request):
+    """
+    Serves one HTTP request from the archive in `REPLAY_PATH`.
+
+    Args:
+        request (requests.PreparedRequest): The request to answer.
+
+    Returns:
+        requests.Response: The recorded response.
+
+    Raises:
+        requests.exceptions.ConnectionError: If the archive has no response left for the request,
+            as if the network were down.
+
+    .. rubric:: Behavior
+    - Serves the recorded responses of the same method, redacted URL and body in recording order.
+      If the body differs from every recording (e.g. it contains today's date), falls back to the recordings
+      of the same method and URL. Every recorded response is served at most once; a request made more often
+      than it was recorded is a miss.
+    - Waits for the recorded latency first when `REPLAY_LATENCY` is `original`.
+    - Counts served requests, fallbacks and misses in `REPLAY_STATS`.
+    """
+    method, url, body = request.method, redact_url(request.url), _text(request.body)
+
+    with ARCHIVE_LOCK:
+        if EXCHANGES is None:
+            load()
+
+        if (method, url, body) in EXCHANGES:
+            entry = _next(EXCHANGES[(method, url, body)])
+        else:
+            entry = _next(EXCHANGES_BY_URL.get((method, url), deque()))
+
+            if entry is not None:
+                REPLAY_STATS['fallbacks'] += 1
+
+        if entry is None:
+            REPLAY_STATS['misses'] += 1
+            raise requests.exceptions.ConnectionError(f"No recorded response left for {method} '{url}'.",
+                                                      request=request)
+
+        REPLAY_STATS['served'] += 1
+
+    if REPLAY_LATENCY == 'original':
+        time.sleep(entry['elapsed'])
+
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.reason = entry['reason']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = (entry['content'] or '').encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def replay_frames(sheets):
+    """
+    Returns the DataFrames recorded for a `read_data_from_worksheets(sheets)` call.
+
+    Raises:
+        LookupError: If the archive has no read of the same worksheets and columns.
+    """
+    with ARCHIVE_LOCK:
+        if FRAMES is None:
+            load()
+
+    if sheets_key(sheets) not in FRAMES:
+        raise LookupError(f"No recorded spreadsheet read for {sheets_key(sheets)}.")
+
+    return [pd.DataFrame(frame['data'], columns=frame['columns']) for frame in FRAMES[sheets_key(sheets)]]
@@ -1,8 +1,13 @@
 import os
 import gspread
+import metrics
+import recorder
 import pandas as pd
+from gspread.utils import absolute_range_name, rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 
+SPREADSHEET = None
+
 
 def authenticate():
     """
@@ -23,44 +28,175 @@ def authenticate():
     """
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     creds = ServiceAccountCredentials.from_json_keyfile_name(os.getenv('KEYFILE_PATH'), scope)
-    client = gspread.authorize(creds)
+    with metrics.timed('sheets', 'authorize'):
+        client = gspread.authorize(creds)
     return client
 
 
-def read_data_from_worksheet(start_row=1, custom_column=1, sheet_number=1):
+def open_spreadsheet():
     """
-    Authenticates with Google Sheets, retrieves data from the first worksheet of a specified spreadsheet,
-    and returns it as a pandas DataFrame.
+    Returns the spreadsheet handle shared by every read in this process.
 
     .. rubric:: Behavior
-    - Calls the `authenticate()` function to get an authenticated gspread client.
-    - Opens the Google Spreadsheet specified by the environment variable `SPREADSHEET_NAME`.
-    - Retrieves all values from the first worksheet of the spreadsheet.
-    - Skips the first three rows and uses the fourth row as the column headers.
-    - Converts the resulting list of lists into a pandas DataFrame.
+    - On first use, authenticates with `authenticate()` and opens the spreadsheet named by `SPREADSHEET_NAME`.
+    - Later calls reuse the same client and handle, so OAuth and spreadsheet metadata are fetched only once per run
+      (see `reset_spreadsheet()`).
 
-    Notes:
-        - The environment variable `SPREADSHEET_NAME` must be set with the name of the spreadsheet to be accessed.
-        - The data starting from the fourth row (index 3) is used, with the column headers taken from the same row.
-        - This function assumes that the first three rows are not part of the data and should be skipped.
+    Returns:
+        gspread.spreadsheet.Spreadsheet: The opened spreadsheet.
+    """
+    global SPREADSHEET
+
+    if SPREADSHEET is None:
+        client = authenticate()
+
+        with metrics.timed('sheets', 'open'):
+            SPREADSHEET = client.open(os.getenv('SPREADSHEET_NAME'))
+
+    return SPREADSHEET
+
+
+def reset_spreadsheet():
+    """
+    Drops the spreadsheet handle of `open_spreadsheet()`, so the next read authenticates and opens it again.
+    Called at the start of every run.
+    """
+    global SPREADSHEET
+    SPREADSHEET = None
+
+
+def read_data_from_worksheet(start_row=1, custom_column=1, sheet_number=1, columns=None):
+    """
+    Retrieves data from a single worksheet of the spreadsheet and returns it as a pandas DataFrame.
+
+    Note:
+        - A thin wrapper around `read_data_from_worksheets()`; prefer that function when reading several worksheets.
 
     Returns:
         pandas.DataFrame: A DataFrame containing the data from the worksheet, with the appropriate column headers.
     """
-    client = authenticate()
-    spreadsheet = client.open(os.getenv('SPREADSHEET_NAME'))
-    worksheet = spreadsheet.get_worksheet(sheet_number-1)
+    return read_data_from_worksheets([{
+        'start_row': start_row,
+        'custom_column': custom_column,
+        'sheet_number': sheet_number,
+        'columns': columns
+    }])[0]
+
+
+def read_data_from_worksheets(sheets):
+    """
+    Retrieves data from several worksheets of the spreadsheet with batched range requests
+    and returns one pandas DataFrame per worksheet.
+
+    Args:
+        sheets (list[dict]): One entry per worksheet, with the keys:
+            - `sheet_number` (int): 1-based position of the worksheet.
+            - `start_row` (int): 1-based row where the data starts. Defaults to 1.
+            - `custom_column` (int): 1-based row holding the column headers. Defaults to 1.
+            - `columns` (Iterable[str] | None): Header names to fetch. Fetches every column when `None`.
+
+    .. rubric:: Behavior
+    - Opens the spreadsheet once through `open_spreadsheet()`.
+    - If any entry has `columns`, fetches the header rows of those worksheets in one `values_batch_get`
+      call and resolves the requested headers to column letters.
+    - Fetches all worksheets (or only their requested columns) in a single `values_batch_get` call.
+    - Pads rows to a rectangular grid, like `get_all_values()` does.
+    - Uses the row `custom_column` as headers and the rows from `start_row` onwards as data.
+    - Records every Sheets request in `metrics` (service `sheets`).
+    - Writes the DataFrames to the `recorder` archive when `HTTP_RECORD_PATH` is set, and returns the recorded
+      ones without contacting Google when `HTTP_REPLAY_PATH` is set.
 
-    data = worksheet.get_all_values()
+    Notes:
+        - The environment variable `SPREADSHEET_NAME` must be set with the name of the spreadsheet to be accessed.
+        - Requested headers that are missing from a worksheet are reported and left out of its DataFrame.
 
-    # Convert the list of lists into a pandas DataFrame and skip unnecessary rows
-    df = pd.DataFrame(data[start_row-1:], columns=data[custom_column-1])
+    Returns:
+        list[pandas.DataFrame]: The DataFrames, in the same order as `sheets`.
 
-    return df
+    Raises:
+        ValueError: If a worksheet has no header row, or none of its requested headers was found.
+    """
+    if recorder.REPLAY_PATH:
+        return recorder.replay_frames(sheets)
+
+    spreadsheet = open_spreadsheet()
+    with metrics.timed('sheets', 'worksheets'):
+        worksheets = spreadsheet.worksheets()
+    titles = [worksheets[sheet['sheet_number'] - 1].title for sheet in sheets]
+
+    projected = [i for i, sheet in enumerate(sheets) if sheet.get('columns')]
+    column_indexes = {}
+
+    if projected:
+        header_ranges = [absolute_range_name(titles[i], f"{sheets[i].get('custom_column', 1)}:"
+                                                        f"{sheets[i].get('custom_column', 1)}")
+                         for i in projected]
+        with metrics.timed('sheets', 'values_batch_get_headers'):
+            header_rows = spreadsheet.values_batch_get(header_ranges)['valueRanges']
+
+        for i, header_range in zip(projected, header_rows):
+            header = (header_range.get('values') or [[]])[0]
+            column_indexes[i] = []
+
+            for column in sheets[i]['columns']:
+                if column in header:
+                    column_indexes[i].append(header.index(column) + 1)
+                else:
+                    print(f"'read_data_from_worksheets': Column '{column}' not found in '{titles[i]}'")
+
+    ranges = []
+    for i, title in enumerate(titles):
+        if i in column_indexes:
+            for index in column_indexes[i]:
+                letter = rowcol_to_a1(1, index)[:-1]
+                ranges.append(absolute_range_name(title, f"{letter}:{letter}"))
+        else:
+            ranges.append(absolute_range_name(title))
+
+    with metrics.timed('sheets', 'values_batch_get'):
+        value_ranges = iter(spreadsheet.values_batch_get(ranges)['valueRanges'])
+
+    frames = []
+    for i, sheet in enumerate(sheets):
+        if i in column_indexes:
+            cells = [[row[0] if row else '' for row in next(value_ranges).get('values', [])]
+                     for _ in column_indexes[i]]
+            height = max((len(column) for column in cells), default=0)
+            data = [list(row) for row in zip(*(column + [''] * (height - len(column)) for column in cells))]
+        else:
+            data = next(value_ranges).get('values', [])
+            width = max((len(row) for row in data), default=0)
+            data = [row + [''] * (width - len(row)) for row in data]
+
+        start_row = sheet.get('start_row', 1)
+        custom_column = sheet.get('custom_column', 1)
+
+        if len(data) < custom_column:
+            if i in column_indexes:
+                raise ValueError(f"'read_data_from_worksheets': None of the columns {list(sheet['columns'])} "
+                                 f"found in row {custom_column} of '{titles[i]}'")
+            raise ValueError(f"'read_data_from_worksheets': '{titles[i]}' has no header row {custom_column}")
+
+        # Convert the list of lists into a pandas DataFrame and skip unnecessary rows
+        frames.append(pd.DataFrame(data[start_row - 1:], columns=data[custom_column - 1]))
+
+    if recorder.RECORD_PATH:
+        recorder.record_frames(sheets, frames)
+
+    return frames
 
 
 def process_table_policies(pd, p_no, i, ds, deal_id):
-    import time
+    """
+    Copies the spreadsheet data of a policy into the custom fields of its deal.
+
+    Args:
+        pd (Pipedrive): An instance of the Pipedrive API client.
+        p_no (str): The policy number.
+        i (int): The index of the policy, used in log messages.
+        ds (SheetIndex): The indexed spreadsheet data.
+        deal_id (int): The ID of the deal.
+    """
     from helper import fetch_non_api_data
 
     results = pd.Get.details_of_deal(deal_id)
@@ -72,7 +208,5 @@ def process_table_policies(pd, p_no, i, ds, deal_id):
     for idx, (deal_id, title, client_name, status) in enumerate(results, start=1):
         print(f"#{i + 1}.{idx} P_NO: {p_no} => Processing deal ID {deal_id}")
 
-        info = fetch_non_api_data(p_no, ds[0], ds[1], ds[2], client_name)
+        info = fetch_non_api_data(p_no, ds, client_name)
         pd.Update.deal_custom_fields(deal_id, info, status)
-
-        time.sleep(0.2)
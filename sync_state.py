@@ -0,0 +1,544 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SYNC_STATE_PATH = os.getenv('SYNC_STATE_PATH', 'sync_state.sqlite3')
+
+# Work queue retries: attempts per customer and the backoff before the n-th retry (`QUEUE_RETRY_DELAY * 2 ** (n - 1)`)
+QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', 5))
+QUEUE_RETRY_DELAY = float(os.getenv('QUEUE_RETRY_DELAY', 30))
+QUEUE_MAX_RETRY_DELAY = float(os.getenv('QUEUE_MAX_RETRY_DELAY', 15 * 60))
+
+# Kinds of writes recorded for every kind of mirrored entity
+WRITE_TYPES = {
+    'organization': ('organization',),
+    'person': ('person',),
+    'deal': ('deal', 'deal_custom_fields'),
+}
+
+
+class SyncState:
+    """
+    Local SQLite store that remembers what was already synchronized to Pipedrive.
+
+    Args:
+        path (str): The path of the SQLite database. Defaults to `SYNC_STATE_PATH`.
+        full (bool): Treats every customer and every write as changed when `True`, while still recording new checkpoints.
+
+    .. rubric:: Behavior
+    - Keeps one row per Insly customer OID with the fingerprint of its Insly payload and the time of the last successful sync.
+    - `stage()` remembers the fingerprint of a payload that is being processed; `commit()` stores it
+      only after the customer was pushed to Pipedrive, so a failed customer is retried on the next run.
+    - Keeps the fingerprint of the last body written to every Pipedrive entity, so identical writes can be skipped.
+    - Mirrors Insly OID → Pipedrive ID mappings (organizations, persons, deals), so they need no search request,
+      and the IDs of the objects note and payment table note of every deal, so they need no notes lookup.
+    - Indexes the policy end dates of every customer with the next date one of its policies enters the sync window,
+      so customers can be left out of a run without an Insly request.
+    - Holds the work queue of customer OIDs for the current run, so an interrupted run resumes where it stopped
+      and failed customers are retried later instead of blocking a worker.
+    - Safe to share between worker threads.
+    """
+    def __init__(self, path=SYNC_STATE_PATH, full=False):
+        self.path = path
+        self.full = full
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS customers (
+                oid INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                synced_at TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS writes (
+                entity_type TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                pushed_at TEXT NOT NULL,
+                PRIMARY KEY (entity_type, entity_id)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entities (
+                kind TEXT NOT NULL,
+                insly_oid TEXT NOT NULL,
+                pipedrive_id INTEGER NOT NULL,
+                PRIMARY KEY (kind, insly_oid)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deal_notes (
+                deal_id INTEGER PRIMARY KEY,
+                objects_note_id INTEGER,
+                payment_note_id INTEGER
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue (
+                oid INTEGER PRIMARY KEY,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_retry_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS policy_index (
+                oid INTEGER PRIMARY KEY,
+                end_dates TEXT NOT NULL,
+                next_relevant TEXT,
+                indexed_at TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def is_unchanged(self, oid, fingerprint, entities=()):
+        """
+        Checks whether a customer's payload is identical to the one of its last successful sync.
+
+        Args:
+            oid (int): The Insly customer OID.
+            fingerprint (str): The fingerprint of the current payload.
+            entities (Iterable[tuple[str, int | str]]): The (kind, Insly OID) pairs the customer is pushed to,
+                e.g. its person and the deals of its policies. Defaults to none.
+
+        Returns:
+            bool: `True` if the customer can be skipped, always `False` in full mode.
+
+        Note:
+            - A customer is not skipped while one of its `entities` is not mirrored, e.g. because it was forgotten
+              after being deleted in Pipedrive (see `forget_entity()` and `replace_entities()`), so it is created again.
+        """
+        if self.full:
+            return False
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM customers WHERE oid = ?", (oid,)
+            ).fetchone()
+
+            if row is None or row[0] != fingerprint:
+                return False
+
+            return all(self.connection.execute(
+                "SELECT 1 FROM entities WHERE kind = ? AND insly_oid = ?", (kind, str(insly_oid))
+            ).fetchone() for kind, insly_oid in entities)
+
+    def stage(self, oid, fingerprint):
+        """
+        Remembers the fingerprint of the payload currently being processed for `oid`.
+        """
+        with self.lock:
+            self.pending[oid] = fingerprint
+
+    def commit(self, oid):
+        """
+        Stores the staged fingerprint of `oid` as its last successful sync. Does nothing if nothing was staged.
+        """
+        with self.lock:
+            fingerprint = self.pending.pop(oid, None)
+
+            if fingerprint is None:
+                return
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO customers (oid, fingerprint, synced_at) VALUES (?, ?, ?)",
+                (oid, fingerprint, datetime.now().isoformat(timespec='seconds'))
+            )
+            self.connection.commit()
+
+    def is_written(self, entity_type, entity_id, fingerprint):
+        """
+        Checks whether `fingerprint` matches the last body pushed to a Pipedrive entity.
+
+        Args:
+            entity_type (str): The kind of write, e.g. `'organization'`, `'deal'` or `'note'`.
+            entity_id (int): The Pipedrive ID of the entity.
+            fingerprint (str): The fingerprint of the body about to be written.
+
+        Returns:
+            bool: `True` if the write can be skipped, always `False` in full mode.
+        """
+        if self.full:
+            return False
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM writes WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id)
+            ).fetchone()
+
+        return row is not None and row[0] == fingerprint
+
+    def record_write(self, entity_type, entity_id, fingerprint):
+        """
+        Stores the fingerprint of a body that Pipedrive accepted for an entity.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO writes (entity_type, entity_id, fingerprint, pushed_at) VALUES (?, ?, ?, ?)",
+                (entity_type, entity_id, fingerprint, datetime.now().isoformat(timespec='seconds'))
+            )
+            self.connection.commit()
+
+    def entity_id(self, kind, insly_oid):
+        """
+        Returns the mirrored Pipedrive ID of an Insly object.
+
+        Args:
+            kind (str): `'organization'`, `'person'` or `'deal'`.
+            insly_oid (int | str): The Insly customer OID (organizations, persons) or policy OID (deals).
+
+        Returns:
+            int | None: The Pipedrive ID, or `None` if it is not mirrored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT pipedrive_id FROM entities WHERE kind = ? AND insly_oid = ?", (kind, str(insly_oid))
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def remember_entities(self, kind, mappings):
+        """
+        Stores Insly OID → Pipedrive ID mappings.
+
+        Args:
+            kind (str): `'organization'`, `'person'` or `'deal'`.
+            mappings (Iterable[tuple[int | str, int]]): Pairs of (Insly OID, Pipedrive ID).
+        """
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entities (kind, insly_oid, pipedrive_id) VALUES (?, ?, ?)",
+                ((kind, str(insly_oid), pipedrive_id) for insly_oid, pipedrive_id in mappings)
+            )
+            self.connection.commit()
+
+    def forget_entity(self, kind, pipedrive_id):
+        """
+        Drops every mapping and recorded write of a Pipedrive entity which no longer exists.
+        """
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM entities WHERE kind = ? AND pipedrive_id = ?", (kind, pipedrive_id)
+            )
+            self.connection.executemany(
+                "DELETE FROM writes WHERE entity_type = ? AND entity_id = ?",
+                ((entity_type, pipedrive_id) for entity_type in WRITE_TYPES.get(kind, ()))
+            )
+            if kind == 'deal':
+                self.connection.execute("DELETE FROM deal_notes WHERE deal_id = ?", (pipedrive_id,))
+            self.connection.commit()
+
+    def replace_entities(self, kind, mappings):
+        """
+        Replaces the mirrored mappings of one kind with a complete listing of Pipedrive.
+
+        Args:
+            kind (str): `'organization'`, `'person'` or `'deal'`.
+            mappings (Iterable[tuple[int | str, int]]): Pairs of (Insly OID, Pipedrive ID) of every entity that exists.
+
+        Returns:
+            int: The number of mirrored entities that no longer exist in Pipedrive.
+
+        .. rubric:: Behavior
+        - Drops the mappings, the recorded writes (`WRITE_TYPES`) and, for deals, the note IDs of every entity missing
+          from the listing, so it is searched and created again instead of having its writes skipped.
+        - Stores the listed mappings.
+        """
+        mappings = [(str(insly_oid), pipedrive_id) for insly_oid, pipedrive_id in mappings]
+        listed = {pipedrive_id for _, pipedrive_id in mappings}
+        write_types = WRITE_TYPES.get(kind, ())
+
+        with self.lock:
+            known = {row[0] for row in self.connection.execute(
+                "SELECT pipedrive_id FROM entities WHERE kind = ?", (kind,)
+            )}
+            known.update(row[0] for row in self.connection.execute(
+                f"SELECT entity_id FROM writes WHERE entity_type IN ({', '.join('?' * len(write_types))})",
+                write_types
+            ))
+            stale = known - listed
+
+            self.connection.execute("DELETE FROM entities WHERE kind = ?", (kind,))
+            self.connection.executemany(
+                "DELETE FROM writes WHERE entity_type = ? AND entity_id = ?",
+                ((entity_type, pipedrive_id) for pipedrive_id in stale for entity_type in write_types)
+            )
+            if kind == 'deal':
+                known.update(row[0] for row in self.connection.execute("SELECT deal_id FROM deal_notes"))
+                self.connection.executemany("DELETE FROM deal_notes WHERE deal_id = ?",
+                                            ((deal_id,) for deal_id in known - listed))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entities (kind, insly_oid, pipedrive_id) VALUES (?, ?, ?)",
+                ((kind, insly_oid, pipedrive_id) for insly_oid, pipedrive_id in mappings)
+            )
+            self.connection.commit()
+
+        return len(stale)
+
+    def deal_notes(self, deal_id):
+        """
+        Returns the mirrored note IDs of a deal.
+
+        Args:
+            deal_id (int): The Pipedrive deal ID.
+
+        Returns:
+            tuple[int | None, int | None] | None: The IDs of the objects note and of the payment table note
+            (`None` for a note the deal does not have), or `None` if the deal's notes are not mirrored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT objects_note_id, payment_note_id FROM deal_notes WHERE deal_id = ?", (deal_id,)
+            ).fetchone()
+
+        return tuple(row) if row else None
+
+    def remember_deal_notes(self, notes):
+        """
+        Stores the note IDs of deals.
+
+        Args:
+            notes (Iterable[tuple[int, int | None, int | None]]): Triples of
+                (deal ID, objects note ID, payment table note ID).
+        """
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO deal_notes (deal_id, objects_note_id, payment_note_id) VALUES (?, ?, ?)",
+                notes
+            )
+            self.connection.commit()
+
+    def forget_deal_note(self, deal_id, note_id):
+        """
+        Drops a note ID that no longer exists in Pipedrive from the mirrored notes of a deal.
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE deal_notes SET objects_note_id = NULL WHERE deal_id = ? AND objects_note_id = ?",
+                (deal_id, note_id)
+            )
+            self.connection.execute(
+                "UPDATE deal_notes SET payment_note_id = NULL WHERE deal_id = ? AND payment_note_id = ?",
+                (deal_id, note_id)
+            )
+            self.connection.commit()
+
+    def entity_count(self):
+        """
+        Returns the number of mirrored mappings.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    def index_customer(self, oid, end_dates, next_relevant):
+        """
+        Stores the policy end dates of a customer and the next date it needs to be fetched from Insly.
+
+        Args:
+            oid (int): The Insly customer OID.
+            end_dates (Iterable[date]): The end dates of all the customer's policies.
+            next_relevant (date | None): The first day one of the policies is in the sync window,
+                or `None` if none of them will ever be.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO policy_index (oid, end_dates, next_relevant, indexed_at) VALUES (?, ?, ?, ?)",
+                (oid, json.dumps(sorted(d.isoformat() for d in end_dates)),
+                 next_relevant.isoformat() if next_relevant is not None else None,
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+            self.connection.commit()
+
+    def due_customers(self, oids, today=None):
+        """
+        Filters customer OIDs down to those that need to be fetched from Insly.
+
+        Args:
+            oids (Iterable[int]): The customer OIDs, in processing order.
+            today (date | None): The current date. Defaults to `date.today()`.
+
+        Returns:
+            list[int]: The OIDs that are not indexed yet or whose next relevant date is today or earlier,
+            in their original order.
+        """
+        today = (today or date.today()).isoformat()
+
+        with self.lock:
+            index = dict(self.connection.execute("SELECT oid, next_relevant FROM policy_index").fetchall())
+
+        return [oid for oid in oids
+                if oid not in index or (index[oid] is not None and index[oid] <= today)]
+
+    def get_meta(self, key):
+        """
+        Returns a stored run setting (e.g. the time of the last full index refresh), or `None`.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        """
+        Stores a run setting as text.
+        """
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self.connection.commit()
+
+    def resume_queue(self):
+        """
+        Prepares the unfinished work queue of an interrupted run to be drained again.
+
+        Returns:
+            list[int]: The OIDs still `pending` or `running` (left behind by a crash), in processing order;
+            empty if the previous run finished.
+
+        .. rubric:: Behavior
+        - Puts `running` items back to `pending`; `done` and `failed` items are kept as they are.
+        """
+        with self.lock:
+            self.connection.execute("UPDATE queue SET status = 'pending' WHERE status = 'running'")
+            self.connection.commit()
+
+            return [row[0] for row in self.connection.execute(
+                "SELECT oid FROM queue WHERE status = 'pending' ORDER BY position"
+            )]
+
+    def start_queue(self, oids):
+        """
+        Replaces the work queue with the customer OIDs of a new pass (duplicates dropped), all `pending`.
+
+        Args:
+            oids (Iterable[int]): The customer OIDs, in processing order.
+
+        Note:
+            - Call `resume_queue()` and drain it first, otherwise the unfinished customers are only processed
+              if they are part of `oids`.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM queue")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO queue (oid, position, status) VALUES (?, ?, 'pending')",
+                ((oid, position) for position, oid in enumerate(oids, start=1))
+            )
+            self.connection.commit()
+
+    def done_customers(self):
+        """
+        Returns the OIDs marked `done` in the work queue.
+        """
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT oid FROM queue WHERE status = 'done'")}
+
+    def claim(self):
+        """
+        Takes the next customer that is due from the work queue and marks it `running`.
+
+        Returns:
+            tuple[int, int] | None: `(position, oid)`, or `None` if no customer is due right now.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT position, oid FROM queue WHERE status = 'pending' AND next_retry_at <= ? "
+                "ORDER BY position LIMIT 1", (time.time(),)
+            ).fetchone()
+
+            if row is not None:
+                self.connection.execute("UPDATE queue SET status = 'running' WHERE oid = ?", (row[1],))
+                self.connection.commit()
+
+        return row
+
+    def seconds_until_due(self):
+        """
+        Returns how long until the next pending customer is due, or `None` if no customer is pending.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT MIN(next_retry_at) FROM queue WHERE status = 'pending'"
+            ).fetchone()
+
+        return None if row[0] is None else max(row[0] - time.time(), 0)
+
+    def finish(self, oid):
+        """
+        Marks a customer of the work queue as `done`.
+        """
+        with self.lock:
+            self.connection.execute("UPDATE queue SET status = 'done', last_error = NULL WHERE oid = ?", (oid,))
+            self.connection.commit()
+
+    def reschedule(self, oid, error=None):
+        """
+        Records a failed attempt and schedules the next one with exponential backoff.
+
+        Args:
+            oid (int): The customer OID.
+            error (str | None): A description of the failure. Defaults to `None`.
+
+        Returns:
+            float | None: The seconds until the retry, or `None` if the customer ran out of attempts and is now `failed`.
+        """
+        with self.lock:
+            attempts = self.connection.execute(
+                "SELECT attempts FROM queue WHERE oid = ?", (oid,)
+            ).fetchone()[0] + 1
+
+            if attempts >= QUEUE_MAX_ATTEMPTS:
+                delay = None
+                self.connection.execute(
+                    "UPDATE queue SET status = 'failed', attempts = ?, last_error = ? WHERE oid = ?",
+                    (attempts, error, oid)
+                )
+            else:
+                delay = min(QUEUE_RETRY_DELAY * 2 ** (attempts - 1), QUEUE_MAX_RETRY_DELAY)
+                self.connection.execute(
+                    "UPDATE queue SET status = 'pending', attempts = ?, next_retry_at = ?, last_error = ? WHERE oid = ?",
+                    (attempts, time.time() + delay, error, oid)
+                )
+
+            self.connection.commit()
+
+        return delay
+
+    def queue_summary(self):
+        """
+        Returns the number of queued customers per status.
+        """
+        with self.lock:
+            return dict(self.connection.execute("SELECT status, COUNT(*) FROM queue GROUP BY status").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.connection.close()